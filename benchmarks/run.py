@@ -0,0 +1,458 @@
+"""性能基准: 采样、多普勒、任务、合并、执行器与绘图的热点路径。
+
+用法 (在仓库根目录):
+
+    python benchmarks/run.py                         # 默认规模 1e3 .. 1e6
+    python benchmarks/run.py --sizes 1000,10000 -k doppler
+    python benchmarks/run.py --out data/bench/new.json --baseline data/bench/base.json
+
+每个基准对每个规模重复 --repeat 次, 取最小耗时 (最不受干扰的一次)。
+结果以 JSON 保存; 给出 --baseline 时, 与基线比较, 任何基准的最小耗时
+超过基线 (1 + threshold) 倍即视为性能回退, 进程以非零状态退出。
+
+逐点的标量接口 (sample_point_in_spherical_cap, Sat.get_doppler, Sat.pos_at)
+与绘图函数的耗时随规模线性增长且常数很大, 只在 max_size 以内测量。
+导入基准 (import[...]) 与规模无关, 在新进程中测量, 只在最小的默认规模下运行一次。
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import logging
+
+import numpy as np
+
+from components import tasks as tasks_module
+from components.results import save_columns
+from components.sats import Sat
+from components.simulate import TaskExecutor
+from components.tasks import CalDopplerTask, MergeTask, Task
+from utils import (
+    footprint_central_angle_rad,
+    sample_point_in_spherical_cap,
+    sample_points_in_spherical_cap,
+)
+
+DEFAULT_SIZES = (10**3, 10**4, 10**5, 10**6)
+TLE_PATH = ROOT / "data" / "tle" / "57425.tle"
+EPOCH = datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
+PSI = footprint_central_angle_rad(550, 30)
+
+
+@dataclass
+class Benchmark:
+    """一个基准: setup(n) 返回待计时的无参函数, 只有该函数被计时"""
+
+    name: str
+    setup: Callable[[int], Callable[[], object]]
+    max_size: int | None = None  # 超过该规模的点数不测量
+    repeat: int | None = None  # 覆盖全局重复次数
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(name: str, max_size: int | None = None, repeat: int | None = None):
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, max_size, repeat))
+        return setup
+
+    return register
+
+
+_sat = None
+
+
+def _shared_sat() -> Sat:
+    global _sat
+    if _sat is None:
+        _sat = Sat(TLE_PATH, 868.1e6)
+    return _sat
+
+
+def _subpoint():
+    sat = _shared_sat()
+    time = sat.ts.from_datetime(EPOCH)
+    lat, lon, _ = sat.pos_at(time)
+    return sat, time, lat, lon
+
+
+# ---------------------------------------------------------------- 采样
+
+
+@benchmark("sample_point_in_spherical_cap", max_size=10**5)
+def _(n):
+    def run():
+        for _ in range(n):
+            sample_point_in_spherical_cap(30.0, 120.0, PSI)
+
+    return run
+
+
+@benchmark("sample_points_in_spherical_cap")
+def _(n):
+    rng = np.random.default_rng(0)
+    return lambda: sample_points_in_spherical_cap(30.0, 120.0, PSI, n, rng)
+
+
+# ---------------------------------------------------------------- 卫星
+
+
+@benchmark("Sat.get_doppler", max_size=10**4)
+def _(n):
+    from skyfield.api import wgs84
+
+    sat, time, lat, lon = _subpoint()
+    lats, lons = sample_points_in_spherical_cap(lat, lon, PSI, n, np.random.default_rng(0))
+    stations = [wgs84.latlon(a, o) for a, o in zip(lats, lons)]
+
+    def run():
+        for station in stations:
+            sat.get_doppler(time, station)
+
+    return run
+
+
+@benchmark("Sat.get_doppler_batch")
+def _(n):
+    sat, time, lat, lon = _subpoint()
+    lats, lons = sample_points_in_spherical_cap(lat, lon, PSI, n, np.random.default_rng(0))
+    return lambda: sat.get_doppler_batch(time, lats, lons)
+
+
+@benchmark("Sat.pos_at", max_size=10**4)
+def _(n):
+    sat = _shared_sat()
+    start = sat.ts.from_datetime(EPOCH)
+    times = [start + i / 86400 for i in range(n)]
+
+    def run():
+        for t in times:
+            sat.pos_at(t)
+
+    return run
+
+
+# ---------------------------------------------------------------- 任务
+
+
+@benchmark("CalDopplerTask.run")
+def _(n):
+    sat, time, _, _ = _subpoint()
+    task = CalDopplerTask(task_id=0, sat=sat, time=time, n_samples=n, seed=0, persist=False)
+    return task.run
+
+
+class _TempDataDirs:
+    """将 tasks 模块的中间/最终目录临时指向临时目录, 避免覆盖 data/"""
+
+    def __init__(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.inter = Path(self.tmp.name) / "intermediate"
+        self.final = Path(self.tmp.name) / "final"
+        self.inter.mkdir()
+        self._saved = (tasks_module.INTER_DIR, tasks_module.FINAL_DIR)
+        tasks_module.INTER_DIR, tasks_module.FINAL_DIR = self.inter, self.final
+
+    def close(self):
+        tasks_module.INTER_DIR, tasks_module.FINAL_DIR = self._saved
+        self.tmp.cleanup()
+
+
+@benchmark("MergeTask.run")
+def _(n):
+    # 以每文件 1e4 点切分, 与 main.py 的中间文件规模相当
+    chunk = min(n, 10**4)
+    rng = np.random.default_rng(0)
+    parts = [rng.standard_normal((4, min(chunk, n - i))) for i in range(0, n, chunk)]
+    dirs = _TempDataDirs()
+
+    def run():
+        return MergeTask(task_id=0).run()
+
+    # MergeTask 会删除中间文件, 每次计时前重新写入
+    def prepare():
+        for i, part in enumerate(parts):
+            save_columns(dirs.inter / f"{i}.npy", part)
+
+    run.prepare = prepare
+    run.teardown = dirs.close
+    return run
+
+
+# ---------------------------------------------------------------- 执行器
+
+
+class _NoopTask(Task):
+    """只计算 n 个点的轻量任务, 用于测量调度开销与吞吐"""
+
+    def __init__(self, task_id, n):
+        super().__init__(task_id)
+        self.n = n
+
+    def run(self):
+        x = np.arange(self.n, dtype=np.float64)
+        return float(np.sin(x).sum())
+
+
+def _executor_benchmark(mode: str, num_workers: int):
+    def setup(n):
+        chunk = 1000
+        tasks = [_NoopTask(i, min(chunk, n - i)) for i in range(0, n, chunk)]
+        executor = TaskExecutor(num_workers=num_workers, mode=mode)
+        # 预热, 进程池在首个任务时才启动 worker
+        executor.submit(_NoopTask(-1, 1)).result()
+
+        def run():
+            for future in [executor.submit(task) for task in tasks]:
+                future.result()
+
+        run.teardown = executor.shutdown
+        return run
+
+    return setup
+
+
+for _mode in ("thread", "process"):
+    for _workers in (1, 2, 4):
+        benchmark(f"TaskExecutor[{_mode},{_workers}]")(_executor_benchmark(_mode, _workers))
+
+
+# ---------------------------------------------------------------- 导入
+
+# 计算路径 (任务、执行器、分块) 只应依赖 skyfield / NumPy, 进程池 worker 与 CLI 都要导入它
+COMPUTE_MODULES = ("components.sats", "components.tasks", "components.simulate", "components.planner")
+# 绘图、网页与终端显示的依赖, 只应在绘图或入口脚本中导入
+HEAVY_MODULES = ("matplotlib", "scipy", "contourpy", "PIL", "flask", "rich", "click")
+
+
+def import_in_subprocess(modules) -> tuple[float, list[str]]:
+    """在新的解释器中导入 modules, 返回 (导入耗时 s, 随之加载的 HEAVY_MODULES)"""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {', '.join(modules)}\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT / "src", capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(out[0]), [m for m in out[1].split(",") if m] if len(out) > 1 else []
+
+
+def _import_benchmark(modules):
+    def setup(n):
+        # 计时包含解释器启动, 与 spawn 一个 worker 的开销相当
+        return lambda: import_in_subprocess(modules)
+
+    return setup
+
+
+benchmark("import[compute]", max_size=10**3)(_import_benchmark(COMPUTE_MODULES))
+benchmark("import[vision.picture]", max_size=10**3)(_import_benchmark(("vision.picture",)))
+
+
+# ---------------------------------------------------------------- 绘图
+
+
+def _plot_points(n):
+    rng = np.random.default_rng(0)
+    lats, lons = sample_points_in_spherical_cap(30.0, 120.0, PSI, n, rng)
+    return np.column_stack((lats, lons, np.hypot(lats - 30.0, lons - 120.0)))
+
+
+def _plot_benchmark(plot):
+    def setup(n):
+        data = _plot_points(n)
+        tmp = tempfile.TemporaryDirectory()
+
+        def run():
+            plot(data, Path(tmp.name))
+
+        run.teardown = tmp.cleanup
+        return run
+
+    return setup
+
+
+def _register_plots():
+    from vision import picture
+
+    for name in ("plot_footprint", "save_3d_plot_to_file", "plot_contour_irregular"):
+        benchmark(f"picture.{name}", max_size=10**5, repeat=1)(
+            _plot_benchmark(getattr(picture, name))
+        )
+
+    @benchmark("picture.plot_doppler_raster", repeat=1)
+    def _(n):
+        data = _plot_points(n)
+        tmp = tempfile.TemporaryDirectory()
+
+        def run():
+            picture.plot_doppler_raster(data[:, 0], data[:, 1], data[:, 2], Path(tmp.name))
+
+        run.teardown = tmp.cleanup
+        return run
+
+    benchmark("picture.save_3d_plot_to_file[decimated]", repeat=1)(
+        _plot_benchmark(lambda data, path: picture.save_3d_plot_to_file(data, path, max_points=20000))
+    )
+
+    @benchmark("picture.plot_coverage_raster", max_size=10**6, repeat=1)
+    def _(n):
+        side = int(np.sqrt(n))
+        values = np.random.default_rng(0).integers(0, 4, (side, side))
+        tmp = tempfile.TemporaryDirectory()
+
+        def run():
+            picture.plot_coverage_raster(values, Path(tmp.name))
+
+        run.teardown = tmp.cleanup
+        return run
+
+
+_register_plots()
+
+
+# ---------------------------------------------------------------- 运行与比较
+
+
+def run_benchmark(bench: Benchmark, n: int, repeat: int) -> dict:
+    fn = bench.setup(n)
+    prepare = getattr(fn, "prepare", None)
+    timings = []
+    try:
+        for _ in range(bench.repeat or repeat):
+            if prepare is not None:
+                prepare()
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    finally:
+        teardown = getattr(fn, "teardown", None)
+        if teardown is not None:
+            teardown()
+
+    best = min(timings)
+    return {
+        "size": n,
+        "min_s": best,
+        "median_s": statistics.median(timings),
+        "repeat": len(timings),
+        "points_per_s": n / best if best > 0 else float("inf"),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, repeat: int = 3, pattern: str | None = None) -> dict:
+    results = {}
+    for bench in BENCHMARKS:
+        if pattern and pattern.lower() not in bench.name.lower():
+            continue
+        for n in sizes:
+            if bench.max_size is not None and n > bench.max_size:
+                continue
+            key = f"{bench.name}[{n}]"
+            results[key] = run_benchmark(bench, n, repeat)
+            print(
+                f"{key:<48} {results[key]['min_s'] * 1e3:12.3f} ms"
+                f" {results[key]['points_per_s']:14.0f} pts/s",
+                flush=True,
+            )
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list[str]:
+    """与基线比较, 返回回退的基准 (最小耗时超过基线 1 + threshold 倍)"""
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        ratio = result["min_s"] / base["min_s"] if base["min_s"] > 0 else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{key}: {base['min_s']:.6f}s -> {result['min_s']:.6f}s (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(n) for n in DEFAULT_SIZES),
+        help="逗号分隔的点数规模",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每个规模的重复次数")
+    parser.add_argument("-k", dest="pattern", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--out", type=Path, help="结果 JSON 路径")
+    parser.add_argument("--baseline", type=Path, help="用于比较的基线 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对变慢比例")
+    args = parser.parse_args(argv)
+
+    # 任务中的逐任务日志会淹没基准输出
+    task_logger = logging.getLogger("rich")
+    saved_level = task_logger.level
+    task_logger.setLevel(logging.WARNING)
+    try:
+        sizes = [int(float(s)) for s in args.sizes.split(",")]
+        current = run_suite(sizes, args.repeat, args.pattern)
+    finally:
+        task_logger.setLevel(saved_level)
+
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"results saved to {args.out}")
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
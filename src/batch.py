@@ -0,0 +1,74 @@
+"""批量运行场景文件中的所有场景, 例如
+
+    python batch.py ../data/scenarios/example.json
+    python batch.py ../data/scenarios/example.json --resume -k 868.1MHz
+
+每个场景的结果写入 data/runs/<批次名>/<场景名>/。
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from components.cache import ResultCache
+from components.scenario import RUNS_DIR, BatchRunner, load_scenarios
+from components.simulate import TaskExecutor
+from logger import logger, start_logging
+
+
+def main(argv=None) -> dict[str, dict]:
+    parser = argparse.ArgumentParser(description="Run every scenario of a scenario file")
+    parser.add_argument("scenarios", help="scenario file (JSON)")
+    parser.add_argument("-k", dest="keyword", help="only run scenarios whose name contains this")
+    parser.add_argument("--resume", action="store_true", help="skip tasks already completed by an earlier run")
+    parser.add_argument("--name", help="batch name (default: from the scenario file)")
+    parser.add_argument("--runs-dir", default=str(RUNS_DIR), help="parent directory of batch outputs")
+    parser.add_argument("--mode", choices=("thread", "process"), default="process")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-mb", type=float, default=1024, help="result cache size, 0 disables it")
+    parser.add_argument("--verbose", action="store_true", help="log every sample point (slow)")
+    parser.add_argument("--dry-run", action="store_true", help="only list the expanded scenarios")
+    args = parser.parse_args(argv)
+
+    batch_name, scenarios = load_scenarios(args.scenarios)
+    batch_name = args.name or batch_name
+    if args.keyword:
+        scenarios = [s for s in scenarios if args.keyword in s.name]
+    if args.dry_run:
+        for scenario in scenarios:
+            print(scenario.name)
+        return {}
+
+    # 日志经队列由后台线程写出, 整个批次的结构化日志写入 <批次目录>/log.jsonl
+    pipeline = start_logging(
+        Path(args.runs_dir) / batch_name / "log.jsonl",
+        verbose=args.verbose,
+        rich=True,
+        processes=args.mode == "process",
+        mode="a" if args.resume else "w",
+    )
+    # 场景失败时也停止日志管线: 写出队列中剩余的记录并结束后台线程
+    try:
+        runner = BatchRunner(
+            batch_name,
+            executor=TaskExecutor(
+                args.workers, mode=args.mode, metrics_path=Path(args.runs_dir) / batch_name / "metrics.json"
+            ),
+            cache=ResultCache(max_bytes=int(args.cache_mb * 1e6)) if args.cache_mb > 0 else None,
+            runs_dir=args.runs_dir,
+        )
+        try:
+            results = runner.run(scenarios, resume=args.resume)
+        finally:
+            runner.shutdown()
+
+        with open(runner.batch_dir / "batch.json", "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"{len(results)} scenarios written to {runner.batch_dir}")
+    finally:
+        pipeline.stop()
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""asyncio 前端: 在事件循环中提交任务, 按完成顺序流式产出结果。"""
+
+import asyncio
+from typing import AsyncIterator
+
+import numpy as np
+from skyfield.api import Time
+
+from components.planner import ChunkPlanner, cal_doppler_tasks
+from components.sats import Sat
+from components.simulate import TaskExecutor
+
+
+async def run_doppler(
+    sat: Sat,
+    time: Time,
+    n: int,
+    executor: TaskExecutor | None = None,
+    max_in_flight: int | None = None,
+    block: int = 100,
+    run_seed: int | None = None,
+    **task_kwargs,
+) -> AsyncIterator[tuple[int, np.ndarray]]:
+    """在覆盖区内采样 n 个点计算多普勒, 任务完成即产出 (offset, columns)
+
+    columns 为 (len(COLUMNS), k) 的列式结果, 对应全部结果中的 [offset, offset + k)。
+    任务由 ChunkPlanner 自适应分块, 同时在途的任务不超过 max_in_flight。
+    消费者提前退出 (break / aclose()) 或协程被取消时, 尚未开始的任务被取消。
+
+    Args:
+        sat: 卫星
+        time: 时刻
+        n: 总点数
+        executor: 任务执行器, 缺省时创建线程池并在结束时关闭
+        max_in_flight: 在途任务数上限, 缺省为 worker 数的 2 倍
+        block: 随机数流与分块粒度
+        run_seed: 随机数种子
+        task_kwargs: 传给 CalDopplerTask (如 sampling, grid_shape)
+    """
+    owned = executor is None
+    if owned:
+        executor = TaskExecutor()
+
+    make_task = cal_doppler_tasks(sat, time, n, block, run_seed, **task_kwargs)
+    planner = ChunkPlanner(executor, make_task, n, block=block, max_in_flight=max_in_flight)
+    pending: dict[asyncio.Future, tuple[int, int]] = {}
+    try:
+        while True:
+            while len(pending) < planner.max_in_flight and (item := planner.next_task()) is not None:
+                offset, count, task = item
+                pending[asyncio.wrap_future(executor.submit(task))] = (offset, count)
+            if not pending:
+                return
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                offset, count = pending.pop(future)
+                planner.task_done(count)
+                yield offset, future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if owned:
+            executor.shutdown(wait=False)
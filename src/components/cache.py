@@ -0,0 +1,247 @@
+"""按内容寻址的磁盘结果缓存: 相同场景 (TLE、时刻、载频、覆盖区、采样) 的结果跨运行复用。
+
+查找的单位是块 (每个随机数流或每段网格下标一块, 与任务如何分块无关), 存储的单位是项:
+一个任务未命中的所有块合并写成一个列式结果 .npy, 文件数与磁盘操作随任务数而不是块数增长。
+
+块到项的映射、各项大小与 LRU 顺序记在内存账本中, 账本的修改追加写入缓存目录下的
+index.jsonl; 共享同一目录的其他进程增量读取新追加的记录, 淘汰按账本进行, 不再扫描目录。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from components.results import DATA_DIR, atomic_path, load_columns, save_columns
+
+CACHE_DIR = DATA_DIR / "cache"
+# 计算方法或存储格式变化时递增, 使旧缓存失效
+CACHE_VERSION = 3
+
+INDEX_NAME = "index.jsonl"
+# 账本记录数超过 项数 × 该倍数 (且不少于 COMPACT_MIN) 时压缩
+COMPACT_RATIO = 4
+COMPACT_MIN = 1024
+# 压缩时清理账本中没有的文件, 只清理这么久 (s) 以前写入的, 以免删掉其他进程刚写、尚未记账的项
+ORPHAN_AGE_S = 60.0
+
+
+def seed_identity(seed) -> object:
+    """随机数种子的可哈希描述; SeedSequence 由 entropy 与 spawn_key 唯一确定"""
+    if isinstance(seed, np.random.SeedSequence):
+        return {"entropy": str(seed.entropy), "spawn_key": list(seed.spawn_key), "pool_size": seed.pool_size}
+    if isinstance(seed, (int, np.integer)):
+        return int(seed)
+    raise TypeError(f"cannot derive a cache key from seed {seed!r}")
+
+
+def cache_key(**params) -> str:
+    """参数 (可 JSON 序列化) 的 sha256"""
+    text = json.dumps({"version": CACHE_VERSION, **params}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """磁盘上的 LRU 结果缓存, 总大小超过 max_bytes 时淘汰最久未使用的项。
+
+    hits / misses 为本进程按块的统计; 进程池 worker 中的命中情况见 ExecutorMetrics 的 counts。
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = 1 << 30):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._entries: OrderedDict[str, list] = OrderedDict()  # 文件名 -> [字节数, 块键列表], 按 LRU 排序
+        self._blocks: dict[str, tuple[str, int, int]] = {}  # 块键 -> (文件名, 起始列, 结束列)
+        self._bytes = 0
+        self._records = 0  # 已读入的账本记录数
+        self._index_pos = 0  # 账本中已读到的位置
+        self._index_ino: int | None = None  # 已读入的账本文件, 被压缩替换后从头重读
+
+    def __reduce__(self):
+        # 只传目录与上限, 统计、账本与锁留在各进程
+        return type(self), (self.cache_dir, self.max_bytes)
+
+    @property
+    def _index_path(self) -> Path:
+        return self.cache_dir / INDEX_NAME
+
+    def _reset(self) -> None:
+        self._entries.clear()
+        self._blocks.clear()
+        self._bytes = self._records = self._index_pos = 0
+
+    def _apply(self, record: dict) -> None:
+        """在内存账本上执行一条记录; 重复执行同一条记录结果不变"""
+        self._records += 1
+        if "put" in record:
+            name = record["put"]
+            self._drop(name)
+            self._entries[name] = [record["bytes"], [block[0] for block in record["blocks"]]]
+            self._bytes += record["bytes"]
+            for key, start, stop in record["blocks"]:
+                self._blocks[key] = (name, start, stop)
+        elif "use" in record:
+            if record["use"] in self._entries:
+                self._entries.move_to_end(record["use"])
+        elif "del" in record:
+            self._drop(record["del"])
+
+    def _drop(self, name: str) -> None:
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return
+        self._bytes -= entry[0]
+        for key in entry[1]:
+            # 块可能已由更新的项提供
+            if self._blocks.get(key, (None,))[0] == name:
+                del self._blocks[key]
+
+    def _sync(self) -> None:
+        """读入其他进程新追加的账本记录"""
+        try:
+            f = open(self._index_path, "rb")
+        except FileNotFoundError:
+            if self._index_ino is not None:
+                self._reset()
+                self._index_ino = None
+            return
+        with f:
+            ino = os.fstat(f.fileno()).st_ino
+            if ino != self._index_ino:
+                self._reset()
+                self._index_ino = ino
+            f.seek(self._index_pos)
+            data = f.read()
+        # 只读到最后一个完整的行, 其余留到下次
+        end = data.rfind(b"\n") + 1
+        self._index_pos += end
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    def _append(self, *records: dict) -> None:
+        """把记录追加到账本 (O_APPEND, 多进程的追加不会交错), 并读入本进程的内存账本"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        text = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        with open(self._index_path, "a") as f:
+            f.write(text)
+        self._sync()
+
+    def get_blocks(self, keys: list[str]) -> list[np.ndarray | None]:
+        """各块的结果 (只读内存映射上的视图), 未命中的块为 None; 命中的项刷新其 LRU 顺序"""
+        with self._lock:
+            self._sync()
+            located = [self._blocks.get(key) for key in keys]
+
+        files, missing, out = {}, set(), []
+        for where in located:
+            if where is None or where[0] in missing:
+                out.append(None)
+                continue
+            name, start, stop = where
+            if name not in files:
+                try:
+                    files[name] = load_columns(self.cache_dir / name)
+                except (FileNotFoundError, ValueError, OSError):
+                    # 已被其他进程淘汰 (账本尚未读到) 或文件损坏, 按未命中处理
+                    missing.add(name)
+                    out.append(None)
+                    continue
+            out.append(files[name][:, start:stop])
+
+        n_hits = sum(block is not None for block in out)
+        with self._lock:
+            self.hits += n_hits
+            self.misses += len(out) - n_hits
+            if files or missing:
+                self._append(*({"use": name} for name in files), *({"del": name} for name in missing))
+        return out
+
+    def put_blocks(self, blocks: list[tuple[str, int, int]], columns: np.ndarray, evict: bool = True) -> None:
+        """把 columns 中的若干块 (块键, 起始列, 结束列) 合并写为一项, 然后按大小上限淘汰"""
+        if not blocks:
+            return
+        data = np.concatenate([columns[:, start:stop] for _, start, stop in blocks], axis=1)
+        name = cache_key(blocks=[key for key, _, _ in blocks]) + ".npy"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        save_columns(self.cache_dir / name, data)
+
+        stops = np.cumsum([stop - start for _, start, stop in blocks]).tolist()
+        starts = [0] + stops[:-1]
+        layout = [[key, a, b] for (key, _, _), a, b in zip(blocks, starts, stops)]
+        with self._lock:
+            self._append({"put": name, "bytes": (self.cache_dir / name).stat().st_size, "blocks": layout})
+            if evict:
+                self.evict()
+
+    def get(self, key: str) -> np.ndarray | None:
+        """单个块的结果, 见 get_blocks"""
+        return self.get_blocks([key])[0]
+
+    def put(self, key: str, columns: np.ndarray, evict: bool = True) -> None:
+        """把 columns 整体作为一个块写入, 见 put_blocks"""
+        self.put_blocks([(key, 0, columns.shape[1])], columns, evict)
+
+    def evict(self) -> int:
+        """按账本淘汰最久未使用的项直到总大小不超过 max_bytes, 返回淘汰的项数"""
+        with self._lock:
+            self._sync()
+            evicted = []
+            while self._bytes > self.max_bytes and self._entries:
+                name = next(iter(self._entries))
+                self._drop(name)
+                (self.cache_dir / name).unlink(missing_ok=True)
+                evicted.append({"del": name})
+            if evicted:
+                self._append(*evicted)
+            if self._records > max(COMPACT_MIN, COMPACT_RATIO * len(self._entries)):
+                self._compact()
+            return len(evicted)
+
+    def _compact(self) -> None:
+        """按当前账本重写 index.jsonl, 并清理账本之外的旧文件与账本中已不存在的项
+
+        压缩与其他进程的追加之间可能丢失少量记录, 只会造成未命中或由之后的压缩清理的文件。
+        """
+        self._sync()
+        for name in [name for name in self._entries if not (self.cache_dir / name).exists()]:
+            self._drop(name)
+        cutoff = time.time() - ORPHAN_AGE_S
+        for path in self.cache_dir.glob("*.npy"):
+            try:
+                if path.name not in self._entries and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+        records = []
+        for name, (nbytes, keys) in self._entries.items():
+            layout = [[key, *self._blocks[key][1:]] for key in keys if self._blocks.get(key, (None,))[0] == name]
+            records.append({"put": name, "bytes": nbytes, "blocks": layout})
+        with atomic_path(self._index_path) as tmp, open(tmp, "w") as f:
+            f.writelines(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        self._index_ino = None
+        self._sync()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._sync()
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+    def clear(self) -> None:
+        with self._lock:
+            for path in self.cache_dir.glob("*.npy"):
+                path.unlink(missing_ok=True)
+            self._index_path.unlink(missing_ok=True)
+            self._reset()
+            self._index_ino = None
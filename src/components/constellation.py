@@ -0,0 +1,142 @@
+"""星座: 一次加载大量 TLE, 共享 timescale, 向量化传播所有卫星。"""
+
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+from sgp4.api import SatrecArray
+from skyfield.api import Time
+from skyfield.constants import ANGVEL
+from skyfield.framelib import itrs
+from skyfield.sgp4lib import TEME
+from skyfield.timelib import Timescale
+
+from components.sats import (
+    Sat,
+    doppler_from_state,
+    ground_xyz,
+    itrs_to_latlon,
+    read_tle,
+    shared_timescale,
+)
+
+DAY_S = 86400.0
+
+# ITRS 相对 GCRS 的旋转: v_itrs = A v + W r_itrs, W 为地球自转角速度 (rad/s) 的叉乘矩阵
+_ANGVEL_MATRIX = np.array(((0.0, ANGVEL, 0.0), (-ANGVEL, 0.0, 0.0), (0.0, 0.0, 0.0)))
+
+
+def _utc_fraction(times: Time) -> np.ndarray:
+    """与 times.whole 配对的 UTC 儒略日小数部分, 只用 Timescale 公开的闰秒表
+
+    与 skyfield 相同, 从闰秒前一秒 (23:59:59) 到闰秒结束 TAI - UTC 线性过渡,
+    第一个闰秒 (1972-07) 之前为 10 s。
+    """
+    ts = times.ts
+    after = ts.leap_offsets
+    before = np.concatenate(([after[0] - 1], after[:-1]))
+    # 过渡开始与结束的 TAI 秒及其 TAI - UTC
+    start, stop = ts.leap_dates * DAY_S - 1 + before, ts.leap_dates * DAY_S + after
+    leap_tai = np.column_stack((start, stop)).ravel()
+    # 与 skyfield 一样按整 TAI 秒插值; 先舍入到微秒, 整秒时刻不因舍入误差落到前一秒
+    seconds, fraction = np.divmod(times.whole * DAY_S, 1.0)
+    seconds += np.floor(np.round(fraction + times.tai_fraction * DAY_S, 6))
+    leap_s = np.interp(seconds, leap_tai, np.column_stack((before, after)).ravel())
+    return times.tai_fraction - leap_s / DAY_S
+
+
+class Constellation:
+    """一组共享同一 timescale 的卫星。
+
+    states() 用 sgp4 的 SatrecArray 在一次调用中传播所有卫星的所有时刻,
+    再统一旋转到 ITRS, 结果与逐颗调用 Sat.itrs_state 一致。
+    """
+
+    def __init__(self, sats: list[Sat], ts: Timescale | None = None):
+        if not sats:
+            raise ValueError("a constellation needs at least one satellite")
+        self.ts = ts if ts is not None else shared_timescale()
+        self.sats = sats
+        self._satrecs = SatrecArray([sat.sat.model for sat in sats])
+        self.signal_freqs = np.array([sat.signal_freq for sat in sats], dtype=np.float64)
+
+    @classmethod
+    def load(cls, path: Path, signal_freq: float, ts: Timescale | None = None) -> "Constellation":
+        """从目录 (其中所有 *.tle) 或多条目 TLE 目录文件加载全部卫星"""
+        path = Path(path)
+        files = sorted(path.glob("*.tle")) if path.is_dir() else [path]
+        return cls.from_files(files, signal_freq, ts)
+
+    @classmethod
+    def from_files(
+        cls, paths: Iterable[Path], signal_freq: float, ts: Timescale | None = None
+    ) -> "Constellation":
+        """加载若干 TLE 文件中的全部条目"""
+        ts = ts if ts is not None else shared_timescale()
+        sats = [
+            Sat.from_tle(line1, line2, signal_freq, name, ts)
+            for path in paths
+            for name, line1, line2 in read_tle(path)
+        ]
+        return cls(sats, ts)
+
+    def __len__(self) -> int:
+        return len(self.sats)
+
+    def __iter__(self) -> Iterator[Sat]:
+        return iter(self.sats)
+
+    def __getitem__(self, index: int) -> Sat:
+        return self.sats[index]
+
+    @property
+    def names(self) -> list[str | None]:
+        return [sat.name for sat in self.sats]
+
+    def states(self, time: Time) -> np.ndarray:
+        """所有卫星在所有时刻的 ITRS 状态
+
+        Args:
+            time (Time): 标量或数组 skfield.timelib.Time
+
+        Returns:
+            (n_sats, n_times, 6) 数组: 位置 (m) 与速度 (m/s),
+            SGP4 传播失败处为 nan
+        """
+        whole, tt_fraction = np.broadcast_arrays(
+            np.atleast_1d(time.whole), np.atleast_1d(time.tt_fraction)
+        )
+        times = self.ts.tt_jd(whole, tt_fraction)
+
+        # 与 skyfield 一致, TLE 时刻视为 UTC
+        errors, r_teme, v_teme = self._satrecs.sgp4(whole, _utc_fraction(times))
+
+        # TEME -> GCRS -> ITRS, 与 EarthSatellite.at().frame_xyz_and_velocity(itrs) 相同
+        R_teme = TEME.rotation_at(times)
+        R_itrs = itrs.rotation_at(times)
+        A = np.einsum("ijn,kjn->ikn", R_itrs, R_teme)
+
+        r = np.einsum("ikn,snk->sni", A, r_teme) * 1000
+        v = np.einsum("ikn,snk->sni", A, v_teme) * 1000 + np.einsum("ik,snk->sni", _ANGVEL_MATRIX, r)
+
+        states = np.concatenate((r, v), axis=-1)
+        states[errors != 0] = np.nan
+        return states
+
+    def subpoints(self, time: Time) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """星下点 lat (°), lon (°), height (km), 形状 (n_sats, n_times)"""
+        r = np.moveaxis(self.states(time)[..., :3], -1, 0)
+        return itrs_to_latlon(r)
+
+    def get_doppler_batch(
+        self, time: Time, lats: np.ndarray, lons: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """所有卫星、所有时刻、所有地面点的多普勒
+
+        Returns:
+            range (m), range rate (m/s), doppler shift (Hz), received frequency (Hz),
+            each of shape (n_sats, n_times, n_points)
+        """
+        states = np.moveaxis(self.states(time), -1, 0)
+        freqs = self.signal_freqs[:, np.newaxis, np.newaxis]
+        return doppler_from_state(states[:3], states[3:], ground_xyz(lats, lons), freqs)
@@ -0,0 +1,213 @@
+"""等多普勒线提取: 在覆盖区的自适应非均匀网格上直接计算多普勒, 输出折线数据。"""
+
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from contourpy import LineType, contour_generator
+from skyfield.api import Time
+
+from components.sats import Sat, doppler_from_state, ground_xyz, itrs_to_latlon
+from utils import footprint_central_angle_rad
+
+
+class ContourCache:
+    """按 (TLE, 时刻, 频率, 等值线, 网格参数) 缓存等多普勒线, 超出 max_entries 时淘汰最久未使用的。
+
+    存入时折线冻结为只读数组的元组, 取出时返回新的 dict, 调用方的修改不会影响缓存。
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {level: list(lines) for level, lines in entry.items()}
+
+    def put(self, key: tuple, value: dict) -> None:
+        frozen = {}
+        for level, lines in value.items():
+            lines = tuple(np.array(line) for line in lines)
+            for line in lines:
+                line.setflags(write=False)
+            frozen[level] = lines
+        with self._lock:
+            self._entries[key] = frozen
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = ContourCache()
+
+
+def _n_sub(step: np.ndarray, max_step_hz: float, max_split: int) -> np.ndarray:
+    """各区间需要等分的份数, 使每段的 |Δdoppler| 不超过 max_step_hz"""
+    return np.clip(np.ceil(np.nan_to_num(step) / max_step_hz), 1, max_split).astype(np.int64)
+
+
+def _refine_axis(axis: np.ndarray, n_sub: np.ndarray) -> np.ndarray:
+    """把每个区间等分为 n_sub 份"""
+    pieces = [axis[:1]] + [
+        np.linspace(a, b, n + 1)[1:] for a, b, n in zip(axis[:-1], axis[1:], n_sub)
+    ]
+    return np.concatenate(pieces)
+
+
+def iso_doppler_contours(
+    sat: Sat,
+    time: Time,
+    levels,
+    h_km: float = 550,
+    e0_deg: float = 30,
+    n_initial: int = 64,
+    max_step_hz: float = 100.0,
+    n_refine: int = 3,
+    max_nodes: int = 1 << 18,
+    cache: ContourCache | None = _cache,
+) -> dict[float, list[np.ndarray]]:
+    """卫星在 time 时刻覆盖区内的等多普勒线
+
+    先在覆盖区外包框的均匀网格上计算多普勒, 再把相邻节点间多普勒变化超过
+    max_step_hz 的行/列区间细分并在新节点上重新计算 (不插值散点),
+    重复 n_refine 次; 最后在非均匀直线网格上用 contourpy 提取等值线。
+    细分按行列整体进行, 节点总数 (行数 × 列数) 不超过 max_nodes,
+    超出时减少每个区间的细分份数。
+    覆盖区 (仰角 e0_deg) 以外的节点被屏蔽。
+
+    Args:
+        sat: 卫星
+        time: 标量 Time
+        levels: 多普勒值 (Hz)
+        h_km, e0_deg: 计算覆盖区的轨道高度与最小仰角
+        n_initial: 初始网格每个方向的节点数
+        max_step_hz: 细分后相邻节点间允许的最大多普勒变化
+        n_refine: 细分次数
+        max_nodes: 网格的最大节点总数
+        cache: 结果缓存, None 表示不缓存
+
+    Returns:
+        {level: [折线, ...]}, 每条折线为 (n, 2) 数组, 列为 lon (°), lat (°);
+        经度以星下点为中心连续展开, 可能超出 [-180, 180]
+    """
+    levels = tuple(float(level) for level in np.atleast_1d(levels))
+    key = (
+        tuple(sat.tle_lines),
+        float(time.whole),
+        float(time.tt_fraction),
+        sat.signal_freq,
+        levels,
+        (h_km, e0_deg, n_initial, max_step_hz, n_refine, max_nodes),
+    )
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    r, v = sat.itrs_state(time)
+    lat0, lon0, _ = (float(x) for x in itrs_to_latlon(r))
+    psi = footprint_central_angle_rad(h_km, e0_deg)
+    psi_deg = math.degrees(psi)
+
+    lat_axis = np.linspace(max(lat0 - psi_deg, -90.0), min(lat0 + psi_deg, 90.0), n_initial)
+    # 纬度越高, 同样的地心角对应的经度跨度越大
+    max_abs_lat = min(89.0, abs(lat0) + psi_deg)
+    lon_half = min(180.0, psi_deg / math.cos(math.radians(max_abs_lat)))
+    lon_axis = np.linspace(lon0 - lon_half, lon0 + lon_half, n_initial)
+
+    center = ground_xyz([lat0], [lon0])[:, 0]
+    center = center / np.linalg.norm(center)
+    cos_psi = math.cos(psi)
+
+    def evaluate(lat_axis, lon_axis):
+        lats, lons = np.meshgrid(lat_axis, lon_axis, indexing="ij")
+        xyz = ground_xyz(lats.ravel(), lons.ravel())
+        _, _, doppler, _ = doppler_from_state(r, v, xyz, sat.signal_freq)
+        doppler = doppler.reshape(lats.shape)
+        # 以地心角判断是否在覆盖区内
+        unit = xyz / np.linalg.norm(xyz, axis=0)
+        outside = (center @ unit).reshape(lats.shape) < cos_psi
+        doppler[outside] = np.nan
+        return doppler
+
+    doppler = evaluate(lat_axis, lon_axis)
+    for _ in range(n_refine):
+        with np.errstate(all="ignore"):
+            lat_step = np.nanmax(np.abs(np.diff(doppler, axis=0)), axis=1, initial=0.0)
+            lon_step = np.nanmax(np.abs(np.diff(doppler, axis=1)), axis=0, initial=0.0)
+        # 每个区间最多等分 8 份, 节点总数超限时逐步减少
+        for max_split in range(8, 1, -1):
+            lat_sub = _n_sub(lat_step, max_step_hz, max_split)
+            lon_sub = _n_sub(lon_step, max_step_hz, max_split)
+            if (1 + lat_sub.sum()) * (1 + lon_sub.sum()) <= max_nodes:
+                break
+        else:
+            break
+        if (lat_sub == 1).all() and (lon_sub == 1).all():
+            break
+        lat_axis, lon_axis = _refine_axis(lat_axis, lat_sub), _refine_axis(lon_axis, lon_sub)
+        doppler = evaluate(lat_axis, lon_axis)
+
+    generator = contour_generator(
+        lon_axis, lat_axis, np.ma.masked_invalid(doppler), line_type=LineType.Separate
+    )
+    contours = {level: [np.asarray(line) for line in generator.lines(level)] for level in levels}
+
+    if cache is not None:
+        cache.put(key, contours)
+    return contours
+
+
+def _split_antimeridian(line: np.ndarray) -> list[np.ndarray]:
+    """把连续展开的折线 (lon, lat) 的经度折回 [-180, 180], 并在穿过 ±180° 处断开
+
+    断点处按线性插值求出纬度, 前一段止于 ±180°, 后一段从另一侧的 ∓180° 开始。
+    """
+    lon, lat = line[:, 0], line[:, 1]
+    turns = np.floor((lon + 180) / 360)
+    wrapped = lon - 360 * turns
+    parts, start, head = [], 0, []
+    for i in np.flatnonzero(np.diff(turns)):
+        edge = 360 * max(turns[i], turns[i + 1]) - 180
+        lat_edge = lat[i] + (edge - lon[i]) / (lon[i + 1] - lon[i]) * (lat[i + 1] - lat[i])
+        tail = [(edge - 360 * turns[i], lat_edge)]
+        parts.append(np.vstack(head + [np.column_stack((wrapped[start : i + 1], lat[start : i + 1]))] + [tail]))
+        head, start = [[(edge - 360 * turns[i + 1], lat_edge)]], i + 1
+    parts.append(np.vstack(head + [np.column_stack((wrapped[start:], lat[start:]))]))
+    return [part for part in parts if len(part) > 1]
+
+
+def contours_to_geojson(contours: dict[float, list[np.ndarray]]) -> dict:
+    """等多普勒线转为 GeoJSON FeatureCollection, 每个等值一个 MultiLineString, 经度在 [-180, 180]"""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"doppler_hz": level},
+                "geometry": {
+                    "type": "MultiLineString",
+                    "coordinates": [part.tolist() for line in lines for part in _split_antimeridian(line)],
+                },
+            }
+            for level, lines in contours.items()
+        ],
+    }
@@ -0,0 +1,184 @@
+"""卫星星历缓存: 按固定步长预先传播, 其余时刻用 Hermite 插值。"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+from skyfield.api import Time
+from skyfield.timelib import Timescale
+
+J2000 = 2451545.0
+DAY_S = 86400.0
+OMEGA_EARTH = 7.2921150e-5  # 地球自转角速度 (rad/s)
+
+
+class EphemerisCache:
+    """ITRS 位置/速度缓存。
+
+    时间轴被切分为长度 window_s 的窗口, 首次访问某窗口时以 step_s 为步长
+    一次性向量化传播整个窗口的节点, 窗口内任意时刻用三次 Hermite
+    插值 (节点处的位置与速度) 求值。最多保留 max_windows 个窗口,
+    超出时淘汰最久未使用的窗口。
+
+    SGP4 给出的速度并不严格等于其位置的导数, 解析误差界会偏乐观,
+    因此每个窗口在同一次传播中额外计算各区间内误差最大的几个时刻,
+    用实测误差校验, error_bound() 取两者中较大者。
+    """
+
+    # 区间内的校验位置: 中点 (位置误差最大) 与 0.5 ± √3/6 (速度误差最大)
+    CHECK_FRACTIONS = (0.5 - math.sqrt(3) / 6, 0.5, 0.5 + math.sqrt(3) / 6)
+    # 校验点只是抽样, 实测误差乘以安全系数后作为误差界
+    SAFETY_FACTOR = 1.5
+
+    def __init__(
+        self,
+        propagate: Callable[[Time], tuple[np.ndarray, np.ndarray]],
+        ts: Timescale,
+        step_s: float = 60.0,
+        window_s: float = 3600.0,
+        max_windows: int = 8,
+        mean_motion_rad_s: float = 0.0,
+        max_radius_m: float = 0.0,
+    ):
+        """
+        Args:
+            propagate: 精确传播函数, Time -> (位置 (m), 速度 (m/s)), 形状 (3, n)
+            ts: 构造窗口节点时间所用的 timescale
+            step_s: 节点步长 (s)
+            window_s: 窗口长度 (s), 须为 step_s 的整数倍
+            max_windows: 最多缓存的窗口数
+            mean_motion_rad_s: 卫星平均角速度, 用于误差界
+            max_radius_m: 卫星最大地心距, 用于误差界
+        """
+        n_steps = round(window_s / step_s)
+        if n_steps < 1 or not math.isclose(n_steps * step_s, window_s):
+            raise ValueError("window_s must be a positive multiple of step_s")
+
+        self.propagate = propagate
+        self.ts = ts
+        self.step_s = step_s
+        self.window_s = window_s
+        self.max_windows = max_windows
+        self.mean_motion_rad_s = mean_motion_rad_s
+        self.max_radius_m = max_radius_m
+        self._node_s = np.arange(n_steps + 1) * step_s
+        self._check_s = (
+            self._node_s[:-1, np.newaxis] + np.array(self.CHECK_FRACTIONS) * step_s
+        ).ravel()
+        self._observed = {"position_m": 0.0, "velocity_m_per_s": 0.0}
+
+        self._windows: OrderedDict[int, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def error_bound(self) -> dict:
+        """插值误差上界 (相对精确 SGP4)
+
+        解析部分: ITRS 坐标中的运动可视为角频率不超过 n + ω_E 的圆周运动,
+        四阶导数不超过 (n + ω_E)^4 r, 三次 Hermite 插值的误差界为
+        位置 h^4/384 · M4, 速度 √3/216 · h^3 · M4。
+        实测部分: 已构建窗口的校验点最大误差乘以 SAFETY_FACTOR。
+        """
+        m4 = (self.mean_motion_rad_s + OMEGA_EARTH) ** 4 * self.max_radius_m
+        h = self.step_s
+        analytic = {
+            "position_m": h**4 / 384 * m4,
+            "velocity_m_per_s": math.sqrt(3) / 216 * h**3 * m4,
+        }
+        with self._lock:
+            return {
+                key: max(analytic[key], self.SAFETY_FACTOR * self._observed[key])
+                for key in analytic
+            }
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "windows": len(self._windows),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+
+    def state(self, time: Time) -> tuple[np.ndarray, np.ndarray]:
+        """插值得到 ITRS 位置 (m) 与速度 (m/s), 形状与 Sat.itrs_state 相同"""
+        # 相对 J2000 的 TT 秒数, 分开 whole 与 fraction 以保留精度
+        seconds = (np.asarray(time.whole) - J2000) * DAY_S + np.asarray(time.tt_fraction) * DAY_S
+        flat = np.atleast_1d(seconds).ravel()
+        keys = np.floor(flat / self.window_s).astype(np.int64)
+
+        r = np.empty((3, flat.size))
+        v = np.empty((3, flat.size))
+        for key in np.unique(keys):
+            mask = keys == key
+            nodes_r, nodes_v = self._window(int(key))
+            r[:, mask], v[:, mask] = self._interpolate(
+                nodes_r, nodes_v, flat[mask] - key * self.window_s
+            )
+
+        shape = np.shape(seconds)
+        return r.reshape((3,) + shape), v.reshape((3,) + shape)
+
+    def _window(self, key: int) -> tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None:
+                self._windows.move_to_end(key)
+                self.hits += 1
+                return window
+            self.misses += 1
+
+        # 在锁外传播, 避免阻塞其他线程的命中查询
+        start_s = key * self.window_s
+        offsets = np.concatenate((self._node_s, self._check_s))
+        r, v = self.propagate(self.ts.tt_jd(J2000, (start_s + offsets) / DAY_S))
+        n_nodes = len(self._node_s)
+        window = (r[:, :n_nodes].copy(), v[:, :n_nodes].copy())
+
+        check_r, check_v = self._interpolate(*window, self._check_s)
+        position_err = float(np.max(np.linalg.norm(check_r - r[:, n_nodes:], axis=0)))
+        velocity_err = float(np.max(np.linalg.norm(check_v - v[:, n_nodes:], axis=0)))
+
+        with self._lock:
+            self._observed["position_m"] = max(self._observed["position_m"], position_err)
+            self._observed["velocity_m_per_s"] = max(
+                self._observed["velocity_m_per_s"], velocity_err
+            )
+            self._windows[key] = window
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+                self.evictions += 1
+        return window
+
+    def _interpolate(
+        self, nodes_r: np.ndarray, nodes_v: np.ndarray, offset_s: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        h = self.step_s
+        i = np.clip((offset_s // h).astype(np.int64), 0, len(self._node_s) - 2)
+        u = (offset_s - self._node_s[i]) / h
+        u2, u3 = u * u, u * u * u
+
+        p0, p1 = nodes_r[:, i], nodes_r[:, i + 1]
+        m0, m1 = nodes_v[:, i] * h, nodes_v[:, i + 1] * h
+
+        r = (
+            (2 * u3 - 3 * u2 + 1) * p0
+            + (u3 - 2 * u2 + u) * m0
+            + (-2 * u3 + 3 * u2) * p1
+            + (u3 - u2) * m1
+        )
+        v = (
+            (6 * u2 - 6 * u) * p0
+            + (3 * u2 - 4 * u + 1) * m0
+            + (-6 * u2 + 6 * u) * p1
+            + (3 * u2 - 2 * u) * m1
+        ) / h
+        return r, v
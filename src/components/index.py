@@ -0,0 +1,85 @@
+"""结果集的空间索引: 单位球面坐标上的 KD 树, 用于任意地面点的多普勒查询。"""
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from components.results import COLUMN_INDEX, load_columns
+
+R_KM = 6371.0
+
+
+def latlon_to_unit_xyz(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """经纬度 (°) 转单位球面坐标, 形状 (n, 3)"""
+    lat = np.radians(np.atleast_1d(np.asarray(lats, dtype=np.float64)))
+    lon = np.radians(np.atleast_1d(np.asarray(lons, dtype=np.float64)))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+class DopplerIndex:
+    """对一组 (lat, lon, doppler) 样本建立的 KD 树。
+
+    树建在单位球面的三维坐标上, 因此没有经度 ±180° 与极点的断裂,
+    弦长与大圆距离单调对应。
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, doppler: np.ndarray):
+        self.doppler = np.asarray(doppler, dtype=np.float64)
+        self.tree = cKDTree(latlon_to_unit_xyz(lats, lons))
+
+    @classmethod
+    def from_result(cls, path: Path) -> "DopplerIndex":
+        """由列式结果文件 (components.results) 建立索引"""
+        data = load_columns(path)
+        return cls(
+            data[COLUMN_INDEX["lat"]], data[COLUMN_INDEX["lon"]], data[COLUMN_INDEX["doppler"]]
+        )
+
+    @staticmethod
+    def path_for(result_path: Path) -> Path:
+        """结果文件旁的索引文件路径"""
+        return Path(result_path).with_suffix(".kdtree.pkl")
+
+    def save(self, path: Path) -> None:
+        with open(path, "wb") as f:
+            pickle.dump((self.tree, self.doppler), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Path) -> "DopplerIndex":
+        index = cls.__new__(cls)
+        with open(path, "rb") as f:
+            index.tree, index.doppler = pickle.load(f)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.doppler)
+
+    def nearest(self, lats: np.ndarray, lons: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """最近样本的多普勒 (Hz) 及其大圆距离 (km)"""
+        chord, i = self.tree.query(latlon_to_unit_xyz(lats, lons), k=1, workers=-1)
+        return self.doppler[i], _chord_to_km(chord)
+
+    def interpolate(
+        self, lats: np.ndarray, lons: np.ndarray, k: int = 8, power: float = 2.0
+    ) -> np.ndarray:
+        """k 近邻反距离加权插值的多普勒 (Hz)"""
+        k = min(k, len(self))
+        chord, i = self.tree.query(latlon_to_unit_xyz(lats, lons), k=k, workers=-1)
+        chord = chord.reshape(-1, k)
+        values = self.doppler[i.reshape(-1, k)]
+
+        with np.errstate(divide="ignore"):
+            weights = 1.0 / chord**power
+        # 与样本重合的查询点直接取样本值
+        exact = chord[:, 0] == 0
+        weights[exact] = 0.0
+        weights[exact, 0] = 1.0
+
+        return np.sum(weights * values, axis=1) / np.sum(weights, axis=1)
+
+
+def _chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * R_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
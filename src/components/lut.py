@@ -0,0 +1,225 @@
+"""预计算的多普勒查找表: 每个时刻一张以星下点为中心的覆盖区网格, 三线性插值查询。"""
+
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+from skyfield.api import Time
+
+from components.sats import Sat, doppler_from_state, doppler_rate_from_state, ground_xyz, itrs_to_latlon
+from utils import footprint_central_angle_rad
+
+DAY_S = 86400.0
+
+
+def _to_local(lats, lons, lat_c, lon_c) -> tuple[np.ndarray, np.ndarray]:
+    """地面点在以 (lat_c, lon_c) 为 (0, 0) 的旋转坐标系中的 (纬度, 经度) (°)
+
+    中心附近两轴分别沿南北、东西方向, 覆盖区 (地心角 ≤ ψ) 落在 [-ψ, ψ]² 内,
+    与中心所在的经度、纬度无关, 跨越 ±180° 或极区时也不会展宽。
+    """
+    lat, dlon, lat_c = np.radians(lats), np.radians(np.asarray(lons) - lon_c), np.radians(lat_c)
+    x, y, z = np.cos(lat) * np.cos(dlon), np.cos(lat) * np.sin(dlon), np.sin(lat)
+    # 绕 y 轴旋转 lat_c, 使中心转到 x 轴上
+    x, z = x * np.cos(lat_c) + z * np.sin(lat_c), z * np.cos(lat_c) - x * np.sin(lat_c)
+    return np.degrees(np.arcsin(np.clip(z, -1.0, 1.0))), np.degrees(np.arctan2(y, x))
+
+
+def _from_local(u, v, lat_c, lon_c) -> tuple[np.ndarray, np.ndarray]:
+    """_to_local 的逆变换, 返回 (lat (°), lon (°)), 经度在 [-180, 180)"""
+    u, v, lat_c = np.radians(u), np.radians(v), np.radians(lat_c)
+    x, y, z = np.cos(u) * np.cos(v), np.cos(u) * np.sin(v), np.sin(u)
+    x, z = x * np.cos(lat_c) - z * np.sin(lat_c), z * np.cos(lat_c) + x * np.sin(lat_c)
+    lon = lon_c + np.degrees(np.arctan2(y, x))
+    return np.degrees(np.arcsin(np.clip(z, -1.0, 1.0))), (lon + 180) % 360 - 180
+
+
+class DopplerTable:
+    """单颗卫星的多普勒 / 多普勒变化率查找表。
+
+    每个时刻一张以星下点为中心、覆盖覆盖区的 (u, v) 网格 (见 _to_local),
+    表的大小只与时刻数和覆盖区大小有关, 与地面轨迹的长度、走向无关。
+    数据保存为 float32 的 .npy, 形状 (2, n_times, n_u, n_v),
+    第 0 层为多普勒 (Hz), 第 1 层为多普勒变化率 (Hz/s); 各时刻的星下点、
+    坐标轴与误差界保存在同名 .json 中。load() 以只读内存映射打开,
+    多个进程共享同一份页缓存。
+    """
+
+    # 误差界 = 抽样实测最大误差 × 安全系数
+    SAFETY_FACTOR = 1.5
+
+    def __init__(self, data: np.ndarray, meta: dict, path: Path | None = None):
+        self.data = data
+        self.meta = meta
+        self.path = path
+        self._centers = np.array((meta["center_lat"], meta["center_lon"]))
+
+    @staticmethod
+    def _meta_path(path: Path) -> Path:
+        return Path(path).with_suffix(".json")
+
+    @classmethod
+    def build(
+        cls,
+        sat: Sat,
+        times: Time,
+        path: Path,
+        res_deg: float = 0.1,
+        e0_deg: float = 30,
+        half_width_deg: float | None = None,
+        block: int = 32,
+        n_check: int = 4096,
+    ) -> "DopplerTable":
+        """预计算并保存查找表
+
+        Args:
+            sat: 卫星
+            times: 等间隔的数组 Time, 如 Sat.time_grid()
+            path: .npy 保存路径 (元数据保存在同名 .json)
+            res_deg: 网格分辨率 (°, 地心角)
+            e0_deg: 覆盖区的最小仰角 (°), 与时间段内卫星的最大高度一起决定网格半宽
+            half_width_deg: 直接给出网格半宽 (°), 缺省由 e0_deg 计算
+            block: 每次传播的时刻数, 限制内存占用
+            n_check: 用于估计误差界的抽样点数
+        """
+        tt = np.atleast_1d(times.tt)
+        n_times = len(tt)
+        step_s = float((tt[-1] - tt[0]) * DAY_S / (n_times - 1)) if n_times > 1 else 1.0
+
+        r, _ = sat.itrs_state(times)
+        center_lat, center_lon, height = (np.atleast_1d(a) for a in itrs_to_latlon(r))
+        if half_width_deg is None:
+            # 高度越大覆盖区越大, 取时间段内的最大高度
+            half_width_deg = math.degrees(footprint_central_angle_rad(float(np.max(height)), e0_deg))
+        n_half = math.ceil(half_width_deg / res_deg)
+        axis = np.arange(-n_half, n_half + 1) * res_deg
+        u_grid, v_grid = np.meshgrid(axis, axis, indexing="ij")
+
+        data = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.float32, shape=(2, n_times, len(axis), len(axis))
+        )
+        for start in range(0, n_times, block):
+            stop = min(start + block, n_times)
+            r_sat, v_sat, a_sat = sat.itrs_state_and_acceleration(times[start:stop])
+            for k, i in enumerate(range(start, stop)):
+                r_gs = ground_xyz(*_from_local(u_grid.ravel(), v_grid.ravel(), center_lat[i], center_lon[i]))
+                _, _, doppler, _ = doppler_from_state(r_sat[:, k], v_sat[:, k], r_gs, sat.signal_freq)
+                rate = doppler_rate_from_state(r_sat[:, k], v_sat[:, k], a_sat[:, k], r_gs, sat.signal_freq)
+                data[0, i] = doppler.reshape(u_grid.shape)
+                data[1, i] = rate.reshape(u_grid.shape)
+        data.flush()
+
+        meta = {
+            "tle_lines": list(sat.tle_lines),
+            "signal_freq": sat.signal_freq,
+            "t0_whole": float(np.atleast_1d(times.whole)[0]),
+            "t0_fraction": float(np.atleast_1d(times.tt_fraction)[0]),
+            "step_s": step_s,
+            "res_deg": res_deg,
+            "half_width_deg": float(n_half * res_deg),
+            "center_lat": center_lat.tolist(),
+            "center_lon": center_lon.tolist(),
+        }
+        table = cls(data, meta, Path(path))
+        table.meta.update(table.estimate_error(sat, n_check))
+        with open(cls._meta_path(path), "w") as f:
+            json.dump(table.meta, f, indent=2)
+        return table
+
+    @classmethod
+    def load(cls, path: Path) -> "DopplerTable":
+        with open(cls._meta_path(path), "r") as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode="r"), meta, Path(path))
+
+    def __reduce__(self):
+        # 跨进程时只传路径, 在目标进程重新内存映射
+        if self.path is None:
+            raise TypeError("only saved tables can be pickled")
+        return (DopplerTable.load, (self.path,))
+
+    @property
+    def error_bound(self) -> dict:
+        return {
+            "doppler_hz": self.meta["max_error_hz"] * self.SAFETY_FACTOR,
+            "doppler_rate_hz_per_s": self.meta["max_rate_error_hz_per_s"] * self.SAFETY_FACTOR,
+        }
+
+    def query(
+        self, time: Time, lats: np.ndarray, lons: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """三线性插值的多普勒 (Hz) 与多普勒变化率 (Hz/s)
+
+        time 可以是标量 Time, 或与 lats / lons 逐点对应的数组 Time。
+        超出表的时间范围或不在相邻时刻网格内的点返回 nan。
+        """
+        seconds = (np.asarray(time.whole) - self.meta["t0_whole"]) * DAY_S + (
+            np.asarray(time.tt_fraction) - self.meta["t0_fraction"]
+        ) * DAY_S
+        return self._query_seconds(seconds, lats, lons)
+
+    def _query_seconds(
+        self, seconds: np.ndarray, lats: np.ndarray, lons: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        seconds, lats, lons = np.broadcast_arrays(
+            seconds, np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+        )
+        _, n_t, n_u, n_v = self.data.shape
+        x = seconds / self.meta["step_s"]
+        valid = (x >= 0) & (x <= n_t - 1)
+        it = np.clip(np.floor(x).astype(np.int64), 0, max(n_t - 2, 0))
+        ft = np.clip(x - it, 0.0, 1.0) if n_t > 1 else np.zeros_like(x)
+
+        # 相邻两个时刻各在自己的网格上双线性插值, 再按时间线性插值
+        res, half = self.meta["res_deg"], self.meta["half_width_deg"]
+        out = np.zeros((2,) + seconds.shape)
+        for dt in (0, 1):
+            wt = ft if dt else 1 - ft
+            jt = np.minimum(it + dt, n_t - 1)
+            u, v = _to_local(lats, lons, *self._centers[:, jt])
+            fu, fv = (u + half) / res, (v + half) / res
+            # 权重为 0 的时刻不要求点在其网格内
+            valid &= ((fu >= 0) & (fu <= n_u - 1) & (fv >= 0) & (fv <= n_v - 1)) | (wt == 0)
+            iu = np.clip(np.floor(fu).astype(np.int64), 0, n_u - 2)
+            iv = np.clip(np.floor(fv).astype(np.int64), 0, n_v - 2)
+            fu, fv = np.clip(fu - iu, 0.0, 1.0), np.clip(fv - iv, 0.0, 1.0)
+            for du in (0, 1):
+                wu = fu if du else 1 - fu
+                for dv in (0, 1):
+                    wv = fv if dv else 1 - fv
+                    out += (wt * wu * wv) * self.data[:, jt, iu + du, iv + dv]
+
+        out[:, ~valid] = np.nan
+        return out[0], out[1]
+
+    def estimate_error(self, sat: Sat, n_check: int = 4096) -> dict:
+        """与精确计算比较, 在表内随机时刻、该时刻星下点周围的覆盖区内随机抽样估计误差"""
+        rng = np.random.default_rng(0)
+        n_times = max(1, int(math.sqrt(n_check)))
+        n_points = max(1, n_check // n_times)
+
+        n_t = self.data.shape[1]
+        half = self.meta["half_width_deg"]
+        seconds = rng.uniform(0, max(n_t - 1, 0), n_times) * self.meta["step_s"]
+        times = sat.ts.tt_jd(
+            np.full(n_times, self.meta["t0_whole"]), self.meta["t0_fraction"] + seconds / DAY_S
+        )
+        r, _ = sat.itrs_state(times)
+        center_lat, center_lon, _ = itrs_to_latlon(r)
+
+        err, rate_err = [], []
+        for k in range(n_times):
+            u, v = rng.uniform(-half, half, (2, n_points))
+            lats, lons = _from_local(u, v, center_lat[k], center_lon[k])
+            exact_doppler, exact_rate = sat.get_doppler_sweep(times[k : k + 1], lats, lons)
+            doppler, rate = self._query_seconds(seconds[k], lats, lons)
+            err.append(np.abs(doppler - exact_doppler[0]))
+            rate_err.append(np.abs(rate - exact_rate[0]))
+
+        err, rate_err = np.concatenate(err), np.concatenate(rate_err)
+        return {
+            "max_error_hz": float(np.nanmax(err)),
+            "rms_error_hz": float(np.sqrt(np.nanmean(err**2))),
+            "max_rate_error_hz_per_s": float(np.nanmax(rate_err)),
+        }
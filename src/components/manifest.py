@@ -0,0 +1,135 @@
+"""运行清单: 记录一次运行的参数、任务划分、完成状态与输出校验和, 支持断点续跑。"""
+
+import json
+import threading
+from pathlib import Path
+
+from components.results import atomic_path, file_checksum
+
+MANIFEST_NAME = "manifest.json"
+
+
+class RunManifest:
+    """一次运行的清单, 保存在 run_dir/manifest.json。
+
+    每个任务记录其处理的范围 [offset, offset + n)、输出文件与 sha256;
+    任务完成 (输出已原子写入) 后调用 mark_done(), 清单本身也原子地重写,
+    因此进程在任何时刻被杀死, 清单中标记为完成的任务都有完整的输出。
+    续跑时 verified() 重新校验输出, 缺失或校验失败的任务视为未完成。
+    """
+
+    def __init__(self, run_dir: Path, params: dict, tasks: dict[int, dict] | None = None):
+        self.run_dir = Path(run_dir)
+        self.params = params
+        self.tasks: dict[int, dict] = tasks or {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.run_dir / MANIFEST_NAME
+
+    @property
+    def output_dir(self) -> Path:
+        """任务输出目录"""
+        return self.run_dir / "intermediate"
+
+    @classmethod
+    def load(cls, run_dir: Path) -> "RunManifest":
+        """读取已有清单"""
+        with open(Path(run_dir) / MANIFEST_NAME, "r") as f:
+            data = json.load(f)
+        tasks = {int(task_id): record for task_id, record in data["tasks"].items()}
+        return cls(run_dir, data["params"], tasks)
+
+    @classmethod
+    def open(cls, run_dir: Path, params: dict, resume: bool = False) -> "RunManifest":
+        """新建清单, resume 时读取已有清单 (参数必须一致)"""
+        run_dir = Path(run_dir)
+        path = run_dir / MANIFEST_NAME
+        if resume and path.exists():
+            manifest = cls.load(run_dir)
+            # 经 JSON 往返比较, 元组与列表视为相同
+            if manifest.params != json.loads(json.dumps(params)):
+                raise ValueError(f"cannot resume {run_dir}: run parameters differ from the manifest")
+            return manifest
+
+        manifest = cls(run_dir, params)
+        manifest.output_dir.mkdir(parents=True, exist_ok=True)
+        # 新运行不复用旧输出
+        for stale in manifest.output_dir.glob("*.npy"):
+            stale.unlink()
+        manifest.save()
+        return manifest
+
+    def save(self) -> None:
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        with self._save_lock:
+            with self._lock:
+                data = {"params": self.params, "tasks": {str(k): v for k, v in sorted(self.tasks.items())}}
+            with atomic_path(self.path) as tmp, open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+
+    @property
+    def next_task_id(self) -> int:
+        with self._lock:
+            return max(self.tasks, default=-1) + 1
+
+    def add_task(self, task_id: int, offset: int, n: int) -> Path:
+        """登记已派发的任务, 返回其输出路径"""
+        output = self.output_dir / f"{task_id}.npy"
+        with self._lock:
+            self.tasks[task_id] = {
+                "offset": offset,
+                "n": n,
+                "status": "pending",
+                "file": output.name,
+                "sha256": None,
+            }
+        return output
+
+    def mark_done(self, task_id: int) -> None:
+        """任务输出已写入, 记录校验和并保存清单"""
+        with self._lock:
+            record = self.tasks[task_id]
+        checksum = file_checksum(self.output_dir / record["file"])
+        with self._lock:
+            record["status"] = "done"
+            record["sha256"] = checksum
+        self.save()
+
+    def verified(self) -> list[tuple[int, dict]]:
+        """校验通过的已完成任务 (task_id, record), 按 offset 排序
+
+        输出缺失或校验和不符的任务及所有未完成任务从清单中移除, 其范围会被重新计算;
+        因此只应在运行开始前 (续跑) 或全部任务结束后 (合并) 调用。
+        """
+        with self._lock:
+            tasks = list(self.tasks.items())
+
+        good, bad = [], []
+        for task_id, record in tasks:
+            output = self.output_dir / record["file"]
+            if (
+                record["status"] == "done"
+                and output.exists()
+                and file_checksum(output) == record["sha256"]
+            ):
+                good.append((task_id, record))
+            else:
+                bad.append(task_id)
+
+        with self._lock:
+            for task_id in bad:
+                del self.tasks[task_id]
+        if bad:
+            self.save()
+        return sorted(good, key=lambda item: item[1]["offset"])
+
+    def completed_ranges(self) -> list[tuple[int, int]]:
+        """校验通过的 (offset, n), 按 offset 排序"""
+        return [(record["offset"], record["n"]) for _, record in self.verified()]
+
+    def verified_outputs(self) -> list[Path]:
+        """校验通过的输出文件, 按 offset 排序"""
+        return [self.output_dir / record["file"] for _, record in self.verified()]
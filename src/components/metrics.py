@@ -0,0 +1,242 @@
+"""执行器与任务的运行指标: 排队/运行时间、worker 利用率、队列深度、吞吐与分阶段耗时。
+
+任务内部用 phase() 计时各阶段, 用 add_points() 记录处理的点数, 用 count() 记录事件数 (如缓存命中);
+三者写入当前任务的 TaskRecord (contextvars, 线程与进程 worker 中均有效),
+没有正在执行的任务时为空操作, 因此任务也可以脱离执行器直接 run()。
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+_current: contextvars.ContextVar["TaskRecord | None"] = contextvars.ContextVar(
+    "current_task_record", default=None
+)
+
+
+@dataclass
+class TaskRecord:
+    """单个任务的计时记录, 时间戳为 time.time() (跨进程可比)"""
+
+    task_id: int
+    task_type: str
+    submitted: float
+    started: float = 0.0
+    finished: float = 0.0
+    worker: str = ""
+    points: int = 0
+    phases: dict[str, float] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def queue_wait(self) -> float:
+        return self.started - self.submitted
+
+    @property
+    def run_time(self) -> float:
+        return self.finished - self.started
+
+
+@contextmanager
+def phase(name: str):
+    """记录任务内一个阶段 (如 sampling, propagation, doppler, io) 的耗时"""
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.phases[name] = record.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def add_points(n: int) -> None:
+    """记录当前任务处理的地面点数"""
+    record = _current.get()
+    if record is not None:
+        record.points += int(n)
+
+
+def count(name: str, n: int = 1) -> None:
+    """记录当前任务中一个事件 (如 cache_hits, cache_misses) 发生的次数"""
+    record = _current.get()
+    if record is not None:
+        record.counts[name] = record.counts.get(name, 0) + int(n)
+
+
+def run_instrumented(task, submitted: float, inputs: tuple = ()):
+    """在 worker 中执行 task.run(*inputs), 返回 (result, TaskRecord); 任务异常时 result 为该异常"""
+    record = TaskRecord(task.task_id, type(task).__name__, submitted)
+    record.worker = f"{os.getpid()}:{threading.current_thread().name}"
+    token = _current.set(record)
+    record.started = time.time()
+    try:
+        result = task.run(*inputs)
+    except Exception as e:
+        result = e
+        record.error = repr(e)
+    finally:
+        record.finished = time.time()
+        _current.reset(token)
+    return result, record
+
+
+def _stats(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    arr = np.asarray(values)
+    return {
+        "count": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "max": float(arr.max()),
+    }
+
+
+class ExecutorMetrics:
+    """汇总一个 TaskExecutor 的所有任务记录, 线程安全。"""
+
+    def __init__(self, num_workers: int, mode: str):
+        self.num_workers = num_workers
+        self.mode = mode
+        self.created = time.time()
+        self.records: list[TaskRecord] = []
+        self.submitted = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def task_submitted(self) -> float:
+        with self._lock:
+            self.submitted += 1
+        return time.time()
+
+    def task_cancelled(self) -> None:
+        with self._lock:
+            self.cancelled += 1
+
+    def task_finished(self, record: TaskRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    @property
+    def in_flight(self) -> int:
+        """已提交但未完成 (也未取消) 的任务数"""
+        with self._lock:
+            return self.submitted - len(self.records) - self.cancelled
+
+    def snapshot(self, queue_depth: int | None = None) -> dict:
+        """当前指标快照
+
+        Args:
+            queue_depth: 尚未开始的任务数, 由执行器提供;
+                缺省时按 in_flight - num_workers 估计
+        """
+        with self._lock:
+            records = list(self.records)
+            submitted = self.submitted
+            cancelled = self.cancelled
+        now = time.time()
+        elapsed = max(now - self.created, 1e-9)
+        in_flight = submitted - len(records) - cancelled
+        if queue_depth is None:
+            queue_depth = max(0, in_flight - self.num_workers)
+
+        busy: dict[str, float] = {}
+        phases: dict[str, float] = {}
+        counts: dict[str, int] = {}
+        for record in records:
+            busy[record.worker] = busy.get(record.worker, 0.0) + record.run_time
+            for name, seconds in record.phases.items():
+                phases[name] = phases.get(name, 0.0) + seconds
+            for name, n in record.counts.items():
+                counts[name] = counts.get(name, 0) + n
+
+        points = sum(record.points for record in records)
+        run_time = sum(busy.values())
+        return {
+            "mode": self.mode,
+            "num_workers": self.num_workers,
+            "elapsed_s": elapsed,
+            "tasks_submitted": submitted,
+            "tasks_completed": len(records),
+            "tasks_failed": sum(record.error is not None for record in records),
+            "tasks_cancelled": cancelled,
+            "in_flight": in_flight,
+            "queue_depth": queue_depth,
+            "queue_wait_s": _stats([record.queue_wait for record in records]),
+            "run_time_s": _stats([record.run_time for record in records]),
+            "points": points,
+            "points_per_s": points / elapsed,
+            # 所有 worker 忙碌时间之和 / (worker 数 × 墙钟时间)
+            "utilization": run_time / (self.num_workers * elapsed),
+            "worker_utilization": {worker: t / elapsed for worker, t in busy.items()},
+            "phase_s": phases,
+            "counts": counts,
+        }
+
+    def to_prometheus(self, snapshot: dict | None = None) -> str:
+        """Prometheus 文本格式"""
+        s = snapshot if snapshot is not None else self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP caldoppler_{name} {help_text}")
+            lines.append(f"# TYPE caldoppler_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"caldoppler_{name}{label_text} {value}")
+
+        metric("tasks_completed_total", "counter", "Completed tasks", [({}, s["tasks_completed"])])
+        metric("tasks_failed_total", "counter", "Failed tasks", [({}, s["tasks_failed"])])
+        metric("queue_depth", "gauge", "Tasks waiting for a worker", [({}, s["queue_depth"])])
+        metric("points_total", "counter", "Ground points processed", [({}, s["points"])])
+        metric("points_per_second", "gauge", "Ground points per second", [({}, s["points_per_s"])])
+        for key in ("queue_wait_s", "run_time_s"):
+            metric(
+                f"task_{key[:-2]}_seconds",
+                "summary",
+                f"Task {key[:-2].replace('_', ' ')}",
+                [({"quantile": "0.5"}, s[key]["p50"]), ({"quantile": "0.95"}, s[key]["p95"])],
+            )
+        metric(
+            "worker_utilization",
+            "gauge",
+            "Fraction of wall time each worker spent running tasks",
+            [({"worker": w}, u) for w, u in s["worker_utilization"].items()],
+        )
+        metric(
+            "phase_seconds_total",
+            "counter",
+            "Time spent in each task phase",
+            [({"phase": p}, t) for p, t in s["phase_s"].items()],
+        )
+        metric(
+            "events_total",
+            "counter",
+            "Events counted by tasks",
+            [({"event": e}, n) for e, n in s["counts"].items()],
+        )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Path, snapshot: dict | None = None) -> None:
+        """写入 JSON (含逐任务记录) 与同名 .prom 文本"""
+        s = snapshot if snapshot is not None else self.snapshot()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            records = [asdict(record) for record in self.records]
+        with open(path, "w") as f:
+            json.dump({"summary": s, "tasks": records}, f, indent=2)
+        with open(path.with_suffix(".prom"), "w") as f:
+            f.write(self.to_prometheus(s))
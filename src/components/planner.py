@@ -0,0 +1,165 @@
+"""自适应分块: 按实测吞吐动态决定每个任务的点数, 空闲 worker 随时领取剩余范围。"""
+
+from concurrent.futures import FIRST_COMPLETED, wait
+from time import perf_counter
+from typing import Callable, Iterator
+
+import numpy as np
+from skyfield.api import Time
+
+from components.sats import Sat
+from components.simulate import TaskExecutor
+from components.tasks import CalDopplerTask, Task
+
+
+class ChunkPlanner:
+    """把 total 个采样点切分为任务并动态派发。
+
+    剩余的点是一个共享范围 [next, total), 执行器中只保持少量在途任务,
+    任一任务完成 (即有 worker 空闲) 时立即从剩余范围切下下一块提交。
+    块大小取 block 的整数倍:
+
+    - 开始时每块一个 block, 用于测量吞吐;
+    - 之后按每 worker 实测吞吐 × target_task_s 估计, 使单任务耗时接近目标,
+      摊薄每个任务的固定开销 (日志、传播、Future、进程间传输);
+    - 剩余点数不多时逐步缩小 (不超过 剩余 / (2 × worker 数)), 使各 worker 几乎同时结束。
+    """
+
+    def __init__(
+        self,
+        executor: TaskExecutor,
+        make_task: Callable[[int, int, int], Task],
+        total: int,
+        block: int = 100,
+        target_task_s: float = 0.1,
+        max_blocks: int | None = None,
+        in_flight_per_worker: int = 2,
+        max_in_flight: int | None = None,
+        completed: list[tuple[int, int]] | None = None,
+        first_task_id: int = 0,
+    ):
+        """
+        Args:
+            executor: 任务执行器
+            make_task: (task_id, offset, n) -> Task, 生成处理 [offset, offset + n) 的任务
+            total: 总点数
+            block: 块大小的粒度, 与随机数流的划分一致时结果与分块无关
+            target_task_s: 目标单任务耗时 (s)
+            max_blocks: 单任务最多的 block 数
+            in_flight_per_worker: 每个 worker 的在途任务数, 大于 1 时 worker 不必等待派发
+            max_in_flight: 在途任务数上限, 缺省为 worker 数 × in_flight_per_worker
+            completed: 已完成 (续跑时跳过) 的 (offset, n) 范围
+            first_task_id: 第一个任务的 task_id, 续跑时接着已有任务编号
+        """
+        self.executor = executor
+        self.make_task = make_task
+        self.total = total
+        self.block = block
+        self.target_task_s = target_task_s
+        self.max_blocks = max_blocks
+        self.max_in_flight = max_in_flight or executor.num_workers * in_flight_per_worker
+
+        self.first_task_id = first_task_id
+
+        self.chunks: list[tuple[int, int]] = []  # 已派发的 (offset, n)
+        self._next = 0
+        self._skip = sorted(completed or [])
+        self._skip_index = 0
+        self._done_points = 0
+        self._start: float | None = None
+
+    @property
+    def throughput(self) -> float:
+        """每个 worker 的实测吞吐 (点/s), 尚无完成任务时为 0"""
+        if self._start is None or self._done_points == 0:
+            return 0.0
+        elapsed = perf_counter() - self._start
+        return self._done_points / elapsed / self.executor.num_workers
+
+    @property
+    def remaining(self) -> int:
+        """尚未派发的点数 (不含已完成的范围)"""
+        return self.total - self._next - sum(n for _, n in self._skip[self._skip_index :])
+
+    def _skip_completed(self) -> None:
+        while self._skip_index < len(self._skip) and self._skip[self._skip_index][0] <= self._next:
+            offset, n = self._skip[self._skip_index]
+            self._next = max(self._next, offset + n)
+            self._skip_index += 1
+
+    def chunk_size(self) -> int:
+        """下一个任务的点数"""
+        remaining = self.remaining
+        blocks = max(1, int(self.throughput * self.target_task_s / self.block))
+        if self.max_blocks is not None:
+            blocks = min(blocks, self.max_blocks)
+        tail = -(-remaining // (2 * self.executor.num_workers * self.block))
+        blocks = max(1, min(blocks, tail))
+        return min(blocks * self.block, remaining)
+
+    def next_task(self) -> tuple[int, int, Task] | None:
+        """从剩余范围切下下一块, 返回 (offset, n, task); 已全部派发时返回 None"""
+        self._skip_completed()
+        if self._next >= self.total:
+            return None
+        if self._start is None:
+            self._start = perf_counter()
+        n = self.chunk_size()
+        if self._skip_index < len(self._skip):
+            # 不覆盖下一个已完成的范围
+            n = min(n, self._skip[self._skip_index][0] - self._next)
+        offset = self._next
+        self._next += n
+        task = self.make_task(self.first_task_id + len(self.chunks), offset, n)
+        self.chunks.append((offset, n))
+        return offset, n, task
+
+    def task_done(self, n: int) -> None:
+        """记录一个任务完成的点数, 用于估计吞吐"""
+        self._done_points += n
+
+    def run(self) -> Iterator[tuple[int, object]]:
+        """派发全部任务, 按完成顺序产出 (offset, result)"""
+        pending: dict = {}
+        while True:
+            while len(pending) < self.max_in_flight and (item := self.next_task()) is not None:
+                offset, n, task = item
+                pending[self.executor.submit(task)] = (offset, n)
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset, n = pending.pop(future)
+                self.task_done(n)
+                yield offset, future.result()
+
+
+def cal_doppler_tasks(
+    sat: Sat,
+    time: Time,
+    total: int,
+    block: int = 100,
+    run_seed: int | None = None,
+    **task_kwargs,
+) -> Callable[[int, int, int], CalDopplerTask]:
+    """ChunkPlanner 的 make_task: 每 block 个点一个由 run_seed 派生的随机数流
+
+    结果可复现且与分块方式无关; task_kwargs 传给 CalDopplerTask (如 sampling, grid_shape)。
+    """
+    seeds = np.random.SeedSequence(run_seed).spawn(-(-total // block))
+
+    def make_task(task_id: int, offset: int, n: int) -> CalDopplerTask:
+        first = offset // block
+        return CalDopplerTask(
+            task_id=task_id,
+            sat=sat,
+            time=time,
+            n_samples=n,
+            seed=seeds[first : first + -(-n // block)],
+            seed_block=block,
+            grid_offset=offset,
+            **{"persist": False, **task_kwargs},
+        )
+
+    return make_task
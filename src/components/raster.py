@@ -0,0 +1,89 @@
+"""全球覆盖栅格: 每个任务生成部分栅格, 合并为逐格子的向量化归约。"""
+
+import math
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from utils import latlon_grid_index
+
+
+class CoverageRaster:
+    """全球经纬度栅格上的覆盖统计。
+
+    每个格子记录: 采样点数 count、覆盖该格子的卫星位掩码 mask
+    (第 i 位对应 sat_index = i, 每 64 颗卫星一个 uint64 字)、
+    以及多普勒的最小/最大值。内存只与格子数有关, 与采样点数无关。
+    """
+
+    def __init__(self, res_deg: float = 1.0, n_sats: int = 1):
+        self.res_deg = res_deg
+        self.n_sats = n_sats
+        self.shape = (math.ceil(180 / res_deg), math.ceil(360 / res_deg))
+        n_cells = self.shape[0] * self.shape[1]
+        n_words = max(1, math.ceil(n_sats / 64))
+
+        self.count = np.zeros(n_cells, dtype=np.uint32)
+        self.mask = np.zeros((n_words, n_cells), dtype=np.uint64)
+        self.doppler_min = np.full(n_cells, np.inf)
+        self.doppler_max = np.full(n_cells, -np.inf)
+
+    def accumulate(
+        self, lats: np.ndarray, lons: np.ndarray, doppler: np.ndarray, sat_index: int
+    ) -> None:
+        """累加一颗卫星的采样点"""
+        i, j = latlon_grid_index(lats, lons, self.res_deg)
+        cells = i * self.shape[1] + j
+        n_cells = len(self.count)
+
+        self.count += np.bincount(cells, minlength=n_cells).astype(np.uint32)
+        touched = np.unique(cells)
+        self.mask[sat_index // 64, touched] |= np.uint64(1) << np.uint64(sat_index % 64)
+        np.minimum.at(self.doppler_min, cells, doppler)
+        np.maximum.at(self.doppler_max, cells, doppler)
+
+    def merge(self, other: "CoverageRaster") -> "CoverageRaster":
+        """与另一部分栅格逐格子合并 (原地), 返回 self"""
+        if other.shape != self.shape or other.mask.shape != self.mask.shape:
+            raise ValueError("cannot merge rasters with different grids")
+        self.count += other.count
+        self.mask |= other.mask
+        np.minimum(self.doppler_min, other.doppler_min, out=self.doppler_min)
+        np.maximum(self.doppler_max, other.doppler_max, out=self.doppler_max)
+        return self
+
+    @classmethod
+    def reduce(cls, rasters: Iterable["CoverageRaster"]) -> "CoverageRaster":
+        """合并一组部分栅格"""
+        rasters = iter(rasters)
+        total = next(rasters)
+        for raster in rasters:
+            total.merge(raster)
+        return total
+
+    def n_covering(self) -> np.ndarray:
+        """每个格子被多少颗卫星覆盖, 形状 self.shape"""
+        bits = np.unpackbits(self.mask.view(np.uint8).reshape(*self.mask.shape, 8), axis=-1)
+        return bits.sum(axis=(0, 2)).reshape(self.shape)
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            res_deg=self.res_deg,
+            n_sats=self.n_sats,
+            count=self.count.reshape(self.shape),
+            mask=self.mask.reshape(-1, *self.shape),
+            doppler_min=self.doppler_min.reshape(self.shape),
+            doppler_max=self.doppler_max.reshape(self.shape),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "CoverageRaster":
+        data = np.load(path)
+        raster = cls(float(data["res_deg"]), int(data["n_sats"]))
+        raster.count = data["count"].ravel()
+        raster.mask = data["mask"].reshape(len(raster.mask), -1)
+        raster.doppler_min = data["doppler_min"].ravel()
+        raster.doppler_max = data["doppler_max"].ravel()
+        return raster
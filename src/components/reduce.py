@@ -0,0 +1,158 @@
+"""在 futures 完成时流式聚合任务结果, 取代中间文件 + MergeTask 的磁盘往返。"""
+
+from concurrent.futures import Future, as_completed
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from components.results import COLUMN_INDEX, COLUMNS, atomic_path
+from utils import latlon_grid_index
+
+
+class DopplerReducer:
+    """多普勒结果的在线聚合器。
+
+    维护总体的 count / min / max / mean / std、多普勒直方图以及
+    经纬度网格上每个格子的 count / min / max / mean。
+    可选地把逐点原始数据直接写入一个预分配的列式文件 (按完成顺序)。
+    均值与方差按 count / mean / M2 逐块合并 (Chan 等的并行算法), 不会因相减而丢失精度。
+    """
+
+    def __init__(
+        self,
+        doppler_range: tuple[float, float],
+        n_bins: int = 200,
+        grid_res_deg: float = 1.0,
+        raw_path: Path | None = None,
+        raw_capacity: int = 0,
+    ):
+        """
+        Args:
+            doppler_range: 直方图范围 (Hz), 超出范围的值计入两端的 bin
+            n_bins: 直方图 bin 数
+            grid_res_deg: 经纬度网格分辨率 (°)
+            raw_path: 逐点原始数据的保存路径, None 表示不保存; 数据先写入临时文件,
+                save() 时才 rename 为 raw_path
+            raw_capacity: 原始数据的总点数, raw_path 不为 None 时需要给出
+        """
+        self.bin_edges = np.linspace(doppler_range[0], doppler_range[1], n_bins + 1)
+        self.histogram = np.zeros(n_bins, dtype=np.int64)
+
+        self.grid_res_deg = grid_res_deg
+        n_lat = int(np.ceil(180 / grid_res_deg))
+        n_lon = int(np.ceil(360 / grid_res_deg))
+        self.cell_count = np.zeros(n_lat * n_lon, dtype=np.int64)
+        self.cell_sum = np.zeros(n_lat * n_lon)
+        self.cell_min = np.full(n_lat * n_lon, np.inf)
+        self.cell_max = np.full(n_lat * n_lon, -np.inf)
+        self.grid_shape = (n_lat, n_lon)
+
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0  # 与均值之差的平方和
+        self.min = np.inf
+        self.max = -np.inf
+
+        self.raw_path = raw_path
+        self.raw = None
+        self.raw_offset = 0
+        self._raw_commit = ExitStack()
+        if raw_path is not None:
+            tmp = self._raw_commit.enter_context(atomic_path(raw_path))
+            self.raw = np.lib.format.open_memmap(
+                tmp, mode="w+", dtype=np.float64, shape=(len(COLUMNS), raw_capacity)
+            )
+
+    def consume(self, columns: np.ndarray, offset: int | None = None) -> None:
+        """聚合一个任务的列式结果 (len(COLUMNS), n)
+
+        offset 为原始数据中的写入位置, None 表示追加在已写入数据之后。
+        """
+        n = columns.shape[1]
+        if n == 0:
+            return
+        doppler = columns[COLUMN_INDEX["doppler"]]
+
+        mean = float(doppler.mean())
+        m2 = float(np.dot(doppler - mean, doppler - mean))
+        delta = mean - self._mean
+        total = self.count + n
+        self._mean += delta * n / total
+        self._m2 += m2 + delta**2 * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(doppler.min()))
+        self.max = max(self.max, float(doppler.max()))
+
+        n_bins = len(self.histogram)
+        bins = np.clip(np.searchsorted(self.bin_edges, doppler, side="right") - 1, 0, n_bins - 1)
+        self.histogram += np.bincount(bins, minlength=n_bins)
+
+        cells = self.cell_index(columns[COLUMN_INDEX["lat"]], columns[COLUMN_INDEX["lon"]])
+        n_cells = len(self.cell_count)
+        self.cell_count += np.bincount(cells, minlength=n_cells)
+        self.cell_sum += np.bincount(cells, weights=doppler, minlength=n_cells)
+        np.minimum.at(self.cell_min, cells, doppler)
+        np.maximum.at(self.cell_max, cells, doppler)
+
+        if self.raw is not None:
+            if offset is None:
+                offset = self.raw_offset
+            self.raw[:, offset : offset + n] = columns
+            self.raw_offset = max(self.raw_offset, offset + n)
+
+    def consume_futures(
+        self, futures: Iterable[Future], offsets: Iterable[int] | None = None
+    ) -> None:
+        """按完成顺序消费任务 futures 的结果
+
+        offsets 与 futures 一一对应, 给出后原始数据按任务顺序而非完成顺序落盘。
+        """
+        futures = list(futures)
+        offset_of = dict(zip(futures, offsets)) if offsets is not None else {}
+        for future in as_completed(futures):
+            self.consume(future.result(), offset_of.get(future))
+
+    def cell_index(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """经纬度 (°) 对应的网格扁平下标"""
+        i, j = latlon_grid_index(lats, lons, self.grid_res_deg)
+        return i * self.grid_shape[1] + j
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count else float("nan")
+
+    @property
+    def std(self) -> float:
+        if not self.count:
+            return float("nan")
+        return float(np.sqrt(self._m2 / self.count))
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "std": self.std,
+        }
+
+    def save(self, path: Path) -> None:
+        """一次性写出最终的聚合结果 (.npz), 如有原始数据则落盘并 rename 到 raw_path"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cell_mean = self.cell_sum / self.cell_count
+        np.savez(
+            path,
+            **self.summary(),
+            bin_edges=self.bin_edges,
+            histogram=self.histogram,
+            grid_res_deg=self.grid_res_deg,
+            cell_count=self.cell_count.reshape(self.grid_shape),
+            cell_mean=cell_mean.reshape(self.grid_shape),
+            cell_min=self.cell_min.reshape(self.grid_shape),
+            cell_max=self.cell_max.reshape(self.grid_shape),
+        )
+        if self.raw is not None:
+            self.raw.flush()
+            self._raw_commit.close()
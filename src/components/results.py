@@ -0,0 +1,86 @@
+"""结果文件的二进制列式格式。
+
+每个结果文件是一个 .npy, 内容为 float64 数组, 形状 (len(COLUMNS), n),
+按行存放各列, 因此每一列在文件中都是连续的。读取时使用内存映射,
+`data[COLUMN_INDEX["doppler"]]` 即为零拷贝的列视图。
+"""
+
+import hashlib
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+COLUMNS = ("lat", "lon", "doppler", "received")
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+INTER_DIR = DATA_DIR / "intermediate"
+FINAL_DIR = DATA_DIR / "final"
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """原子写入: 产出同目录下的临时路径, 成功后 rename 为 path, 失败则删除临时文件
+
+    读者要么看到完整的旧文件, 要么看到完整的新文件, 不会看到写了一半的文件。
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def file_checksum(path: Path) -> str:
+    """文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_columns(path: Path, columns: np.ndarray) -> None:
+    """原子地保存 (len(COLUMNS), n) 的列式结果"""
+    columns = np.ascontiguousarray(columns, dtype=np.float64)
+    if columns.ndim != 2 or columns.shape[0] != len(COLUMNS):
+        raise ValueError(f"expected shape ({len(COLUMNS)}, n), got {columns.shape}")
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        np.save(f, columns)
+
+
+def load_columns(path: Path) -> np.ndarray:
+    """以只读内存映射方式读取列式结果, 返回 (len(COLUMNS), n) 数组"""
+    return np.load(path, mmap_mode="r")
+
+
+def merge_columns(paths: Iterable[Path], out_path: Path) -> np.ndarray:
+    """将多个列式结果按顺序拼接到一个预分配的内存映射文件中
+
+    只读取各文件头确定总长度, 然后逐文件整块拷贝到对应偏移。
+
+    Returns:
+        合并结果的只读内存映射
+    """
+    parts = [load_columns(p) for p in paths]
+    total = sum(part.shape[1] for part in parts)
+
+    with atomic_path(out_path) as tmp:
+        out = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=np.float64, shape=(len(COLUMNS), total)
+        )
+        offset = 0
+        for part in parts:
+            n = part.shape[1]
+            out[:, offset : offset + n] = part
+            offset += n
+        out.flush()
+        del out, parts
+
+    return load_columns(out_path)
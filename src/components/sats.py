@@ -1,19 +1,206 @@
 from skyfield.api import load
 from skyfield.toposlib import GeographicPosition
-from skyfield.api import Time, wgs84
+from skyfield.api import EarthSatellite, Time, wgs84
+from skyfield.framelib import itrs
+from skyfield.timelib import Timescale
+from datetime import datetime
+from functools import lru_cache
+import logging
 from pathlib import Path
 import math
 import numpy as np
 
+from components.ephemeris import EphemerisCache
+from logger import VERBOSE, logger
+
 C = 299792458
 
 
+def doppler_from_state(
+    r_sat: np.ndarray, v_sat: np.ndarray, r_gs: np.ndarray, signal_freq: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """calculate range, range rate and doppler from ITRS state vectors
+
+    The ground stations are fixed in ITRS, so the range rate is the projection
+    of the satellite's ITRS velocity onto the line of sight.
+
+    Args:
+        r_sat (np.ndarray): satellite position (m), shape (3,) or (3, n_times)
+        v_sat (np.ndarray): satellite velocity (m/s), same shape as r_sat
+        r_gs (np.ndarray): ground station positions (m), shape (3, n_points)
+        signal_freq (float): carrier frequency (Hz)
+
+    Returns:
+        range (m), range rate (m/s), doppler shift (Hz), received frequency (Hz),
+        each of shape (n_points,) or (n_times, n_points)
+    """
+    r_sat = np.asarray(r_sat, dtype=np.float64)
+    v_sat = np.asarray(v_sat, dtype=np.float64)
+    r_gs = np.asarray(r_gs, dtype=np.float64)
+    # (3, ..., 1) - (3, 1..., n_points) -> (3, ..., n_points)
+    r_gs = r_gs.reshape((3,) + (1,) * (r_sat.ndim - 1) + (-1,))
+    rel = r_sat[..., np.newaxis] - r_gs
+
+    topo_range = np.sqrt(np.einsum("i...,i...->...", rel, rel))
+    range_rate = np.einsum("i...,i...->...", rel, v_sat[..., np.newaxis]) / topo_range
+    doppler_shift = -1 * signal_freq * range_rate / C
+
+    return topo_range, range_rate, doppler_shift, signal_freq + doppler_shift
+
+
+def doppler_rate_from_state(
+    r_sat: np.ndarray,
+    v_sat: np.ndarray,
+    a_sat: np.ndarray,
+    r_gs: np.ndarray,
+    signal_freq: float,
+) -> np.ndarray:
+    """calculate doppler rate (Hz/s) from ITRS state vectors
+
+    d(range rate)/dt = (|v|^2 + rel·a - range_rate^2) / range, with the
+    ground stations fixed in ITRS.
+
+    Args:
+        r_sat (np.ndarray): satellite position (m), shape (3,) or (3, n_times)
+        v_sat (np.ndarray): satellite velocity (m/s), same shape as r_sat
+        a_sat (np.ndarray): satellite acceleration (m/s^2), same shape as r_sat
+        r_gs (np.ndarray): ground station positions (m), shape (3, n_points)
+        signal_freq (float): carrier frequency (Hz)
+
+    Returns:
+        doppler rate (Hz/s) of shape (n_points,) or (n_times, n_points)
+    """
+    r_sat = np.asarray(r_sat, dtype=np.float64)
+    v_sat = np.asarray(v_sat, dtype=np.float64)
+    a_sat = np.asarray(a_sat, dtype=np.float64)
+    r_gs = np.asarray(r_gs, dtype=np.float64)
+    r_gs = r_gs.reshape((3,) + (1,) * (r_sat.ndim - 1) + (-1,))
+    rel = r_sat[..., np.newaxis] - r_gs
+
+    topo_range = np.sqrt(np.einsum("i...,i...->...", rel, rel))
+    range_rate = np.einsum("i...,i...->...", rel, v_sat[..., np.newaxis]) / topo_range
+    v2 = np.einsum("i...,i...->...", v_sat, v_sat)[..., np.newaxis]
+    rel_a = np.einsum("i...,i...->...", rel, a_sat[..., np.newaxis])
+    range_accel = (v2 + rel_a - range_rate**2) / topo_range
+
+    return -1 * signal_freq * range_accel / C
+
+
+def itrs_to_latlon(r: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """geodetic (lat (°), lon (°), height (km)) of ITRS positions (m) on WGS84
+
+    Same fixed-point iteration as skyfield's Geoid._compute_latitude.
+    """
+    x, y, z = np.asarray(r, dtype=np.float64)
+    a = wgs84.radius.m
+    e2 = wgs84._e2
+    R = np.sqrt(x * x + y * y)
+    lat = np.arctan2(z, R)
+    for _ in range(3):
+        sin_lat = np.sin(lat)
+        e2_sin_lat = e2 * sin_lat
+        aC = a / np.sqrt(1.0 - e2_sin_lat * sin_lat)
+        hyp = z + aC * e2_sin_lat
+        lat = np.arctan2(hyp, R)
+    lon = (np.arctan2(y, x) - math.pi) % math.tau - math.pi
+    height = np.sqrt(hyp * hyp + R * R) - aC
+    return np.degrees(lat), np.degrees(lon), height / 1000
+
+
+def ground_xyz(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """ITRS position (m) of ground points on the WGS84 ellipsoid, shape (3, n)"""
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+    return wgs84.latlon(lats, lons, elevation_m=0).itrs_xyz.m
+
+
+@lru_cache(maxsize=None)
+def shared_timescale() -> Timescale:
+    """进程内共享的 timescale (skyfield 内置数据), 避免每颗卫星重复加载"""
+    return load.timescale()
+
+
+def read_tle(path: Path) -> list[tuple[str | None, str, str]]:
+    """read every (name, line1, line2) entry of a TLE file
+
+    Follows skyfield's parse_tle_file: a line that precedes a TLE and is not
+    part of another one is used as the satellite name.
+    """
+    entries = []
+    l0 = l1 = ""
+    with open(path, "r") as f:
+        for l2 in f:
+            l2 = l2.rstrip("\r\n")
+            if l2.startswith("2 ") and len(l2) >= 69 and l1.startswith("1 ") and len(l1) >= 69:
+                name = l0.rstrip(" ") or None
+                if name is not None and name.startswith("0 "):
+                    name = name[2:]  # Spacetrack 3-line format
+                entries.append((name, l1, l2))
+                l0 = l1 = ""
+            else:
+                l0, l1 = l1, l2
+    return entries
+
+
 class Sat:
-    def __init__(self, path: Path, signal_freq: float):
-        self.ts = load.timescale()
-        self.sat = load.tle_file(str(path))[0]
+    def __init__(self, path: Path, signal_freq: float, ts: Timescale | None = None):
+        name, line1, line2 = read_tle(path)[0]
+        self._init_from_tle(name, line1, line2, signal_freq, ts)
+
+    @classmethod
+    def from_tle(
+        cls,
+        line1: str,
+        line2: str,
+        signal_freq: float,
+        name: str | None = None,
+        ts: Timescale | None = None,
+    ) -> "Sat":
+        """build a Sat directly from its two TLE lines"""
+        sat = cls.__new__(cls)
+        sat._init_from_tle(name, line1, line2, signal_freq, ts)
+        return sat
+
+    def _init_from_tle(self, name, line1, line2, signal_freq, ts):
+        self.ts = ts if ts is not None else shared_timescale()
+        self.name = name
+        self.tle_lines = (line1, line2)
+        self.sat = EarthSatellite(line1, line2, name, self.ts)
         self.time_pz = None
         self.signal_freq = signal_freq
+        self.ephemeris: EphemerisCache | None = None
+        self._ephemeris_config: dict | None = None
+
+    def __reduce__(self):
+        # skyfield 的卫星对象无法 pickle, 跨进程时只传 TLE 与频率, 在目标进程重建
+        line1, line2 = self.tle_lines
+        return (
+            _unpickle_sat,
+            (line1, line2, self.signal_freq, self.name, self._ephemeris_config),
+        )
+
+    def enable_ephemeris_cache(
+        self, step_s: float = 60.0, window_s: float = 3600.0, max_windows: int = 8
+    ) -> EphemerisCache:
+        """开启星历缓存 (默认关闭, 即每次精确运行 SGP4)
+
+        开启后 pos_at / itrs_state / get_doppler* 由缓存插值得到,
+        误差界见 EphemerisCache.error_bound()。
+        """
+        model = self.sat.model
+        self._ephemeris_config = dict(step_s=step_s, window_s=window_s, max_windows=max_windows)
+        self.ephemeris = EphemerisCache(
+            self._propagate_itrs,
+            self.ts,
+            mean_motion_rad_s=model.no_kozai / 60,
+            max_radius_m=model.a * (1 + model.ecco) * model.radiusearthkm * 1000,
+            **self._ephemeris_config,
+        )
+        return self.ephemeris
+
+    def disable_ephemeris_cache(self) -> None:
+        self.ephemeris = None
+        self._ephemeris_config = None
 
     def pos_at(self, time: Time) -> tuple[float, float, np.float64]:
         """calculate (lat, lon, height) of the satellite at a given time (utc)
@@ -24,6 +211,11 @@ class Sat:
         Returns:
             lat (°), lon (°), height (km)
         """
+        if self.ephemeris is not None:
+            r, _ = self.ephemeris.state(time)
+            lat, lon, height = itrs_to_latlon(r)
+            return float(lat), float(lon), np.float64(height)
+
         geocentric = self.sat.at(time)
         subpoint = wgs84.subpoint(geocentric)
         lat = math.degrees(subpoint.latitude.radians)
@@ -32,10 +224,49 @@ class Sat:
 
         return lat, lon, height
 
+    def itrs_state(self, time: Time) -> tuple[np.ndarray, np.ndarray]:
+        """position (m) and velocity (m/s) of the satellite in ITRS
+
+        `time` may be a scalar or an array Time, the satellite is propagated
+        once for all of its epochs.
+        """
+        if self.ephemeris is not None:
+            return self.ephemeris.state(time)
+        return self._propagate_itrs(time)
+
+    def itrs_state_and_acceleration(
+        self, times: Time, dt_s: float = 0.5
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """position (m), velocity (m/s) and acceleration (m/s^2) in ITRS, each (3, n_times)
+
+        The acceleration is the central difference of the velocity at ±dt_s,
+        all epochs and neighbours are propagated in one call.
+        """
+        n_times = np.size(times.tt)
+        whole = np.ravel(times.whole) * np.ones(n_times)
+        fraction = np.ravel(times.tt_fraction) * np.ones(n_times)
+        offsets = np.repeat([0.0, -dt_s / 86400.0, dt_s / 86400.0], n_times)
+        all_times = self.ts.tt_jd(np.tile(whole, 3), np.tile(fraction, 3) + offsets)
+
+        r_all, v_all = self.itrs_state(all_times)
+        a_sat = (v_all[:, 2 * n_times :] - v_all[:, n_times : 2 * n_times]) / (2 * dt_s)
+        return r_all[:, :n_times], v_all[:, :n_times], a_sat
+
+    def _propagate_itrs(self, time: Time) -> tuple[np.ndarray, np.ndarray]:
+        r, v = self.sat.at(time).frame_xyz_and_velocity(itrs)
+        return r.m, v.m_per_s
+
     def get_doppler(
         self, time: Time, ground_station: GeographicPosition, debug: bool = False
     ) -> tuple[float, float]:
 
+        if self.ephemeris is not None:
+            lat = ground_station.latitude.degrees
+            lon = ground_station.longitude.degrees
+            _, topo_range_rate, doppler_shift, _ = self.get_doppler_batch(time, [lat], [lon])
+            self._log_doppler(topo_range_rate[0], doppler_shift[0], debug)
+            return doppler_shift[0], self.signal_freq + doppler_shift[0]
+
         # 方法1：最推荐（最简洁、最不容易出错）
         gs = wgs84.latlon(
             ground_station.latitude.degrees,
@@ -50,11 +281,75 @@ class Sat:
         )
         doppler_shift = -1 * self.signal_freq * topo_range_rate.m_per_s / C
 
-        if debug:
-            print("Range Rate (m/s):", topo_range_rate.m_per_s)
-
-        if debug:
-            print("Doppler Shift (Hz):", doppler_shift)
-            print("Received Frequency (Hz):", self.signal_freq + doppler_shift)
+        self._log_doppler(topo_range_rate.m_per_s, doppler_shift, debug)
 
         return doppler_shift, self.signal_freq + doppler_shift
+
+    def _log_doppler(self, range_rate: float, doppler_shift: float, debug: bool) -> None:
+        # debug=True 时以 INFO 输出, 否则只在打开 VERBOSE 级别时输出
+        level = logging.INFO if debug else VERBOSE
+        if logger.isEnabledFor(level):
+            logger.log(
+                level,
+                "range rate %.3f m/s, doppler %.3f Hz, received %.3f Hz",
+                range_rate, doppler_shift, self.signal_freq + doppler_shift,
+            )
+
+    def get_doppler_batch(
+        self, time: Time, lats: np.ndarray, lons: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """calculate doppler for many ground stations with a single propagation
+
+        Args:
+            time (Time): skfield.timelib.Time
+            lats (np.ndarray): ground station latitudes (°)
+            lons (np.ndarray): ground station longitudes (°)
+
+        Returns:
+            range (m), range rate (m/s), doppler shift (Hz), received frequency (Hz)
+        """
+        r_sat, v_sat = self.itrs_state(time)
+        return doppler_from_state(r_sat, v_sat, ground_xyz(lats, lons), self.signal_freq)
+
+    def time_grid(self, start: datetime, stop: datetime, step_s: float) -> Time:
+        """array Time from start to stop (inclusive) every step_s seconds"""
+        seconds = np.arange(0.0, (stop - start).total_seconds() + 1e-9, step_s)
+        return self.ts.from_datetime(start) + seconds / 86400.0
+
+    def get_doppler_sweep(
+        self, times: Time, lats: np.ndarray, lons: np.ndarray, dt_s: float = 0.5
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """calculate doppler and doppler rate over a time grid for many ground stations
+
+        The satellite is propagated once for all epochs (plus ±dt_s neighbours
+        used to estimate its acceleration), no python loop over times.
+
+        Args:
+            times (Time): array skfield.timelib.Time, e.g. from time_grid()
+            lats (np.ndarray): ground station latitudes (°)
+            lons (np.ndarray): ground station longitudes (°)
+            dt_s (float): half step (s) of the central difference for acceleration
+
+        Returns:
+            doppler shift (Hz), doppler rate (Hz/s), both of shape (n_times, n_points)
+        """
+        r_sat, v_sat, a_sat = self.itrs_state_and_acceleration(times, dt_s)
+
+        r_gs = ground_xyz(lats, lons)
+        _, _, doppler_shift, _ = doppler_from_state(r_sat, v_sat, r_gs, self.signal_freq)
+        doppler_rate = doppler_rate_from_state(r_sat, v_sat, a_sat, r_gs, self.signal_freq)
+        return doppler_shift, doppler_rate
+
+
+def _unpickle_sat(line1, line2, signal_freq, name, ephemeris_config):
+    config = None if ephemeris_config is None else tuple(sorted(ephemeris_config.items()))
+    return _rebuilt_sat(line1, line2, signal_freq, name, config)
+
+
+@lru_cache(maxsize=256)
+def _rebuilt_sat(line1, line2, signal_freq, name, ephemeris_config) -> Sat:
+    """目标进程中每颗卫星只重建一次, 之后的任务复用同一个 Sat 及其已插值的星历窗口"""
+    sat = Sat.from_tle(line1, line2, signal_freq, name)
+    if ephemeris_config is not None:
+        sat.enable_ephemeris_cache(**dict(ephemeris_config))
+    return sat
@@ -0,0 +1,334 @@
+"""批量场景: 从场景文件展开 卫星 × 时刻 × 频率 × 采样 的组合, 在一个进程中依次运行。
+
+卫星、timescale、进程池与结果缓存在场景之间共享, 每个场景的输出写入
+runs/<批次名>/<场景名>/, 不同批次 (或同一批次的不同场景) 互不干扰。
+场景文件为 JSON:
+
+    {
+      "name": "nightly",                      // 批次名, 缺省为文件名
+      "defaults": {"n_samples": 100000},      // 所有场景的缺省参数
+      "matrix": {"tle": ["57425.tle", "66206.tle"], "freq": [868.1e6, 433e6]},
+      "scenarios": [{"time": "2025-12-01T08:00:00Z"}, {"time": "2025-12-01T09:00:00Z", "sampling": "grid"}]
+    }
+
+每个场景 = defaults | scenarios 中的一项 | matrix 的一个组合, 参数见 Scenario。
+只对一种场景有意义的参数 (见 _KIND_ONLY) 在另一种场景中由 defaults 或 matrix 给出时忽略,
+matrix 不会因此展开出重复的场景; 在场景项中显式给出则报错。
+"""
+
+import itertools
+import json
+import time as timer
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from components.cache import ResultCache
+from components.constellation import Constellation
+from components.manifest import RunManifest
+from components.planner import ChunkPlanner, cal_doppler_tasks
+from components.reduce import DopplerReducer
+from components.results import COLUMN_INDEX, DATA_DIR, load_columns
+from components.sats import C, Sat
+from components.simulate import TaskExecutor
+from components.tasks import CoverageRasterTask, MergeRasterTask, MergeRunTask
+from logger import logger
+from utils import cap_grid_shape, cap_grid_size, footprint_central_angle_rad
+
+RUNS_DIR = DATA_DIR / "runs"
+TLE_DIR = DATA_DIR / "tle"
+
+
+@dataclass
+class Scenario:
+    """一个场景的参数"""
+
+    name: str
+    time: str  # ISO 8601 时刻, 无时区时按 UTC
+    tle: list[str]  # TLE 文件, 相对路径相对于场景文件所在目录或 data/tle; doppler 场景只能有一个
+    kind: str = "doppler"  # "doppler": 单星多普勒; "coverage": 星座覆盖栅格
+    freq: float = 868.1e6  # 载频 (Hz)
+    n_samples: int = 100000  # 每颗卫星的采样点数 (grid 采样时由 resolution_km 决定)
+    sampling: str = "random"  # "random" 或 "grid"
+    resolution_km: float = 10.0  # grid 采样的网格分辨率
+    block: int = 100  # 随机数流与分块粒度
+    seed: int = 20251201  # run seed
+    h_km: float = 550  # 轨道高度 (km)
+    e0_deg: float = 30  # 最小仰角 (°)
+    res_deg: float = 0.5  # coverage 场景的栅格分辨率 (°)
+    persist_raw: bool = True  # doppler 场景是否保存逐点原始数据 result.npy
+    plot: bool = False  # 是否绘图到 <场景目录>/pics
+
+    @property
+    def datetime(self) -> datetime:
+        dt = datetime.fromisoformat(self.time)
+        return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+_MATRIX_KEYS = ("tle", "time", "freq", "sampling")
+# 只对一种场景有意义的参数; coverage 场景的栅格记录每格的多普勒范围, 因此与载频有关
+_KIND_ONLY = {
+    "doppler": {"sampling", "resolution_km", "persist_raw"},
+    "coverage": {"res_deg"},
+}
+
+
+def _describe(params: dict) -> str:
+    """由卫星、时刻、频率与采样方式组成的场景名, 如 57425-20251201T080000Z-868.1MHz-random"""
+    tle = "+".join(Path(p).stem for p in params["tle"])
+    time = params["time"].replace("-", "").replace(":", "").replace("+0000", "Z")
+    freq = params.get("freq", Scenario.freq) / 1e6
+    if params.get("kind", Scenario.kind) == "coverage":
+        return f"{tle}-{time}-{freq:g}MHz"
+    return f"{tle}-{time}-{freq:g}MHz-{params.get('sampling', Scenario.sampling)}"
+
+
+def expand_scenarios(spec: dict, base_dir: Path | None = None) -> list[Scenario]:
+    """把场景文件的内容展开为场景列表
+
+    Raises:
+        ValueError: 未知参数或场景类型、缺少参数、参数不适用于场景类型或场景名重复
+    """
+    known = {f.name for f in fields(Scenario)}
+    defaults = spec.get("defaults", {})
+    matrix = spec.get("matrix", {})
+    unknown = (set(defaults) | set(matrix) | {k for s in spec.get("scenarios", []) for k in s}) - known
+    if unknown:
+        raise ValueError(f"unknown scenario parameters: {sorted(unknown)}")
+    if set(matrix) - set(_MATRIX_KEYS):
+        raise ValueError(f"matrix keys must be among {_MATRIX_KEYS}")
+
+    combos = [dict(zip(matrix, values)) for values in itertools.product(*matrix.values())]
+    scenarios, names = [], set()
+    for entry in spec.get("scenarios") or [{}]:
+        kind = {**defaults, **entry}.get("kind", Scenario.kind)
+        if kind not in _KIND_ONLY:
+            raise ValueError(f"Unknown scenario kind: {kind}")
+        foreign = set().union(*(keys for other, keys in _KIND_ONLY.items() if other != kind))
+        if set(entry) & foreign:
+            raise ValueError(
+                f"{kind} scenario {entry.get('name', entry)} does not take {sorted(set(entry) & foreign)}"
+            )
+        # 去掉不适用的 matrix 键后相同的组合只保留一个
+        entry_combos = {}
+        for combo in combos:
+            combo = {k: v for k, v in combo.items() if k not in foreign}
+            entry_combos.setdefault(json.dumps(combo, sort_keys=True), combo)
+        for combo in entry_combos.values():
+            params = {k: v for k, v in defaults.items() if k not in foreign}
+            params.update({**entry, **combo})
+            tle = params.get("tle")
+            if tle is None or "time" not in params:
+                raise ValueError(f"scenario {params.get('name', entry)} needs 'tle' and 'time'")
+            params["tle"] = [tle] if isinstance(tle, str) else list(tle)
+            if base_dir is not None:
+                params["tle"] = [
+                    str(base_dir / p) if (base_dir / p).exists() else p for p in params["tle"]
+                ]
+            # 显式命名的场景被 matrix 展开时加上组合的后缀
+            if "name" not in params:
+                name = f"{params.get('kind', Scenario.kind)}-{_describe(params)}"
+            elif len(entry_combos) > 1:
+                name = f"{params['name']}-{_describe(params)}"
+            else:
+                name = params["name"]
+            if name in names:
+                raise ValueError(f"duplicate scenario name: {name}")
+            names.add(name)
+            params["name"] = name
+            scenarios.append(Scenario(**params))
+    return scenarios
+
+
+def load_scenarios(path: Path) -> tuple[str, list[Scenario]]:
+    """读取场景文件, 返回 (批次名, 场景列表)"""
+    path = Path(path)
+    with open(path, "r") as f:
+        spec = json.load(f)
+    return spec.get("name", path.stem), expand_scenarios(spec, path.parent)
+
+
+class BatchRunner:
+    """在一个进程中依次运行多个场景, 共享卫星、执行器 (进程池) 与结果缓存。"""
+
+    def __init__(
+        self,
+        batch_name: str,
+        executor: TaskExecutor | None = None,
+        cache: ResultCache | None = None,
+        runs_dir: Path = RUNS_DIR,
+    ):
+        self.batch_dir = Path(runs_dir) / batch_name
+        if executor is None:
+            executor = TaskExecutor(mode="process", metrics_path=self.batch_dir / "metrics.json")
+        self.executor = executor
+        self.cache = cache
+        self._sats: dict[tuple[str, float], Sat] = {}
+        self._constellations: dict[tuple[tuple[str, ...], float], Constellation] = {}
+
+    def _resolve_tle(self, tle: str) -> Path:
+        path = Path(tle)
+        return path if path.is_absolute() or path.exists() else TLE_DIR / path
+
+    def sat(self, tle: str, freq: float) -> Sat:
+        """加载卫星, 同一 (TLE, 频率) 只加载一次"""
+        key = (str(self._resolve_tle(tle)), freq)
+        if key not in self._sats:
+            self._sats[key] = Sat(Path(key[0]), freq)
+        return self._sats[key]
+
+    def constellation(self, tles: list[str], freq: float) -> Constellation:
+        key = (tuple(str(self._resolve_tle(tle)) for tle in tles), freq)
+        if key not in self._constellations:
+            self._constellations[key] = Constellation.from_files([Path(p) for p in key[0]], freq)
+        return self._constellations[key]
+
+    def run_dir(self, scenario: Scenario) -> Path:
+        return self.batch_dir / scenario.name
+
+    def run(self, scenarios: list[Scenario], resume: bool = False) -> dict[str, dict]:
+        """依次运行所有场景, 返回 {场景名: 摘要}; 每个场景的摘要同时写入 <场景目录>/scenario.json"""
+        results = {}
+        for scenario in scenarios:
+            start = timer.perf_counter()
+            logger.info(f"scenario {scenario.name}: start")
+            if scenario.kind == "doppler":
+                summary = self.run_doppler(scenario, resume)
+            elif scenario.kind == "coverage":
+                summary = self.run_coverage(scenario)
+            else:
+                raise ValueError(f"Unknown scenario kind: {scenario.kind}")
+            summary["elapsed_s"] = timer.perf_counter() - start
+            with open(self.run_dir(scenario) / "scenario.json", "w") as f:
+                json.dump({"scenario": asdict(scenario), "summary": summary}, f, indent=2)
+            logger.info(f"scenario {scenario.name}: done in {summary['elapsed_s']:.2f}s")
+            results[scenario.name] = summary
+        return results
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+    def run_doppler(self, scenario: Scenario, resume: bool = False) -> dict:
+        """单星多普勒场景, 流程与 main.py 相同: 自适应分块、流式聚合、运行清单"""
+        if len(scenario.tle) != 1:
+            raise ValueError(f"doppler scenario {scenario.name} needs exactly one TLE")
+        sat = self.sat(scenario.tle[0], scenario.freq)
+        time = sat.ts.from_datetime(scenario.datetime)
+        run_dir = self.run_dir(scenario)
+
+        n, grid_shape = scenario.n_samples, None
+        if scenario.sampling == "grid":
+            psi = footprint_central_angle_rad(scenario.h_km, scenario.e0_deg)
+            grid_shape = cap_grid_shape(psi, resolution_km=scenario.resolution_km)
+            n = cap_grid_size(grid_shape)
+
+        params = {
+            "tle": sat.tle_lines,
+            "signal_freq": sat.signal_freq,
+            "time": time.utc_iso(),
+            "n": n,
+            "block": scenario.block,
+            "seed": scenario.seed,
+            "sampling": scenario.sampling,
+            "grid_shape": grid_shape,
+            "footprint": [scenario.h_km, scenario.e0_deg],
+        }
+        manifest = RunManifest.open(run_dir, params, resume)
+        max_doppler = sat.signal_freq * 8000 / C
+        reducer = DopplerReducer(doppler_range=(-max_doppler, max_doppler))
+        completed = []
+        for _, record in manifest.verified():
+            reducer.consume(load_columns(manifest.output_dir / record["file"]), record["offset"])
+            completed.append((record["offset"], record["n"]))
+
+        base = cal_doppler_tasks(
+            sat, time, n, scenario.block, scenario.seed,
+            sampling=scenario.sampling, grid_shape=grid_shape,
+            h_km=scenario.h_km, e0_deg=scenario.e0_deg, cache=self.cache,
+            persist=True, out_dir=manifest.output_dir,
+        )
+        task_of = {}
+
+        def make_task(task_id, offset, count):
+            manifest.add_task(task_id, offset, count)
+            task_of[offset] = task_id
+            return base(task_id, offset, count)
+
+        planner = ChunkPlanner(
+            self.executor, make_task, n, block=scenario.block,
+            completed=completed, first_task_id=manifest.next_task_id,
+        )
+        for offset, columns in planner.run():
+            manifest.mark_done(task_of[offset])
+            reducer.consume(columns, offset)
+        reducer.save(run_dir / "summary.npz")
+
+        if scenario.persist_raw or scenario.plot:
+            result = MergeRunTask(0, run_dir, run_dir / "result.npy").run()
+            if scenario.plot:
+                self._plot_doppler(result, grid_shape, run_dir / "pics")
+        return {**reducer.summary(), "tasks": len(planner.chunks), "resumed_tasks": len(completed)}
+
+    def run_coverage(self, scenario: Scenario) -> dict:
+        """星座覆盖栅格场景, 流程与 footprint.py 相同"""
+        constellation = self.constellation(scenario.tle, scenario.freq)
+        time = constellation.ts.from_datetime(scenario.datetime)
+        states = constellation.states(time)
+        run_dir = self.run_dir(scenario)
+        run_dir.mkdir(parents=True, exist_ok=True)
+
+        # 每 block 个点一个由 run seed 派生的随机数流, 每颗卫星的 block 平分给各 worker;
+        # 每个任务都返回整张栅格, 任务数不宜多, 结果与分组方式无关
+        block = scenario.block
+        n_blocks = -(-scenario.n_samples // block)
+        per_task = -(-n_blocks // self.executor.num_workers)
+        n_tasks = -(-n_blocks // per_task)
+        seeds = np.random.SeedSequence(scenario.seed).spawn(n_blocks * len(constellation))
+        merges = []
+        for index, sat in enumerate(constellation):
+            futures = []
+            for i in range(n_tasks):
+                first = index * n_blocks + i * per_task
+                count = min(per_task * block, scenario.n_samples - i * per_task * block)
+                task = CoverageRasterTask(
+                    task_id=index * n_tasks + i,
+                    sat=sat,
+                    time=time,
+                    n_samples=count,
+                    seed=seeds[first : first + -(-count // block)],
+                    seed_block=block,
+                    sat_state=states[index, 0],
+                    h_km=scenario.h_km,
+                    e0_deg=scenario.e0_deg,
+                    sat_index=index,
+                    n_sats=len(constellation),
+                    res_deg=scenario.res_deg,
+                )
+                futures.append(self.executor.submit(task))
+            merges.append(
+                self.executor.submit(MergeRasterTask(len(constellation) * n_tasks + index), depends_on=futures)
+            )
+        raster = self.executor.submit(
+            MergeRasterTask(len(constellation) * (n_tasks + 1)), depends_on=merges
+        ).result()
+        raster.save(run_dir / "coverage.npz")
+
+        if scenario.plot:
+            from vision.picture import plot_coverage_raster
+
+            (run_dir / "pics").mkdir(parents=True, exist_ok=True)
+            plot_coverage_raster(raster.n_covering(), run_dir / "pics")
+        return {"sats": len(constellation), "covered_cells": int(np.count_nonzero(raster.count))}
+
+    @staticmethod
+    def _plot_doppler(result: np.ndarray, grid_shape, pic_dir: Path) -> None:
+        from vision.picture import plot_contour_grid, plot_doppler_raster
+
+        pic_dir.mkdir(parents=True, exist_ok=True)
+        lats, lons, doppler = (result[COLUMN_INDEX[c]] for c in ("lat", "lon", "doppler"))
+        if grid_shape is not None:
+            plot_contour_grid(lats, lons, doppler, grid_shape, pic_dir)
+        else:
+            plot_doppler_raster(lats, lons, doppler, pic_dir)
@@ -1,30 +1,173 @@
+import os
 import queue
 import threading
-from concurrent.futures import Future
+import asyncio
+from concurrent.futures import CancelledError, Future, InvalidStateError, ProcessPoolExecutor
+from multiprocessing.reduction import ForkingPickler
+from pathlib import Path
+
+from skyfield.timelib import Timescale
+
+from components.metrics import ExecutorMetrics, run_instrumented
+from components.sats import shared_timescale
+from logger import logger
 
 _SENTINEL = object()
 
 
+def _reduce_timescale(ts):
+    # Time 对象引用的 timescale 带有约 300 KB 的 delta-T 表,
+    # 跨进程时只传引用, 在 worker 中使用其共享的内置 timescale
+    return (shared_timescale, ())
+
+
+ForkingPickler.register(Timescale, _reduce_timescale)
+
+
 class TaskExecutor:
-    def __init__(self, num_workers=4):
-        self.num_workers = num_workers
+    """任务执行器。
+
+    mode="thread" 使用线程池 (默认), mode="process" 使用进程池,
+    绕开 GIL 以利用多核。两种模式下 submit() 都返回 concurrent.futures.Future。
+    进程模式下任务会被 pickle 发送到 worker, Sat 只以 TLE 与频率传输。
+
+    submit(task, depends_on=[...]) 声明依赖: 所有依赖 future 完成后任务才被派发,
+    依赖的结果按顺序作为 task.run(*inputs) 的参数在内存中传入; 任一依赖失败
+    或被取消时, 该任务不执行, 其 future 以相同的异常结束。
+
+    submit_async() 是 submit() 的 asyncio 版本; 尚未开始执行的任务可以取消
+    (future.cancel() 或取消等待它的协程)。
+
+    每个任务的排队/运行时间与分阶段耗时记录在 self.metrics (ExecutorMetrics),
+    snapshot() 返回当前快照; 给出 metrics_path 时 shutdown(wait=True) 在任务全部结束后写入 JSON 与 .prom 文件。
+    """
+
+    def __init__(self, num_workers=None, mode="thread", metrics_path: Path | None = None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.mode = mode
+        self.metrics = ExecutorMetrics(self.num_workers, mode)
+        self.metrics_path = metrics_path
         self.tasks = queue.Queue()
         self.shutdown_flag = False
         self.workers = []
+        self.pool = None
+        # 等待依赖完成、尚未派发的任务数
+        self._waiting = 0
+        self._waiting_cond = threading.Condition()
+        self._closed = False
+
+        if mode == "process":
+            self.pool = ProcessPoolExecutor(max_workers=self.num_workers)
+            return
 
-        for _ in range(num_workers):
+        for _ in range(self.num_workers):
             t = threading.Thread(target=self._worker_loop)
             t.start()
             self.workers.append(t)
 
-    def submit(self, task):
+    def submit(self, task, depends_on=None):
+        """提交任务, 返回 Future
+
+        Args:
+            task: 任务
+            depends_on: 依赖的 future 列表 (可来自本执行器或其他来源),
+                其结果按顺序传给 task.run(*inputs)
+        """
         if self.shutdown_flag:
             raise RuntimeError("Cannot submit task after shutdown()")
 
         future = Future()
-        self.tasks.put((task, future))
+        deps = list(depends_on or ())
+        if not deps:
+            self._dispatch(task, future, ())
+            return future
+
+        with self._waiting_cond:
+            self._waiting += 1
+        remaining = [len(deps)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            self._dependencies_done(task, future, deps)
+
+        for dep in deps:
+            dep.add_done_callback(on_done)
         return future
 
+    async def submit_async(self, task, depends_on=None):
+        """在事件循环中等待任务结果, 不阻塞事件循环; 取消协程会取消尚未开始的任务"""
+        return await asyncio.wrap_future(self.submit(task, depends_on))
+
+    def _dependencies_done(self, task, future, deps):
+        try:
+            if future.cancelled():
+                return
+            for dep in deps:
+                if dep.cancelled():
+                    future.set_exception(CancelledError(f"dependency of task {task.task_id} cancelled"))
+                    return
+                if dep.exception() is not None:
+                    future.set_exception(dep.exception())
+                    return
+            self._dispatch(task, future, tuple(dep.result() for dep in deps))
+        finally:
+            with self._waiting_cond:
+                self._waiting -= 1
+                self._waiting_cond.notify_all()
+
+    def _dispatch(self, task, future, inputs):
+        submitted = self.metrics.task_submitted()
+
+        if self.pool is not None:
+            # worker 返回 (result, record), 在父进程中拆开并记录
+            try:
+                inner = self.pool.submit(run_instrumented, task, submitted, inputs)
+            except RuntimeError as e:  # 依赖完成时进程池已关闭 (shutdown(wait=False))
+                future.set_exception(e)
+                return
+            future.add_done_callback(lambda f: f.cancelled() and inner.cancel())
+            inner.add_done_callback(lambda f: self._complete(future, f))
+            return
+
+        if self._closed:  # 依赖完成时线程已收到退出哨兵 (shutdown(wait=False))
+            future.set_exception(RuntimeError("executor shut down before task was dispatched"))
+            return
+        self.tasks.put((task, future, submitted, inputs))
+
+    def _complete(self, future, inner):
+        if inner.cancelled():
+            self.metrics.task_cancelled()
+            return
+        try:
+            result, record = inner.result()
+        except Exception as e:  # 任务无法 pickle 或 worker 异常退出
+            if not future.cancelled():
+                future.set_exception(e)
+            return
+        self._finish(future, result, record)
+
+    def _finish(self, future, result, record):
+        self.metrics.task_finished(record)
+        try:
+            if record.error is not None:
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        except InvalidStateError:  # 进程模式下任务运行期间 future 被取消, 丢弃结果
+            pass
+
+    def snapshot(self) -> dict:
+        """当前指标快照, 见 ExecutorMetrics.snapshot()"""
+        queue_depth = self.tasks.qsize() if self.pool is None else None
+        return self.metrics.snapshot(queue_depth)
+
     def _worker_loop(self):
         while True:
             item = self.tasks.get()
@@ -32,12 +175,13 @@ class TaskExecutor:
                 self.tasks.task_done()
                 break
 
-            task, future = item
+            task, future, submitted, inputs = item
+            if not future.set_running_or_notify_cancel():
+                self.metrics.task_cancelled()
+                self.tasks.task_done()
+                continue
             try:
-                result = task.run()
-                future.set_result(result)
-            except Exception as e:
-                future.set_exception(e)
+                self._finish(future, *run_instrumented(task, submitted, inputs))
             finally:
                 self.tasks.task_done()
 
@@ -46,7 +190,20 @@ class TaskExecutor:
 
         self.shutdown_flag = True
 
+        if wait:
+            # 先等所有依赖任务派发, 否则它们会排在哨兵之后
+            with self._waiting_cond:
+                self._waiting_cond.wait_for(lambda: self._waiting == 0)
+
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait)
+            # 不等待时仍有任务在执行, 与线程模式一样不写出指标
+            if wait:
+                self._dump_metrics()
+            return
+
         # 插入 num_workers 个哨兵，保证每个线程都能退出
+        self._closed = True
         for _ in range(self.num_workers):
             self.tasks.put(_SENTINEL)
 
@@ -57,3 +214,17 @@ class TaskExecutor:
             # 等待所有线程退出
             for t in self.workers:
                 t.join()
+
+            self._dump_metrics()
+
+    def _dump_metrics(self):
+        snapshot = self.snapshot()
+        logger.info(
+            "tasks: %d, points/s: %.0f, utilization: %.1f%%, queue wait p95: %.3fs",
+            snapshot["tasks_completed"],
+            snapshot["points_per_s"],
+            snapshot["utilization"] * 100,
+            snapshot["queue_wait_s"]["p95"],
+        )
+        if self.metrics_path is not None:
+            self.metrics.dump(self.metrics_path, snapshot)
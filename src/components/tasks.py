@@ -1,15 +1,32 @@
 from abc import ABC, abstractmethod
+import copy
 import time
-from components.sats import Sat
+from components.sats import Sat, doppler_from_state, ground_xyz, itrs_to_latlon
+from components.cache import ResultCache, cache_key, seed_identity
+from components.manifest import RunManifest
+from components.metrics import add_points, count, phase
+from components.raster import CoverageRaster
+from components.results import (
+    COLUMN_INDEX,
+    FINAL_DIR,
+    INTER_DIR,
+    atomic_path,
+    load_columns,
+    merge_columns,
+    save_columns,
+)
 from dataclasses import dataclass
-from utils import sample_point_in_spherical_cap, footprint_central_angle_rad
+from utils import (
+    cap_grid_points,
+    cap_grid_size,
+    footprint_central_angle_rad,
+    sample_points_in_spherical_cap,
+)
+import numpy as np
 from skyfield.api import Time
 from skyfield.toposlib import GeographicPosition, wgs84
 from pathlib import Path
-from datetime import datetime
-from logger import logger
-from vision.picture import save_3d_plot_to_file
-from vision.viz import viz
+from logger import VERBOSE, logger
 
 
 @dataclass
@@ -19,131 +36,383 @@ class Task(ABC):
     task_id: int
 
     @abstractmethod
-    def run(self):
-        """执行任务，返回结果（可选）"""
+    def run(self, *inputs):
+        """执行任务，返回结果（可选）
+
+        inputs 为依赖任务的结果, 按 TaskExecutor.submit(depends_on=...) 的顺序传入。
+        """
         pass
 
 
 @dataclass
-class CalDopplerTask(Task):
-    """计算多普勒频移任务。"""
+class CapSamplingTask(Task):
+    """在卫星覆盖区 (球冠) 内采样地面点的任务基类。"""
 
     sat: Sat  # 卫星
     time: Time
     n_samples: int  # 子任务点的数量
+    seed: np.random.SeedSequence | int | None = None  # 随机数种子, 由 run seed spawn 得到, 也可为每块一个种子的列表
+    persist: bool = True  # 是否写入中间文件, 结果由 future 流式消费时可关闭
+    sampling: str = "random"  # "random": 蒙特卡洛采样, "grid": 确定性等面积网格
+    grid_shape: tuple[int, int] | None = None  # grid 模式的 (n_range, n_azimuth), 见 utils.cap_grid_shape
+    grid_offset: int = 0  # grid 模式下本任务的起始网格下标
+    sat_state: np.ndarray | None = None  # time 时刻卫星的 ITRS 状态 (6,), 如 Constellation.states(), 给出则不再传播
+    seed_block: int | None = None  # seed 为列表时每个随机数流采样的点数
+    out_dir: Path | None = None  # persist 时的输出目录, 缺省为 INTER_DIR
+    h_km: float = 550  # 轨道高度 (km), 与 e0_deg 一起决定覆盖区
+    e0_deg: float = 30  # 覆盖区边缘的最小仰角 (°)
+    cache: ResultCache | None = None  # 跨运行的结果缓存, 按 seed_block 分块缓存
 
-    def run(self):
+    def __post_init__(self):
+        """检查采样参数, 在提交时而不是在 worker 中运行时报错"""
+        if self.sampling not in ("random", "grid"):
+            raise ValueError(f"Unknown sampling mode: {self.sampling}")
+        if self.seed_block is not None and (
+            not isinstance(self.seed_block, (int, np.integer)) or self.seed_block <= 0
+        ):
+            raise ValueError(f"seed_block must be a positive integer, got {self.seed_block!r}")
+
+        if self.grid_shape is not None:
+            if self.sampling != "grid":
+                raise ValueError(f"grid_shape only applies to sampling='grid', got sampling={self.sampling!r}")
+            if not (
+                isinstance(self.grid_shape, (tuple, list))
+                and len(self.grid_shape) == 2
+                and all(isinstance(n, (int, np.integer)) and n > 0 for n in self.grid_shape)
+            ):
+                raise ValueError(
+                    f"grid_shape must be (n_range, n_azimuth) of positive integers, got {self.grid_shape!r}"
+                )
+            self.grid_shape = (int(self.grid_shape[0]), int(self.grid_shape[1]))
+        elif self.sampling == "grid":
+            raise ValueError("sampling='grid' requires grid_shape, see utils.cap_grid_shape")
+
+        # 网格采样时 seed_block 是缓存分块的大小; 随机采样时只与每块一个种子的列表搭配
+        if self.sampling == "random":
+            seeds = self.seed if isinstance(self.seed, (list, tuple)) else None
+            if seeds is not None and self.seed_block is None:
+                raise ValueError("a list of seeds requires seed_block (points per seed)")
+            if seeds is None and self.seed_block is not None:
+                raise ValueError("seed_block requires seed to be a list with one seed per block")
+            if seeds is not None and len(seeds) != -(-self.n_samples // self.seed_block):
+                raise ValueError(
+                    f"{len(seeds)} seeds do not cover n_samples={self.n_samples} "
+                    f"in blocks of seed_block={self.seed_block}"
+                )
+
+    def psi(self) -> float:
+        """覆盖区的地心半角 (rad)"""
+        return footprint_central_angle_rad(self.h_km, self.e0_deg)
+
+    def subpoint(self) -> tuple[float, float, float]:
+        """卫星星下点 (lat (°), lon (°), height (km))"""
+        with phase("propagation"):
+            if self.sat_state is None:
+                return self.sat.pos_at(self.time)
+            lat, lon, height = itrs_to_latlon(self.sat_state[:3])
+            return float(lat), float(lon), float(height)
+
+    def log_start(self) -> None:
+        """每个任务一条日志, 参数惰性格式化 (被限流丢弃时不格式化), 结构化字段写入 JSON 日志"""
         logger.info(
-            f"task_id: {self.task_id}, time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            "task %d %s: n_samples=%d sampling=%s",
+            self.task_id, type(self).__name__, self.n_samples, self.sampling,
+            extra={"task_id": self.task_id, "n_samples": self.n_samples},
         )
-        results = []
-        lat, lon, height = self.sat.pos_at(self.time)
-        # print(f"lat: {lat}, lon: {lon}, height: {height}")
-        psi = footprint_central_angle_rad(550, 30)
 
-        logger.info(f"psi: {psi}")
-        logger.info(f"n_samples: {self.n_samples}")
-        for _ in range(self.n_samples):
-            la, lo = sample_point_in_spherical_cap(lat, lon, psi)
-            gs = wgs84.latlon(la, lo)
-            doppler, received_signal = self.sat.get_doppler(self.time, gs, True)
-            results.append((la, lo, doppler, received_signal))
+    def doppler(self, lats: np.ndarray, lons: np.ndarray):
+        """地面点的 range, range rate, doppler, received frequency"""
+        add_points(len(lats))
+        with phase("doppler"):
+            if self.sat_state is None:
+                result = self.sat.get_doppler_batch(self.time, lats, lons)
+            else:
+                result = doppler_from_state(
+                    self.sat_state[:3], self.sat_state[3:], ground_xyz(lats, lons), self.sat.signal_freq
+                )
+        # 逐点输出只在显式打开 VERBOSE 级别时产生
+        if logger.isEnabledFor(VERBOSE):
+            _, range_rate, doppler, received = result
+            for point in zip(lats, lons, range_rate, doppler, received):
+                logger.log(
+                    VERBOSE,
+                    "lat %.5f lon %.5f: range rate %.3f m/s, doppler %.3f Hz, received %.3f Hz",
+                    *point,
+                )
+        return result
+
+    def sample(self, lat: float, lon: float, psi: float) -> tuple[np.ndarray, np.ndarray]:
+        """按采样模式生成本任务的 n_samples 个地面点"""
+        with phase("sampling"):
+            if self.sampling == "grid":
+                stop = min(self.grid_offset + self.n_samples, cap_grid_size(self.grid_shape))
+                return cap_grid_points(lat, lon, psi, self.grid_shape, self.grid_offset, stop)
+            if self.sampling == "random" and isinstance(self.seed, (list, tuple)):
+                # 每块点数固定、各用自己的随机数流, 结果与任务如何分块无关
+                blocks = [
+                    sample_points_in_spherical_cap(
+                        lat, lon, psi,
+                        min(self.seed_block, self.n_samples - k * self.seed_block),
+                        np.random.default_rng(seed),
+                    )
+                    for k, seed in enumerate(self.seed)
+                ]
+                return np.concatenate([b[0] for b in blocks]), np.concatenate([b[1] for b in blocks])
+            if self.sampling == "random":
+                rng = np.random.default_rng(self.seed)
+                return sample_points_in_spherical_cap(lat, lon, psi, self.n_samples, rng)
+        raise ValueError(f"Unknown sampling mode: {self.sampling}")
+
+    def _blocks(self) -> list[tuple[dict, int]] | None:
+        """本任务结果按块的 (块标识, 点数); 结果不可复现 (无种子) 时返回 None
+
+        随机采样时每个种子一块, 网格采样时每 seed_block 个网格点一块,
+        块与任务如何分块无关, 因此不同分块方式的运行也能命中缓存。
+        """
+        if self.sampling == "grid":
+            stop = min(self.grid_offset + self.n_samples, cap_grid_size(self.grid_shape))
+            step = self.seed_block or self.n_samples
+            starts = range(self.grid_offset, max(stop, self.grid_offset + 1), step)
+            return [({"grid": [a, min(a + step, stop)]}, max(0, min(a + step, stop) - a)) for a in starts]
+        if self.seed is None:
+            return None
+        if isinstance(self.seed, (list, tuple)):
+            return [
+                ({"seed": seed_identity(seed)}, min(self.seed_block, self.n_samples - k * self.seed_block))
+                for k, seed in enumerate(self.seed)
+            ]
+        return [({"seed": seed_identity(self.seed)}, self.n_samples)]
+
+    def cache_keys(self) -> list[tuple[str, int]] | None:
+        """各块的缓存键与点数, 键由 TLE、时刻、载频、覆盖区、采样方式与块标识决定"""
+        blocks = self._blocks()
+        if blocks is None:
+            return None
+        scenario = {
+            "task": type(self).__name__,
+            "tle": list(self.sat.tle_lines),
+            "time": [float(self.time.whole), float(self.time.tt_fraction)],
+            "signal_freq": self.sat.signal_freq,
+            "footprint": [self.h_km, self.e0_deg],
+            "sampling": self.sampling,
+            "grid_shape": list(self.grid_shape) if self.grid_shape else None,
+            "sat_state": None if self.sat_state is None else np.asarray(self.sat_state).tolist(),
+        }
+        return [(cache_key(**scenario, block=block, n=n), n) for block, n in blocks]
+
+    def cached(self, compute) -> np.ndarray:
+        """所有块都命中缓存时直接返回缓存的结果, 否则调用 compute() 并写入未命中的块"""
+        keys = self.cache_keys() if self.cache is not None else None
+        if keys is None:
+            return compute()
+
+        with phase("cache"):
+            hits = self.cache.get_blocks([key for key, _ in keys])
+        n_hits = sum(hit is not None for hit in hits)
+        count("cache_hits", n_hits)
+        count("cache_misses", len(hits) - n_hits)
+        if n_hits == len(hits):
+            return hits[0] if len(hits) == 1 else np.concatenate(hits, axis=1)
+
+        results = compute()
+        with phase("cache"):
+            bounds = np.cumsum([0] + [n for _, n in keys])
+            if bounds[-1] == results.shape[1]:
+                # 未命中的块合并为一项写入
+                missed = [
+                    (key, a, b)
+                    for (key, _), hit, a, b in zip(keys, hits, bounds[:-1], bounds[1:])
+                    if hit is None
+                ]
+                self.cache.put_blocks(missed, results)
+        return results
+
+
+@dataclass
+class CalDopplerTask(CapSamplingTask):
+    """计算多普勒频移任务。"""
+
+    def run(self):
+        self.log_start()
+        results = self.cached(self.compute)
 
         # 写入文件
-        inter_dir = Path(__file__).parent.parent.parent / "data" / "intermediate"
-        inter_dir.mkdir(parents=True, exist_ok=True)
-        with open(inter_dir / f"{self.task_id}.txt", "w") as f:
-            for la, lo, doppler, received_signal in results:
-                f.write(f"{la},{lo},{doppler},{received_signal}\n")
+        if self.persist:
+            with phase("io"):
+                out_dir = self.out_dir or INTER_DIR
+                out_dir.mkdir(parents=True, exist_ok=True)
+                save_columns(out_dir / f"{self.task_id}.npy", results)
         return results
 
+    def compute(self) -> np.ndarray:
+        """采样并计算多普勒, 返回 (len(COLUMNS), n) 的列式结果"""
+        lat, lon, height = self.subpoint()
+        # print(f"lat: {lat}, lon: {lon}, height: {height}")
+        psi = self.psi()
+
+        lats, lons = self.sample(lat, lon, psi)
+        _, _, doppler, received_signal = self.doppler(lats, lons)
+        return np.stack((lats, lons, doppler, received_signal))
+
 @dataclass
-class TempCalFootprintTask(Task):
+class TempCalFootprintTask(CapSamplingTask):
     """计算足迹任务。"""
-    sat: Sat  # 卫星
-    time: Time
-    n_samples: int  # 子任务点的数量
 
     def run(self):
-        logger.info(
-            f"task_id: {self.task_id}, time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        )
-        results = []
-        lat, lon, height = self.sat.pos_at(self.time)
+        self.log_start()
+        lat, lon, height = self.subpoint()
         # print(f"lat: {lat}, lon: {lon}, height: {height}")
-        psi = footprint_central_angle_rad(550, 30)
+        psi = self.psi()
 
-        logger.info(f"psi: {psi}")
-        logger.info(f"n_samples: {self.n_samples}")
-        for _ in range(self.n_samples):
-            la, lo = sample_point_in_spherical_cap(lat, lon, psi)
-            gs = wgs84.latlon(la, lo)
-            doppler, received_signal = self.sat.get_doppler(self.time, gs, True)
-            results.append((la, lo, 100 * (self.task_id // 10), 100 * (self.task_id // 10)))
-            # logger.info(f"{self.task_id = }")
+        lats, lons = self.sample(lat, lon, psi)
+        self.doppler(lats, lons)
+        mark = np.full(len(lats), 100.0 * (self.task_id // 10))
+        results = np.stack((lats, lons, mark, mark))
 
         # 写入文件
-        inter_dir = Path(__file__).parent.parent.parent / "data" / "intermediate"
-        inter_dir.mkdir(parents=True, exist_ok=True)
-        with open(inter_dir / f"{self.task_id}.txt", "w") as f:
-            for la, lo, doppler, received_signal in results:
-                f.write(f"{la},{lo},{doppler},{received_signal}\n")
+        if self.persist:
+            with phase("io"):
+                out_dir = self.out_dir or INTER_DIR
+                out_dir.mkdir(parents=True, exist_ok=True)
+                save_columns(out_dir / f"{self.task_id}.npy", results)
         return results
 
+@dataclass
+class CoverageRasterTask(CapSamplingTask):
+    """计算覆盖栅格任务, 返回部分栅格 CoverageRaster。"""
+
+    sat_index: int = 0  # 卫星在星座中的序号, 对应覆盖位掩码的位
+    n_sats: int = 1  # 星座卫星数, 决定位掩码长度
+    res_deg: float = 1.0  # 栅格分辨率 (°)
+
+    def run(self):
+        self.log_start()
+        lat, lon, height = self.subpoint()
+        psi = self.psi()
+
+        lats, lons = self.sample(lat, lon, psi)
+        _, _, doppler, _ = self.doppler(lats, lons)
+
+        with phase("raster"):
+            raster = CoverageRaster(self.res_deg, self.n_sats)
+            raster.accumulate(lats, lons, doppler, self.sat_index)
+        return raster
+
+
+@dataclass
+class CalDopplerSweepTask(Task):
+    """计算一段时间 (整个过境) 内多个地面点的多普勒频移与变化率任务。"""
+
+    sat: Sat  # 卫星
+    times: Time  # 时间序列, 如 Sat.time_grid(start, stop, step_s)
+    lats: np.ndarray  # 地面点纬度 (°)
+    lons: np.ndarray  # 地面点经度 (°)
+    out_dir: Path | None = None  # 输出目录, 缺省为 FINAL_DIR
+
+    def run(self):
+        logger.info(
+            "task %d CalDopplerSweepTask: n_times=%d n_points=%d",
+            self.task_id, self.times.tt.size, np.size(self.lats),
+            extra={"task_id": self.task_id, "n_times": self.times.tt.size, "n_points": np.size(self.lats)},
+        )
+        add_points(self.times.tt.size * np.size(self.lats))
+        with phase("doppler"):
+            doppler, doppler_rate = self.sat.get_doppler_sweep(self.times, self.lats, self.lons)
+
+        # 原子地写入文件, 中断时不留下写了一半的 .npz
+        with phase("io"):
+            out_dir = self.out_dir or FINAL_DIR
+            out_dir.mkdir(parents=True, exist_ok=True)
+            with atomic_path(out_dir / f"sweep-{self.task_id}.npz") as tmp, open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    tt=self.times.tt,
+                    lats=self.lats,
+                    lons=self.lons,
+                    doppler=doppler,
+                    doppler_rate=doppler_rate,
+                )
+        return doppler, doppler_rate
+
+
+def _intermediate_files() -> list[Path]:
+    """按 task_id 排序的中间结果文件"""
+    return sorted(INTER_DIR.glob("*.npy"), key=lambda p: int(p.stem))
+
+
+def _merge(inputs: tuple, out_path: Path) -> np.ndarray:
+    """合并依赖任务传入的结果; 没有输入时合并并删除中间文件"""
+    FINAL_DIR.mkdir(parents=True, exist_ok=True)
+    with phase("io"):
+        if inputs:
+            merged = np.concatenate(inputs, axis=1)
+            save_columns(out_path, merged)
+        else:
+            files = _intermediate_files()
+            merged = merge_columns(files, out_path)
+            for file in files:
+                file.unlink()
+    add_points(merged.shape[1])
+    return merged
+
+
 class MergeTask(Task):
     """合并任务。"""
 
-    def run(self):
+    def run(self, *inputs):
         """合并所有子任务的结果。"""
-        inter_dir = Path(__file__).parent.parent.parent / "data" / "intermediate"
-        final_dir = Path(__file__).parent.parent.parent / "data" / "final"
-        final_dir.mkdir(parents=True, exist_ok=True)
-        if (final_dir / f"result.txt").exists():
-            (final_dir / f"result.txt").unlink()
-        with open(final_dir / f"result.txt", "a") as f:
-            for file in inter_dir.glob("*.txt"):
-                with open(file, "r") as f_in:
-                    for line in f_in:
-                        f.write(line)
-                file.unlink()
+        return _merge(inputs, FINAL_DIR / "result.npy")
 
 class MergeFootprintTask(Task):
     """合并足迹任务。"""
 
-    def run(self):
+    def run(self, *inputs):
         """合并所有子任务的足迹。"""
-        inter_dir = Path(__file__).parent.parent.parent / "data" / "intermediate"
-        final_dir = Path(__file__).parent.parent.parent / "data" / "final"
-        final_dir.mkdir(parents=True, exist_ok=True)
-        if (final_dir / f"result-footprint.txt").exists():
-            (final_dir / f"result-footprint.txt").unlink()
-        with open(final_dir / f"result-footprint.txt", "a") as f:
-            for file in inter_dir.glob("*.txt"):
-                with open(file, "r") as f_in:
-                    for line in f_in:
-                        f.write(line)
-                file.unlink()
+        return _merge(inputs, FINAL_DIR / "result-footprint.npy")
+
+
+@dataclass
+class MergeRunTask(Task):
+    """按运行清单合并任务输出: 只合并校验通过的输出, 按 offset 排序, 不删除。"""
+
+    run_dir: Path  # RunManifest 所在目录
+    out_path: Path  # 合并结果路径
+
+    def run(self, *inputs):
+        manifest = RunManifest.load(self.run_dir)
+        with phase("io"):
+            merged = merge_columns(manifest.verified_outputs(), self.out_path)
+        add_points(merged.shape[1])
+        return merged
+
+
+class MergeRasterTask(Task):
+    """合并覆盖栅格任务, 输入为 CoverageRasterTask 或其他 MergeRasterTask 的结果。"""
+
+    def run(self, *inputs):
+        with phase("raster"):
+            # reduce() 就地合并到第一个栅格, 复制以免修改依赖任务的结果
+            return CoverageRaster.reduce((copy.deepcopy(inputs[0]), *inputs[1:]))
 
 
 class DrawTask(Task):
     """绘制任务。"""
 
-    def run(self):
-        """绘制所有子任务的结果。"""
+    def run(self, *inputs):
+        """绘制所有子任务的结果, 依赖 MergeTask 时直接使用其结果。"""
+        # 绘图依赖 (matplotlib, scipy) 只在绘图时导入, 计算任务不需要
+        from vision.picture import save_3d_plot_to_file
+
         pic_dir = Path(__file__).parent.parent.parent / "data" / "pics"
         pic_dir.mkdir(parents=True, exist_ok=True)
-        data = Path(__file__).parent.parent.parent / "data" / "final"
-        res = []
-        
-        with open(data / f"result.txt", "r") as f:
-            for line in f:
-                la, lo, doppler, received_signal = line.strip().split(",")
-                res.append(
-                    (float(la) + 90, float(lo) + 180, float(doppler))
-                )
-                
-        
-        save_3d_plot_to_file(res, pic_dir)
-
+        data = inputs[0] if inputs else load_columns(FINAL_DIR / "result.npy")
+        res = np.column_stack(
+            (
+                data[COLUMN_INDEX["lat"]] + 90,
+                data[COLUMN_INDEX["lon"]] + 180,
+                data[COLUMN_INDEX["doppler"]],
+            )
+        )
 
-                
+        with phase("plot"):
+            save_3d_plot_to_file(res, pic_dir, max_points=20000)
@@ -1,64 +1,68 @@
 from components.simulate import TaskExecutor
-from components.sats import Sat
+from components.constellation import Constellation
+from components.results import FINAL_DIR
 from pathlib import Path
-from components.tasks import TempCalFootprintTask, MergeTask, MergeFootprintTask, CalDopplerTask
-from logger import logger
+from components.tasks import CoverageRasterTask, MergeRasterTask
+from logger import logger, use_rich
 from datetime import datetime, timezone
-from vision.picture import plot_footprint
+from vision.picture import plot_coverage_raster
+import numpy as np
 
 work_dir = Path(__file__).parent.parent
 data_dir = work_dir / "data"
 
 
 if __name__ == "__main__":
-    executor = TaskExecutor()
+    use_rich()
+    executor = TaskExecutor(mode="process", metrics_path=FINAL_DIR / "metrics.json")
 
     all_nums = 10000
     sub_nums = 1000
     task_num = all_nums // sub_nums
 
-    sat1 = Sat(data_dir / "tle" / "66206.tle", 868.1e6)
-    sat2 = Sat(data_dir / "tle" / "66208.tle", 868.1e6)
+    constellation = Constellation.from_files(
+        [data_dir / "tle" / "66206.tle", data_dir / "tle" / "66208.tle"], 868.1e6
+    )
+    time = constellation.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    # 所有卫星一次向量化传播, (n_sats, 1, 6)
+    states = constellation.states(time)
 
-    # 记录 futures
-    futures = []
-    for id in range(2):
+    # 每个任务一个独立的随机数流, 由同一个 run seed 派生, 结果可复现
+    run_seed = 20251201
+    seeds = np.random.SeedSequence(run_seed).spawn(task_num * len(constellation))
+
+    # 每颗卫星的部分栅格完成即合并, 与其他卫星的计算重叠, 最后合并各卫星的栅格
+    merges = []
+    for id, sat in enumerate(constellation):
+        futures = []
         for i in range(task_num):
-            task = TempCalFootprintTask(
+            task = CoverageRasterTask(
                 task_id=i + id * task_num,
-                sat=sat1 if id == 0 else sat2,
-                time=sat1.ts.from_datetime(
-                    datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
-                ),
+                sat=sat,
+                time=time,
                 n_samples=sub_nums,
+                seed=seeds[i + id * task_num],
+                sat_state=states[id, 0],
+                sat_index=id,
+                n_sats=len(constellation),
+                res_deg=0.5,
             )
             futures.append(executor.submit(task))
+        merges.append(
+            executor.submit(MergeRasterTask(task_id=len(constellation) * task_num + id), depends_on=futures)
+        )
 
-    # 等待所有前置任务完成
-    for f in futures:
-        f.result()
-        logger.info(f"{f}")
-
-    # 再提交 merge 任务
-    merge_task = MergeFootprintTask(task_id=task_num * 2)
-    executor.submit(merge_task).result()
+    total = executor.submit(
+        MergeRasterTask(task_id=len(constellation) * (task_num + 1)), depends_on=merges
+    )
+    raster = total.result()
 
     executor.shutdown()
 
+    FINAL_DIR.mkdir(parents=True, exist_ok=True)
+    raster.save(FINAL_DIR / "coverage.npz")
+    logger.info(f"covered cells: {np.count_nonzero(raster.count)}")
+
     pic_dir = Path(__file__).parent.parent / "data" / "pics"
     pic_dir.mkdir(parents=True, exist_ok=True)
-    data = Path(__file__).parent.parent / "data" / "final"
-    res = []
-    vis_point = []
-    logger.info(task_num)
-    with open(data / f"result-footprint.txt", "r") as f:
-        for line in f:
-            la, lo, doppler, received_signal = line.strip().split(",")
-            res.append(
-                (float(la) + 180, float(lo) + 180, float(doppler))
-            )
-            vis_point.append((float(la), float(lo), float(doppler)))
-    logger.info(f"{len(res)=}")
-    # save_3d_plot_to_file(res, pic_dir)
-    # print(res)
-    plot_footprint(res, pic_dir)
+    plot_coverage_raster(raster.n_covering(), pic_dir)
@@ -1,12 +1,179 @@
-import click
+import atexit
+import json
 import logging
-from rich.logging import RichHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
 
+FORMAT = "[%(module)s.%(funcName)s] %(message)s"
+
+# 逐点输出 (每个采样点的距离变化率、多普勒等) 的级别, 低于 DEBUG, 默认关闭
+VERBOSE = 5
+logging.addLevelName(VERBOSE, "VERBOSE")
+
+# 计算模块 (任务、执行器、worker) 只依赖标准库 logging; rich 与 click 只在入口脚本中
+# 通过 use_rich() / start_logging(rich=True) 加载, 进程池 worker 与只做计算的 CLI 不必为其付出导入时间
 logging.basicConfig(
     level="INFO",  # 只显示INFO及以上level的
-    format="[%(module)s.%(funcName)s] %(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True, tracebacks_suppress=[click])],
+    format="[%(asctime)s] %(levelname)-8s " + FORMAT,
+    datefmt="%X",
 )
 
 logger = logging.getLogger("rich")
+
+
+def _rich_handler() -> logging.Handler:
+    import click
+    from rich.logging import RichHandler
+
+    handler = RichHandler(rich_tracebacks=True, tracebacks_suppress=[click])
+    handler.setFormatter(logging.Formatter(FORMAT, datefmt="[%X]"))
+    return handler
+
+
+def use_rich(level: str = "INFO") -> None:
+    """在终端中用 rich 显示日志 (彩色、对齐、rich traceback), 由入口脚本调用"""
+    logging.basicConfig(level=level, handlers=[_rich_handler()], force=True)
+
+
+class RateLimitFilter(logging.Filter):
+    """每个调用点 (文件, 行号) 每 interval 秒最多放行 burst 条 DEBUG / INFO 记录
+
+    超出的记录被丢弃并计数, 该调用点下一条放行的记录注明丢弃的条数;
+    WARNING 及以上与 VERBOSE (显式开启的逐点输出) 不受限制。
+    """
+
+    def __init__(self, burst: int = 5, interval: float = 1.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: dict[tuple[str, int], list] = {}  # 调用点 -> [窗口开始, 已放行, 已丢弃]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not logging.DEBUG <= record.levelno < logging.WARNING:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault((record.pathname, record.lineno), [now, 0, 0])
+            if now - window[0] >= self.interval:
+                window[0], window[1] = now, 0
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.getMessage()} [{suppressed} similar messages suppressed]"
+            record.args = None
+        return True
+
+
+# LogRecord 的标准属性, 其余属性 (logger.info(..., extra={...}) 传入的) 作为结构化字段写出
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条记录一行紧凑的 JSON: 时间、级别、位置、进程/线程、消息与 extra 字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "t": round(record.created, 6),
+            "level": record.levelname,
+            "where": f"{record.module}.{record.funcName}",
+            "pid": record.process,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class LogPipeline:
+    """生产运行的日志管线
+
+    调用方 (任务、worker 线程) 只把记录放入队列 (QueueHandler), 格式化与终端/文件 I/O
+    由后台线程 (QueueListener) 完成, 不与计算争用。RateLimitFilter 只限制终端输出中每个
+    调用点的消息数, JSON lines 文件保留全部记录。进程模式下使用 multiprocessing 队列,
+    fork 出的 worker 继承队列, 其日志同样由主进程写出 (须在创建 worker 之前 start())。
+    """
+
+    def __init__(
+        self,
+        log_path: Path | None = None,
+        level: int | str = logging.INFO,
+        console: bool = True,
+        rich: bool = False,
+        burst: int = 5,
+        interval: float = 1.0,
+        processes: bool = False,
+        mode: str = "w",
+    ):
+        """
+        Args:
+            log_path: JSON lines 日志文件, None 表示不写文件
+            level: 根 logger 的级别, VERBOSE 打开逐点输出
+            console: 是否输出到终端
+            rich: 终端输出是否使用 rich
+            burst, interval: 终端输出中每个调用点每 interval 秒最多 burst 条 DEBUG / INFO 记录
+            processes: 是否有进程池 worker 写日志
+            mode: 日志文件的打开方式, 续跑时用 "a"
+        """
+        self.level = level
+        self.queue = _process_queue() if processes else queue.SimpleQueue()
+        self.handlers: list[logging.Handler] = []
+        # 文件 handler 排在前面: 终端的 RateLimitFilter 会在放行的记录上注明丢弃条数,
+        # 文件须在此之前写出原始消息
+        if log_path is not None:
+            Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.FileHandler(log_path, mode=mode)
+            handler.setFormatter(JsonLinesFormatter())
+            self.handlers.append(handler)
+        if console:
+            handler = _rich_handler() if rich else logging.StreamHandler()
+            if not rich:
+                handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)-8s " + FORMAT, "%X"))
+            handler.addFilter(RateLimitFilter(burst, interval))
+            self.handlers.append(handler)
+
+        self.queue_handler = QueueHandler(self.queue)
+        self.listener = QueueListener(self.queue, *self.handlers)
+        self._saved = None
+
+    def start(self) -> "LogPipeline":
+        root = logging.getLogger()
+        self._saved = (root.handlers[:], root.level)
+        root.handlers = [self.queue_handler]
+        root.setLevel(self.level)
+        self.listener.start()
+        return self
+
+    def stop(self) -> None:
+        """写出队列中剩余的记录, 恢复原来的 handler"""
+        if self._saved is None:
+            return
+        root = logging.getLogger()
+        root.handlers, level = self._saved
+        root.setLevel(level)
+        self._saved = None
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+
+
+def _process_queue():
+    import multiprocessing
+
+    return multiprocessing.Queue(-1)
+
+
+def start_logging(log_path: Path | None = None, verbose: bool = False, **kwargs) -> LogPipeline:
+    """启动日志管线 (见 LogPipeline), 进程退出时自动 stop(); verbose 打开逐点输出"""
+    pipeline = LogPipeline(log_path, level=VERBOSE if verbose else logging.INFO, **kwargs).start()
+    atexit.register(pipeline.stop)
+    return pipeline
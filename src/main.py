@@ -1,67 +1,175 @@
-from components.tasks import CalDopplerTask, MergeTask, DrawTask
+from components.tasks import MergeRunTask
+from components.manifest import RunManifest
+from components.cache import ResultCache
 from components.simulate import TaskExecutor
-from components.sats import Sat
+from components.planner import ChunkPlanner, cal_doppler_tasks
+from components.sats import Sat, C
+from components.results import COLUMN_INDEX, DATA_DIR, FINAL_DIR, load_columns
+from components.reduce import DopplerReducer
+from components.index import DopplerIndex
 from pathlib import Path
 from datetime import datetime, timezone
-from vision.picture import save_3d_plot_to_file, plot_contour_irregular
-from vision.viz import viz
-from logger import logger
+from utils import cap_grid_shape, cap_grid_size, footprint_central_angle_rad
+from logger import logger, start_logging
+import numpy as np
+import sys
 
 work_dir = Path(__file__).parent.parent
 data_dir = work_dir / "data"
 
 if __name__ == "__main__":
-    executor = TaskExecutor()
+    resume = "--resume" in sys.argv[1:]
+    run_dir = DATA_DIR / "runs" / "main"
+    # 日志经队列由后台线程写出, 每个调用点限流; 本次运行的结构化日志写入 run_dir/log.jsonl,
+    # `python main.py --verbose` 打开逐点输出
+    start_logging(
+        run_dir / "log.jsonl",
+        verbose="--verbose" in sys.argv[1:],
+        rich=True,
+        processes=True,
+        mode="a" if resume else "w",
+    )
+    executor = TaskExecutor(mode="process", metrics_path=FINAL_DIR / "metrics.json")
 
     all_nums = 100000
-    sub_nums = 100
-    task_num = all_nums // sub_nums
+    # 随机数流与分块粒度, 任务大小由 ChunkPlanner 按实测吞吐决定
+    block = 100
+
+    # "random": 蒙特卡洛采样; "grid": 确定性等面积网格, 点数由分辨率决定
+    sampling = "random"
+    grid_shape = None
+    if sampling == "grid":
+        grid_shape = cap_grid_shape(footprint_central_angle_rad(550, 30), resolution_km=10)
+        all_nums = cap_grid_size(grid_shape)
 
     sat = Sat(data_dir / "tle" / "57425.tle", 868.1e6)
 
-    # 记录 futures
-    futures = []
-    for i in range(task_num):
-        task = CalDopplerTask(
-            task_id=i,
-            sat=sat,
-            time=sat.ts.from_datetime(
-                datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
-            ),
-            n_samples=sub_nums,
-        )
-        futures.append(executor.submit(task))
+    # 每 block 个点一个独立的随机数流, 由同一个 run seed 派生, 结果可复现且与分块无关
+    run_seed = 20251201
+
+    # 是否保存逐点原始数据 (绘图需要), 聚合统计总是保存
+    persist_raw = True
+    # 是否在浏览器中 (Cesium) 查看所有点, 会阻塞直到关闭服务
+    serve_viz = False
+    # 是否记录运行清单: 每个任务的输出原子写入运行目录并记录校验和,
+    # 进程中断后以 `python main.py --resume` 跳过已完成的任务继续
+    checkpoint = True
+    # 跨运行的结果缓存 (data/cache), 相同场景重复运行时直接读取; None 表示不缓存
+    cache = ResultCache(max_bytes=1 << 30)
+
+    FINAL_DIR.mkdir(parents=True, exist_ok=True)
+    max_doppler = sat.signal_freq * 8000 / C
+    reducer = DopplerReducer(
+        doppler_range=(-max_doppler, max_doppler),
+        # 有清单时原始数据由校验过的任务输出合并得到
+        raw_path=FINAL_DIR / "result.npy" if persist_raw and not checkpoint else None,
+        raw_capacity=all_nums,
+    )
 
-    # 等待所有前置任务完成
-    for f in futures:
-        f.result()
-        logger.info(f"{f}")
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
 
-    # 再提交 merge 任务
-    merge_task = MergeTask(task_id=task_num)
-    executor.submit(merge_task).result()
+    make_task = cal_doppler_tasks(
+        sat, time, all_nums, block, run_seed, sampling=sampling, grid_shape=grid_shape, cache=cache
+    )
+    completed, first_task_id, task_of = [], 0, {}
+    if checkpoint:
+        params = {
+            "tle": sat.tle_lines,
+            "signal_freq": sat.signal_freq,
+            "time": time.utc_iso(),
+            "all_nums": all_nums,
+            "block": block,
+            "run_seed": run_seed,
+            "sampling": sampling,
+            "grid_shape": grid_shape,
+        }
+        manifest = RunManifest.open(run_dir, params, resume)
+        # 已完成且校验通过的任务不再计算, 其输出直接参与聚合
+        for _, record in manifest.verified():
+            reducer.consume(load_columns(manifest.output_dir / record["file"]), record["offset"])
+            completed.append((record["offset"], record["n"]))
+        first_task_id = manifest.next_task_id
+        logger.info(f"resume: {len(completed)} tasks, {reducer.count} points already done")
 
-    # 再提交 draw 任务
-    # draw_task = DrawTask(task_id=task_num + 1)
-    # executor.submit(draw_task).result()
+        plan_task = make_task
+
+        def make_task(task_id, offset, n):
+            manifest.add_task(task_id, offset, n)
+            task_of[offset] = task_id
+            task = plan_task(task_id, offset, n)
+            task.persist, task.out_dir = True, manifest.output_dir
+            return task
+
+    # 任务完成即聚合
+    planner = ChunkPlanner(
+        executor, make_task, all_nums, block=block, completed=completed, first_task_id=first_task_id
+    )
+    for offset, columns in planner.run():
+        if checkpoint:
+            manifest.mark_done(task_of[offset])
+        reducer.consume(columns, offset)
+    task_num = len(planner.chunks)
+    reducer.save(FINAL_DIR / "summary.npz")
+    if checkpoint and persist_raw:
+        # 只合并清单中校验通过的输出, 按 offset 排序
+        MergeRunTask(task_id=first_task_id + task_num, run_dir=run_dir, out_path=FINAL_DIR / "result.npy").run()
+    logger.info(f"{reducer.summary()}")
 
     executor.shutdown()
-    
-    pic_dir = Path(__file__).parent.parent / "data" / "pics"
-    pic_dir.mkdir(parents=True, exist_ok=True)
-    data = Path(__file__).parent.parent / "data" / "final"
-    res = []
-    vis_point = []
-    logger.info(task_num)
-    with open(data / f"result.txt", "r") as f:
-        for line in f:
-            la, lo, doppler, received_signal = line.strip().split(",")
-            res.append(
-                (float(la) + 180, float(lo) + 180, float(doppler))
+    if cache is not None:
+        counts = executor.snapshot()["counts"]
+        logger.info(
+            f"cache: {counts.get('cache_hits', 0)} hits, {counts.get('cache_misses', 0)} misses, "
+            f"{cache.stats()['bytes'] / 1e6:.1f} MB"
+        )
+
+    # 在结果旁保存空间索引, 供之后按任意地面点查询多普勒
+    if persist_raw:
+        result_path = FINAL_DIR / "result.npy"
+        DopplerIndex.from_result(result_path).save(DopplerIndex.path_for(result_path))
+
+    # 绘图需要逐点原始数据; 绘图 (matplotlib) 与可视化 (flask) 模块只在这里导入
+    if persist_raw:
+        from vision.picture import plot_contour_grid, plot_doppler_raster
+
+        pic_dir = Path(__file__).parent.parent / "data" / "pics"
+        pic_dir.mkdir(parents=True, exist_ok=True)
+        data = Path(__file__).parent.parent / "data" / "final"
+        logger.info(task_num)
+        result = load_columns(data / "result.npy")
+        res = np.column_stack(
+            (
+                result[COLUMN_INDEX["lat"]] + 180,
+                result[COLUMN_INDEX["lon"]] + 180,
+                result[COLUMN_INDEX["doppler"]],
+            )
+        )
+        logger.info(f"{len(res)=}")
+        if sampling == "grid":
+            plot_contour_grid(
+                result[COLUMN_INDEX["lat"]],
+                result[COLUMN_INDEX["lon"]],
+                result[COLUMN_INDEX["doppler"]],
+                grid_shape,
+                pic_dir,
             )
-            vis_point.append((float(la), float(lo), 0))
-    logger.info(f"{len(res)=}")
-    save_3d_plot_to_file(res, pic_dir)
-    # plot_contour_irregular(res, pic_dir)
+        else:
+            plot_doppler_raster(
+                result[COLUMN_INDEX["lat"]],
+                result[COLUMN_INDEX["lon"]],
+                result[COLUMN_INDEX["doppler"]],
+                pic_dir,
+            )
+            # 3D 散点图渲染较慢, 需要时再打开 (从 vision.picture 导入)
+            # save_3d_plot_to_file(res, pic_dir, max_points=20000)
+            # plot_contour_irregular(res, pic_dir)
+
+        if serve_viz:
+            from vision.viz import viz_points
 
-    
+            viz_points(
+                sat.pos_at(time),
+                result[COLUMN_INDEX["lat"]],
+                result[COLUMN_INDEX["lon"]],
+                result[COLUMN_INDEX["doppler"]],
+            )
@@ -1,6 +1,8 @@
 import math
 import random
-from typing import Tuple
+from typing import Optional, Tuple
+
+import numpy as np
 
 
 def footprint_central_angle_rad(h_km: float, e0_deg: float, R_km: float = 6371.0) -> float:
@@ -102,3 +104,195 @@ def sample_point_in_spherical_cap(
     lon_deg = math.degrees(lon2)
 
     return lat_deg, lon_deg
+
+
+def _cap_offset_to_latlon(
+    center_lat_deg: float,
+    center_lon_deg: float,
+    theta: np.ndarray,
+    phi: np.ndarray,
+    eps: float = 1e-12,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    将相对中心点的 (角距离, 方位角) 转换为经纬度, 向量化版本。
+
+    Args:
+        center_lat_deg: Center latitude in degrees [-90, 90]
+        center_lon_deg: Center longitude in degrees [-180, 180]
+        theta: Angular distance from the center in radians
+        phi: Azimuth (clockwise from north) in radians
+        eps: Numerical tolerance
+
+    Returns:
+        (latitude_deg, longitude_deg) arrays
+    """
+    lat1 = math.radians(center_lat_deg)
+    lon1 = math.radians(center_lon_deg)
+
+    # 计算新纬度
+    sin_lat2 = math.sin(lat1) * np.cos(theta) + math.cos(lat1) * np.sin(theta) * np.cos(phi)
+    lat2 = np.arcsin(np.clip(sin_lat2, -1.0 + eps, 1.0 - eps))
+
+    # 计算新经度
+    y = np.sin(phi) * np.sin(theta) * math.cos(lat1)
+    x = np.cos(theta) - math.sin(lat1) * np.sin(lat2)
+
+    # 避免除零
+    delta_lon = np.where(
+        (np.abs(x) < eps) & (np.abs(y) < eps), 0.0, np.arctan2(y, x)
+    )
+
+    # 规范化到 [-π, π]
+    lon2 = (lon1 + delta_lon + math.pi) % (2 * math.pi) - math.pi
+
+    return np.degrees(lat2), np.degrees(lon2)
+
+
+def sample_points_in_spherical_cap(
+    center_lat_deg: float,
+    center_lon_deg: float,
+    cap_angle_rad: float,
+    n: int,
+    rng: Optional[np.random.Generator] = None,
+    eps: float = 1e-12,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Uniform sampling of n points over a spherical cap at once.
+
+    Args:
+        center_lat_deg: Center latitude in degrees [-90, 90]
+        center_lon_deg: Center longitude in degrees [-180, 180]
+        cap_angle_rad: Angular radius of the cap in radians [0, π]
+        n: Number of points
+        rng: numpy random generator, a fresh unseeded one if None
+        eps: Numerical tolerance
+
+    Returns:
+        (latitude_deg, longitude_deg) arrays of shape (n,)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # 边界情况处理
+    if cap_angle_rad <= eps:
+        return np.full(n, float(center_lat_deg)), np.full(n, float(center_lon_deg))
+
+    if cap_angle_rad >= math.pi - eps:
+        # 整个球面均匀采样
+        u = rng.uniform(-1, 1, n)
+        lon_rad = rng.uniform(-math.pi, math.pi, n)
+        return np.degrees(np.arcsin(u)), np.degrees(lon_rad)
+
+    # 常规采样
+    u = rng.uniform(math.cos(cap_angle_rad), 1.0, n)
+    theta = np.arccos(u)  # 角距离
+    phi = rng.uniform(0, 2 * math.pi, n)  # 方位角
+
+    return _cap_offset_to_latlon(center_lat_deg, center_lon_deg, theta, phi, eps)
+
+
+def cap_grid_shape(cap_angle_rad: float, resolution_km: float, R_km: float = 6371.0) -> Tuple[int, int]:
+    """
+    给定分辨率下球冠网格的 (环数, 最外环的方位角数), 见 cap_grid_points。
+
+    环间距 (沿地心角) 与每环的方位角间距都不超过 resolution_km。
+
+    Args:
+        cap_angle_rad: Angular radius of the cap in radians
+        resolution_km: Approximate point spacing on the surface (km)
+        R_km: Earth radius (km)
+
+    Returns:
+        (n_range, n_azimuth)
+    """
+    n_range = max(1, math.ceil(R_km * cap_angle_rad / resolution_km))
+    # 最外环的角半径; 按弧长 θ (≥ 周长对应的 sin θ) 计算, 各环的方位角间距都不超过分辨率
+    theta_outer = cap_angle_rad * (n_range - 0.5) / n_range
+    n_azimuth = max(1, math.ceil(2 * math.pi * R_km * theta_outer / resolution_km))
+    return n_range, n_azimuth
+
+
+def cap_grid_ring_sizes(grid_shape: Tuple[int, int]) -> np.ndarray:
+    """
+    每环的点数: 与环的角半径成正比 (即与周长近似成正比), 最外环为 n_azimuth。
+
+    Args:
+        grid_shape: (n_range, n_azimuth)
+
+    Returns:
+        int64 array of shape (n_range,)
+    """
+    n_range, n_azimuth = grid_shape
+    ring = np.arange(n_range)
+    return np.maximum(1, np.ceil(n_azimuth * (2 * ring + 1) / (2 * n_range - 1) - 1e-9)).astype(np.int64)
+
+
+def cap_grid_size(grid_shape: Tuple[int, int]) -> int:
+    """网格的总点数"""
+    return int(cap_grid_ring_sizes(grid_shape).sum())
+
+
+def cap_grid_points(
+    center_lat_deg: float,
+    center_lon_deg: float,
+    cap_angle_rad: float,
+    grid_shape: Tuple[int, int],
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Deterministic, nearly uniform lattice over a spherical cap.
+
+    Rings are evenly spaced in central angle (ring k at θ = (k + 0.5) ψ / n_range)
+    and ring k holds cap_grid_ring_sizes(grid_shape)[k] points evenly spaced in
+    azimuth, proportional to its circumference, so the point spacing is about
+    the same everywhere in the cap, including near the center. Points are
+    numbered ring by ring from the center outwards, so tasks can take
+    contiguous index ranges [start, stop).
+
+    Args:
+        center_lat_deg: Center latitude in degrees [-90, 90]
+        center_lon_deg: Center longitude in degrees [-180, 180]
+        cap_angle_rad: Angular radius of the cap in radians [0, π]
+        grid_shape: (n_range, n_azimuth), see cap_grid_shape
+        start: First lattice index
+        stop: One past the last lattice index, cap_grid_size(grid_shape) if None
+
+    Returns:
+        (latitude_deg, longitude_deg) arrays of shape (stop - start,)
+    """
+    n_range, _ = grid_shape
+    sizes = cap_grid_ring_sizes(grid_shape)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    if stop is None:
+        stop = int(offsets[-1])
+
+    index = np.arange(start, stop)
+    ring = np.searchsorted(offsets, index, side="right") - 1
+    sector = index - offsets[ring]
+
+    theta = cap_angle_rad * (ring + 0.5) / n_range  # 角距离
+    phi = 2 * math.pi * (sector + 0.5) / sizes[ring]  # 方位角
+
+    return _cap_offset_to_latlon(center_lat_deg, center_lon_deg, theta, phi)
+
+
+def latlon_grid_index(
+    lats: np.ndarray, lons: np.ndarray, res_deg: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    全球经纬度网格中的格子下标。
+
+    Args:
+        lats: Latitudes in degrees [-90, 90]
+        lons: Longitudes in degrees [-180, 180]
+        res_deg: Cell size in degrees
+
+    Returns:
+        (row, col) arrays, row 0 at -90°, col 0 at -180°
+    """
+    n_lat = math.ceil(180 / res_deg)
+    n_lon = math.ceil(360 / res_deg)
+    i = np.clip(((np.asarray(lats) + 90) // res_deg).astype(np.int64), 0, n_lat - 1)
+    j = np.clip(((np.asarray(lons) + 180) // res_deg).astype(np.int64), 0, n_lon - 1)
+    return i, j
@@ -1,42 +1,32 @@
-import matplotlib
+"""绘图: 所有图都用 Agg 画布 (Figure + FigureCanvasAgg) 直接渲染到文件, 不经过 pyplot,
+无界面环境下不会阻塞, 也不依赖全局的后端设置。"""
 
-# 在导入pyplot之前设置非交互式后端
-# matplotlib.use("Agg")  # 不显示图形，只保存到文件
-import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from pathlib import Path
 from scipy.interpolate import griddata
 
+from utils import cap_grid_ring_sizes, cap_grid_size
+
+
+def _decimate(data, max_points: int | None) -> np.ndarray:
+    """转为 (n, 3) 数组; 点数超过 max_points 时等间隔抽取"""
+    data = np.asarray(data, dtype=np.float64).reshape(-1, 3)
+    if max_points is not None and len(data) > max_points:
+        data = data[np.linspace(0, len(data) - 1, max_points).astype(np.int64)]
+    return data
+
 
 def plot_footprint(
     data: list[tuple[float, float, float]],
     save_dir: Path,
 
     filename: str = "footprint.png",
+    max_points: int | None = None,
 ):
-    fig = plt.figure(figsize=(10, 8))
-    ax = fig.add_subplot(111, projection="3d")
-
-    x = [p[0] for p in data]
-    y = [p[1] for p in data]
-    z = [p[2] for p in data]
-
-    scatter = ax.scatter(x, y, z, c=z, cmap="viridis", s=20, alpha=0.8)
-
-    ax.set_xlabel("X")
-    ax.set_ylabel("Y")
-    ax.set_zlabel("Z")
-    ax.set_title("3D Plot")
-
-    plt.colorbar(scatter, ax=ax, label="Z value")
-    plt.tight_layout()
-    
-    # 保存到文件而不是显示
-    plt.savefig(save_dir / filename, dpi=300, bbox_inches="tight")
-    
-    print(f"图形已保存到: {save_dir / filename}")
-    plt.show()
-    plt.close(fig)  # 关闭图形释放内存
+    """覆盖区内的点绘制为 3D 散点图"""
+    _save_3d_scatter(data, save_dir / filename, max_points)
 
 
 def plot_contour_irregular(
@@ -44,7 +34,7 @@ def plot_contour_irregular(
     saved_dir: Path, # 当前代码未使用
     filename: str = "contour.png",
 ):
-    if not data or len(data[0]) < 3:
+    if len(data) == 0 or len(data[0]) < 3:
          print("Invalid data format.")
          return
 
@@ -61,36 +51,209 @@ def plot_contour_irregular(
     Zi = griddata(points, values, (Xi, Yi), method='linear')
 
     # 绘制等高线图
-    plt.figure(figsize=(6, 4))
+    fig = Figure(figsize=(6, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
     if Zi is not None and not np.all(np.isnan(Zi)): # 检查插值是否成功
-        cs = plt.contour(Xi, Yi, Zi, levels=70, colors="k")
-        plt.clabel(cs, inline=True, fontsize=8)
+        cs = ax.contour(Xi, Yi, Zi, levels=70, colors="k")
+        ax.clabel(cs, inline=True, fontsize=8)
     else:
        print("Interpolation failed or resulted in no valid data.")
 
-    plt.title("Contour plot: doppler (interpolated)")
-    plt.xlabel("x")
-    plt.ylabel("y")
-    plt.grid(True)
+    ax.set_title("Contour plot: doppler (interpolated)")
+    ax.set_xlabel("x")
+    ax.set_ylabel("y")
+    ax.grid(True)
+
+    fig.savefig(saved_dir / filename)
+
+
+def cap_grid_to_2d(
+    lats: np.ndarray, lons: np.ndarray, values: np.ndarray, grid_shape: tuple[int, int]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """把球冠网格 (utils.cap_grid_points) 上的数据整理为 (n_range, n_azimuth + 1) 的二维数组 (lat, lon, value)
+
+    各环点数不同, 每环按方位角周期插值到最外环的 n_azimuth 个方位上 (坐标在单位向量上插值),
+    最后一列重复第一列使每环闭合; 经度以中心 (第一环) 经度连续展开, 跨越 ±180° 时不断开。
+    """
+    lats, lons, values = (np.ravel(a) for a in (lats, lons, values))
+    if len(lats) != cap_grid_size(grid_shape):
+        raise ValueError(f"expected {cap_grid_size(grid_shape)} grid points, got {len(lats)}")
+
+    n_range, n_azimuth = grid_shape
+    sizes = cap_grid_ring_sizes(grid_shape)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    phi = 2 * np.pi * (np.arange(n_azimuth + 1) + 0.5) / n_azimuth
+
+    lat_r, lon_r = np.radians(lats), np.radians(lons)
+    xyz = np.stack((np.cos(lat_r) * np.cos(lon_r), np.cos(lat_r) * np.sin(lon_r), np.sin(lat_r)))
+    out_xyz = np.empty((3, n_range, n_azimuth + 1))
+    out_values = np.empty((n_range, n_azimuth + 1))
+    for ring, size in enumerate(sizes):
+        ring_slice = slice(offsets[ring], offsets[ring + 1])
+        ring_phi = 2 * np.pi * (np.arange(size) + 0.5) / size
+        for axis in range(3):
+            out_xyz[axis, ring] = np.interp(phi, ring_phi, xyz[axis, ring_slice], period=2 * np.pi)
+        out_values[ring] = np.interp(phi, ring_phi, values[ring_slice], period=2 * np.pi)
+
+    x, y, z = out_xyz / np.linalg.norm(out_xyz, axis=0)
+    grid_lats = np.degrees(np.arcsin(np.clip(z, -1.0, 1.0)))
+    grid_lons = np.degrees(np.arctan2(y, x))
+    grid_lons = lons[0] + (grid_lons - lons[0] + 180) % 360 - 180
+    return grid_lats, grid_lons, out_values
+
+
+def plot_contour_grid(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    values: np.ndarray,
+    grid_shape: tuple[int, int],
+    saved_dir: Path,
+    filename: str = "contour-grid.png",
+    levels: int = 70,
+):
+    """绘制确定性球冠网格 (utils.cap_grid_points) 上的等值线, 整理为二维网格后用 contour 绘制"""
+    grid_lats, grid_lons, grid_values = cap_grid_to_2d(lats, lons, values, grid_shape)
+
+    fig = Figure(figsize=(6, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    cs = ax.contour(grid_lons, grid_lats, grid_values, levels=levels, colors="k")
+    ax.clabel(cs, inline=True, fontsize=8)
+
+    ax.set_title("Contour plot: doppler (grid)")
+    ax.set_xlabel("lon")
+    ax.set_ylabel("lat")
+    ax.grid(True)
+
+    fig.savefig(saved_dir / filename)
+    print(f"图形已保存到: {saved_dir / filename}")
+
+
+def plot_coverage_raster(
+    values: np.ndarray,
+    saved_dir: Path,
+    filename: str = "coverage.png",
+    label: str = "covering satellites",
+):
+    """绘制全球经纬度栅格 (行 0 为 -90°, 列 0 为 -180°)"""
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    masked = np.ma.masked_where(values == 0, values)
+    im = ax.imshow(
+        masked,
+        origin="lower",
+        extent=(-180, 180, -90, 90),
+        cmap="viridis",
+        interpolation="nearest",
+    )
+    fig.colorbar(im, ax=ax, label=label, shrink=0.7)
+    ax.set_xlabel("lon")
+    ax.set_ylabel("lat")
+    ax.set_title("Coverage")
+
+    fig.savefig(saved_dir / filename, dpi=150, bbox_inches="tight")
+
+    print(f"图形已保存到: {saved_dir / filename}")
+
+
+def bin_latlon(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    values: np.ndarray,
+    bins: int | tuple[int, int] | None = None,
+    extent: tuple[float, float, float, float] | None = None,
+    stat: str = "mean",
+) -> tuple[np.ndarray, tuple[float, float, float, float]]:
+    """把散点按经纬度分箱为图像, 每个像素取 mean / min / max / count
+
+    bins 缺省时按平均每像素约 4 个点选取, 不超过 400 × 400。
+
+    Returns:
+        (n_lat, n_lon) 图像 (无点的像素为 nan) 与 extent (lon_min, lon_max, lat_min, lat_max)
+    """
+    lats, lons, values = (np.asarray(a, dtype=np.float64).ravel() for a in (lats, lons, values))
+    if bins is None:
+        bins = int(np.clip(np.sqrt(lats.size / 4), 16, 400))
+    n_lon, n_lat = (bins, bins) if np.isscalar(bins) else bins
+    if extent is None:
+        extent = (lons.min(), lons.max(), lats.min(), lats.max())
+    lon_min, lon_max, lat_min, lat_max = extent
+
+    # 闭区间, 最大值落在最后一个像素
+    i = np.clip(((lats - lat_min) / max(lat_max - lat_min, 1e-12) * n_lat).astype(np.int64), 0, n_lat - 1)
+    j = np.clip(((lons - lon_min) / max(lon_max - lon_min, 1e-12) * n_lon).astype(np.int64), 0, n_lon - 1)
+    inside = (lats >= lat_min) & (lats <= lat_max) & (lons >= lon_min) & (lons <= lon_max)
+    cells = (i * n_lon + j)[inside]
+    values = values[inside]
+
+    count = np.bincount(cells, minlength=n_lat * n_lon)
+    if stat == "count":
+        image = count.astype(np.float64)
+    elif stat == "mean":
+        image = np.bincount(cells, weights=values, minlength=n_lat * n_lon) / np.maximum(count, 1)
+    elif stat in ("min", "max"):
+        image = np.full(n_lat * n_lon, np.inf if stat == "min" else -np.inf)
+        (np.minimum if stat == "min" else np.maximum).at(image, cells, values)
+    else:
+        raise ValueError(f"Unknown stat: {stat}")
+
+    image[count == 0] = np.nan
+    return image.reshape(n_lat, n_lon), (lon_min, lon_max, lat_min, lat_max)
 
-    plt.savefig(saved_dir / filename)
-    
-    plt.show()
-    plt.close()
+
+def plot_doppler_raster(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    values: np.ndarray,
+    saved_dir: Path,
+    filename: str = "doppler-raster.png",
+    bins: int | tuple[int, int] | None = None,
+    stat: str = "mean",
+    extent: tuple[float, float, float, float] | None = None,
+    label: str = "doppler shift (Hz)",
+):
+    """栅格化绘制: 按经纬度分箱后用 imshow 绘制, 耗时与点数基本无关"""
+    image, extent = bin_latlon(lats, lons, values, bins, extent, stat)
+
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    im = ax.imshow(
+        np.ma.masked_invalid(image),
+        origin="lower",
+        extent=extent,
+        aspect="auto",
+        cmap="viridis",
+        interpolation="nearest",
+    )
+    fig.colorbar(im, ax=ax, label=f"{label} ({stat})")
+    ax.set_xlabel("lon")
+    ax.set_ylabel("lat")
+    ax.set_title(f"Doppler raster ({len(np.ravel(lats))} points)")
+
+    fig.savefig(saved_dir / filename, dpi=150, bbox_inches="tight")
+    print(f"图形已保存到: {saved_dir / filename}")
 
 
 def save_3d_plot_to_file(
     data: list[tuple[float, float, float]],
     saved_dir: Path,
     filename: str = "output.png",
+    max_points: int | None = None,
 ):
     """将3D图保存到文件，而不是显示"""
-    fig = plt.figure(figsize=(10, 8))
+    _save_3d_scatter(data, saved_dir / filename, max_points)
+
+
+def _save_3d_scatter(data, path: Path, max_points: int | None) -> None:
+    """3D 散点图渲染到文件, 点数超过 max_points 时等间隔抽取"""
+    fig = Figure(figsize=(10, 8))
+    FigureCanvasAgg(fig)
     ax = fig.add_subplot(111, projection="3d")
 
-    x = [p[0] for p in data]
-    y = [p[1] for p in data]
-    z = [p[2] for p in data]
+    x, y, z = _decimate(data, max_points).T
 
     scatter = ax.scatter(x, y, z, c=z, cmap="viridis", s=20, alpha=0.8)
 
@@ -99,15 +262,9 @@ def save_3d_plot_to_file(
     ax.set_zlabel("Z")
     ax.set_title("3D Plot")
 
-    plt.colorbar(scatter, ax=ax, label="Z value")
-    plt.tight_layout()
-    
-    # 保存到文件而不是显示
-    plt.savefig(saved_dir / filename, dpi=300, bbox_inches="tight")
-    
-    print(f"图形已保存到: {saved_dir / filename}")
-    plt.show()
-    plt.close(fig)  # 关闭图形释放内存
+    fig.colorbar(scatter, ax=ax, label="Z value")
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    print(f"图形已保存到: {path}")
 
 
 # def draw_picture(
@@ -1,5 +1,8 @@
+import json
 from pathlib import Path
-from flask import Flask
+
+import numpy as np
+from flask import Flask, Response, abort, jsonify
 
 NAME = "constellation_viz"
 
@@ -12,6 +15,8 @@ COLOR = [
 ]  # color for orbit supported by CesiumJS
 
 HTML_DIR = Path(__file__).parent.parent.parent / "static" / "html"
+EXPORT_DIR = Path(__file__).parent.parent.parent / "data" / "viz"
+CHUNK_SIZE = 65536  # 每次请求的点数
 
 
 def gen_html(pos: tuple[float, float, float], pt: list) -> str:
@@ -71,3 +76,86 @@ def viz(pos: tuple[float, float, float], pt: list):
         return app.send_static_file(f"{NAME}.html")
 
     app.run(debug=False)
+
+
+def export_points(
+    path: Path,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    doppler: np.ndarray,
+    pos: tuple[float, float, float] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """导出供 Cesium 批量绘制的点
+
+    path 为 little-endian float32 的二进制文件, 每点依次为 lon (°), lat (°), doppler (Hz);
+    元数据 (点数、分块、多普勒范围、卫星位置) 写入同名 .json。
+    """
+    points = np.column_stack((lons, lats, doppler)).astype("<f4")
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    points.tofile(path)
+
+    n = len(points)
+    meta = {
+        "n": n,
+        "chunk_size": chunk_size,
+        "n_chunks": -(-n // chunk_size),
+        "doppler_min": float(np.min(doppler)) if n else 0.0,
+        "doppler_max": float(np.max(doppler)) if n else 0.0,
+        "sat": None if pos is None else {"lat": pos[0], "lon": pos[1], "height_km": float(pos[2])},
+    }
+    with open(path.with_suffix(".json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def create_points_app(path: Path) -> Flask:
+    """为 export_points() 的导出文件创建 Flask 应用
+
+    /              页面, 由 top.html + points.html + bottom.html 拼接
+    /points/meta   元数据 JSON
+    /points/<i>    第 i 块的点, application/octet-stream (float32 × 3 × 点数)
+    """
+    path = Path(path)
+    with open(path.with_suffix(".json"), "r") as f:
+        meta = json.load(f)
+    points = np.memmap(path, dtype="<f4", mode="r", shape=(meta["n"], 3)) if meta["n"] else None
+
+    # 页面不含数据, 只需拼接一次
+    html = ""
+    for part in ("top.html", "points.html", "bottom.html"):
+        with open(HTML_DIR / part, "r") as f:
+            html += f.read()
+
+    app = Flask(__name__, static_folder=HTML_DIR)
+
+    @app.route("/")
+    def index():
+        return Response(html, mimetype="text/html")
+
+    @app.route("/points/meta")
+    def points_meta():
+        return jsonify(meta)
+
+    @app.route("/points/<int:chunk>")
+    def points_chunk(chunk: int):
+        if chunk >= meta["n_chunks"]:
+            abort(404)
+        start = chunk * meta["chunk_size"]
+        data = points[start : start + meta["chunk_size"]].tobytes()
+        return Response(data, mimetype="application/octet-stream")
+
+    return app
+
+
+def viz_points(
+    pos: tuple[float, float, float],
+    lats: np.ndarray,
+    lons: np.ndarray,
+    doppler: np.ndarray,
+):
+    """大量点的可视化: 导出为二进制, 页面分块获取后用 PointPrimitiveCollection 按多普勒着色"""
+    path = EXPORT_DIR / "points.bin"
+    export_points(path, lats, lons, doppler, pos)
+    create_points_app(path).run(debug=False)
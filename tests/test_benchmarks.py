@@ -0,0 +1,37 @@
+import importlib.util
+from pathlib import Path
+
+BENCH_PATH = Path(__file__).parent.parent / "benchmarks" / "run.py"
+
+
+def load_runner():
+    spec = importlib.util.spec_from_file_location("bench_run", BENCH_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_suite_runs_and_flags_regressions(tmp_path):
+    runner = load_runner()
+    out = tmp_path / "bench.json"
+    assert runner.main(["--sizes", "100", "--repeat", "1", "-k", "spherical_cap", "--out", str(out)]) == 0
+    assert out.exists()
+
+    current = {"results": {"a[100]": {"min_s": 1.5}, "b[100]": {"min_s": 1.0}}}
+    baseline = {"results": {"a[100]": {"min_s": 1.0}, "b[100]": {"min_s": 1.0}}}
+    regressions = runner.compare(current, baseline, threshold=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("a[100]")
+
+
+def test_compute_path_does_not_import_plotting_stack():
+    runner = load_runner()
+    seconds, heavy = runner.import_in_subprocess(runner.COMPUTE_MODULES)
+    assert heavy == [], f"compute modules pulled in {heavy}"
+    _, heavy = runner.import_in_subprocess(("vision.picture",))
+    assert "matplotlib" in heavy
+
+
+def test_entry_script_imports_plotting_lazily():
+    runner = load_runner()
+    _, heavy = runner.import_in_subprocess(("main",))
+    assert not {"matplotlib", "flask"} & set(heavy), f"main pulled in {heavy}"
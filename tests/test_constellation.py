@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from components.constellation import Constellation
+
+TLE_DIR = Path(__file__).parent.parent / "data" / "tle"
+
+
+def test_states_match_per_satellite_propagation():
+    constellation = Constellation.load(TLE_DIR, 868.1e6)
+    assert len(constellation) == 3
+    assert all(sat.ts is constellation.ts for sat in constellation)
+
+    start = datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
+    times = constellation[0].time_grid(start, datetime(2025, 12, 1, 8, 30, 0, tzinfo=timezone.utc), 60.0)
+    states = constellation.states(times)
+
+    assert states.shape == (3, 31, 6)
+    for i, sat in enumerate(constellation):
+        r, v = sat.itrs_state(times)
+        assert np.allclose(states[i, :, :3], r.T, atol=1e-6)
+        assert np.allclose(states[i, :, 3:], v.T, atol=1e-6)
+
+
+def test_doppler_batch_shape():
+    constellation = Constellation.load(TLE_DIR, 868.1e6)
+    time = constellation.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    _, _, doppler, _ = constellation.get_doppler_batch(time, [0.0, 10.0], [0.0, 20.0])
+
+    assert doppler.shape == (3, 1, 2)
+    expected = constellation[1].get_doppler_batch(time, [10.0], [20.0])[2][0]
+    assert np.isclose(doppler[1, 0, 1], expected)
+
+
+def test_states_match_across_a_leap_second():
+    from components.sats import Sat, read_tle, shared_timescale
+
+    # TLE 历元移到 2016-12-31, 在 23:59:60 闰秒前后传播
+    ts = shared_timescale()
+    sats = [
+        Sat.from_tle(line1[:18] + "16366.50000000" + line1[32:], line2, 868.1e6, name, ts)
+        for name, line1, line2 in read_tle(TLE_DIR / "57425.tle")
+    ]
+    constellation = Constellation(sats, ts)
+    times = ts.utc(2016, 12, 31, 23, 59, np.arange(50.0, 75.0, 2.5))
+    states = constellation.states(times)
+    r, v = sats[0].itrs_state(times)
+    assert np.allclose(states[0, :, :3], r.T, atol=1e-6)
+    assert np.allclose(states[0, :, 3:], v.T, atol=1e-6)
+
+
+def test_empty_constellation_is_rejected():
+    with pytest.raises(ValueError, match="at least one satellite"):
+        Constellation([])
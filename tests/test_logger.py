@@ -0,0 +1,60 @@
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+from components.sats import Sat
+from components.tasks import CalDopplerTask
+from logger import VERBOSE, LogPipeline, RateLimitFilter, logger
+
+TLE_DIR = Path(__file__).parent.parent / "data" / "tle"
+
+
+def test_rate_limit_filter_drops_and_reports():
+    limiter = RateLimitFilter(burst=3, interval=3600)
+    record = lambda level=logging.INFO: logging.LogRecord("x", level, "f.py", 7, "task %d", (1,), None)
+
+    assert [limiter.filter(record()) for _ in range(10)].count(True) == 3
+    assert limiter.filter(record(logging.WARNING)) and limiter.filter(record(VERBOSE))
+
+    limiter.interval = 0
+    passed = record()
+    assert limiter.filter(passed)
+    assert passed.suppressed == 7 and passed.getMessage() == "task 1 [7 similar messages suppressed]"
+
+
+def test_pipeline_rate_limits_console_only(tmp_path, capsys):
+    path = tmp_path / "run.jsonl"
+    pipeline = LogPipeline(path, burst=2, interval=3600).start()
+    try:
+        for i in range(10):
+            logger.info("chunk %d", i)
+    finally:
+        pipeline.stop()
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["msg"] for e in entries] == [f"chunk {i}" for i in range(10)]
+    assert capsys.readouterr().err.count("chunk") == 2
+
+
+def test_pipeline_writes_json_lines_and_gates_verbose(tmp_path):
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+
+    def run(level):
+        path = tmp_path / f"{level}.jsonl"
+        pipeline = LogPipeline(path, level=level, console=False).start()
+        try:
+            CalDopplerTask(3, sat, time, 20, seed=1, persist=False).run()
+        finally:
+            pipeline.stop()
+        return [json.loads(line) for line in path.read_text().splitlines()]
+
+    entries = run(logging.INFO)
+    assert [e["task_id"] for e in entries] == [3]
+    assert entries[0]["level"] == "INFO" and entries[0]["where"] == "tasks.log_start"
+
+    entries = run(VERBOSE)
+    assert sum(e["level"] == "VERBOSE" for e in entries) == 20
+    # stop() 恢复原来的配置, 逐点输出重新关闭
+    assert not logger.isEnabledFor(VERBOSE)
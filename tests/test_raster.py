@@ -0,0 +1,35 @@
+import numpy as np
+
+from components.raster import CoverageRaster
+
+
+def test_merge_of_partials_equals_single_raster(tmp_path):
+    rng = np.random.default_rng(3)
+    lats, lons = rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500)
+    doppler = rng.normal(0, 1e4, 500)
+    sat_index = np.where(np.arange(500) < 250, 0, 70)
+
+    whole = CoverageRaster(res_deg=10.0, n_sats=80)
+    for s in (0, 70):
+        sel = sat_index == s
+        whole.accumulate(lats[sel], lons[sel], doppler[sel], s)
+
+    partials = []
+    for chunk in np.array_split(np.arange(500), 7):
+        for s in (0, 70):
+            sel = chunk[sat_index[chunk] == s]
+            raster = CoverageRaster(res_deg=10.0, n_sats=80)
+            raster.accumulate(lats[sel], lons[sel], doppler[sel], s)
+            partials.append(raster)
+    merged = CoverageRaster.reduce(partials)
+
+    assert merged.count.sum() == 500
+    assert np.array_equal(merged.count, whole.count)
+    assert np.array_equal(merged.mask, whole.mask)
+    assert np.array_equal(merged.doppler_min, whole.doppler_min)
+    assert np.array_equal(merged.doppler_max, whole.doppler_max)
+    assert merged.n_covering().max() == 2
+
+    merged.save(tmp_path / "coverage.npz")
+    loaded = CoverageRaster.load(tmp_path / "coverage.npz")
+    assert np.array_equal(loaded.mask, merged.mask)
@@ -0,0 +1,62 @@
+from concurrent.futures import Future
+
+import numpy as np
+
+from components.reduce import DopplerReducer
+from components.results import load_columns
+
+
+def _done(value):
+    f = Future()
+    f.set_result(value)
+    return f
+
+
+def test_streaming_aggregates_match_batch(tmp_path):
+    rng = np.random.default_rng(1)
+    chunks = [
+        np.stack((rng.uniform(-90, 90, n), rng.uniform(-180, 180, n), rng.normal(0, 5e3, n), rng.normal(0, 1, n)))
+        for n in (50, 0, 120, 30)
+    ]
+    reducer = DopplerReducer((-2e4, 2e4), raw_path=tmp_path / "raw.npy", raw_capacity=200)
+
+    reducer.consume_futures(_done(c) for c in chunks)
+    reducer.save(tmp_path / "summary.npz")
+
+    doppler = np.concatenate([c[2] for c in chunks])
+    assert reducer.count == 200
+    assert np.isclose(reducer.mean, doppler.mean())
+    assert np.isclose(reducer.std, doppler.std())
+    assert reducer.min == doppler.min() and reducer.max == doppler.max()
+    assert reducer.histogram.sum() == 200
+
+    summary = np.load(tmp_path / "summary.npz")
+    assert summary["cell_count"].sum() == 200
+    assert np.nanmax(summary["cell_max"][summary["cell_count"] > 0]) == doppler.max()
+    raw = load_columns(tmp_path / "raw.npy")
+    assert np.array_equal(np.sort(raw[2]), np.sort(doppler))
+
+
+def test_std_is_stable_for_a_large_offset():
+    rng = np.random.default_rng(2)
+    chunks = [
+        np.stack((np.zeros(n), np.zeros(n), 1e9 + rng.normal(0, 1, n), np.zeros(n))) for n in (1000, 1, 3000)
+    ]
+    reducer = DopplerReducer((-2e4, 2e4))
+    for c in chunks:
+        reducer.consume(c)
+
+    doppler = np.concatenate([c[2] for c in chunks])
+    assert np.isclose(reducer.mean, doppler.mean(), rtol=0, atol=1e-6)
+    assert np.isclose(reducer.std, doppler.std(), rtol=1e-9)
+
+
+def test_raw_data_appears_only_after_save(tmp_path):
+    columns = np.arange(8.0).reshape(4, 2)
+    reducer = DopplerReducer((-2e4, 2e4), raw_path=tmp_path / "raw.npy", raw_capacity=2)
+    reducer.consume(columns)
+    assert not (tmp_path / "raw.npy").exists()
+
+    reducer.save(tmp_path / "summary.npz")
+    assert np.array_equal(load_columns(tmp_path / "raw.npy"), columns)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["raw.npy", "summary.npz"]
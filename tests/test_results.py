@@ -0,0 +1,51 @@
+import numpy as np
+
+from components.results import COLUMN_INDEX, COLUMNS, load_columns, merge_columns, save_columns
+
+
+def test_merge_concatenates_columns_in_order(tmp_path):
+    parts = [np.arange(len(COLUMNS) * n, dtype=np.float64).reshape(len(COLUMNS), n) for n in (3, 0, 5)]
+    paths = []
+    for i, part in enumerate(parts):
+        save_columns(tmp_path / f"{i}.npy", part)
+        paths.append(tmp_path / f"{i}.npy")
+
+    merged = merge_columns(paths, tmp_path / "result.npy")
+
+    assert np.array_equal(merged, np.concatenate(parts, axis=1))
+    doppler = load_columns(tmp_path / "result.npy")[COLUMN_INDEX["doppler"]]
+    assert doppler.base is not None  # 列是内存映射上的视图, 不是拷贝
+
+
+def test_doppler_index_roundtrip(tmp_path):
+    from components.index import DopplerIndex
+
+    rng = np.random.default_rng(2)
+    columns = np.stack((rng.uniform(-10, 10, 2000), (rng.uniform(170, 190, 2000) + 180) % 360 - 180, rng.normal(0, 1e4, 2000), np.zeros(2000)))
+    save_columns(tmp_path / "result.npy", columns)
+
+    DopplerIndex.from_result(tmp_path / "result.npy").save(DopplerIndex.path_for(tmp_path / "result.npy"))
+    index = DopplerIndex.load(tmp_path / "result.kdtree.pkl")
+
+    doppler, dist_km = index.nearest(columns[0, :5], columns[1, :5])
+    assert np.array_equal(doppler, columns[2, :5]) and np.all(dist_km < 1e-6)
+    assert np.allclose(index.interpolate(columns[0, :5], columns[1, :5]), columns[2, :5])
+    # 跨越 ±180° 的查询点也能找到近邻
+    _, dist_km = index.nearest([0.0], [179.99])
+    assert dist_km[0] < 100
+
+
+def test_atomic_path_leaves_no_partial_file(tmp_path):
+    from components.results import atomic_path
+
+    target = tmp_path / "out.npy"
+    try:
+        with atomic_path(target) as tmp, open(tmp, "wb") as f:
+            f.write(b"partial")
+            raise RuntimeError("killed")
+    except RuntimeError:
+        pass
+    assert list(tmp_path.iterdir()) == []
+
+    save_columns(target, np.ones((len(COLUMNS), 2)))
+    assert [p.name for p in tmp_path.iterdir()] == ["out.npy"]
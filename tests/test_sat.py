@@ -2,6 +2,7 @@ from components.sats import Sat
 from pathlib import Path
 from datetime import datetime, timezone
 from skyfield.api import wgs84
+import numpy as np
 
 def sat_test():
     tle_path = Path(__file__).parent.parent / "data" / "tle"
@@ -15,3 +16,183 @@ def sat_test():
     )
     assert(doppler_shift != 0)
 
+
+
+def test_doppler_batch_matches_scalar():
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 10, 0, 0, tzinfo=timezone.utc))
+    lat, lon, _ = sat.pos_at(time)
+    lats = [lat, lat + 3.0, lat - 5.0]
+    lons = [lon, lon + 4.0, lon - 2.0]
+
+    _, _, doppler, received = sat.get_doppler_batch(time, lats, lons)
+
+    for la, lo, d, r in zip(lats, lons, doppler, received):
+        expected_d, expected_r = sat.get_doppler(time, wgs84.latlon(la, lo))
+        assert abs(d - expected_d) < 1e-6
+        assert abs(r - expected_r) < 1e-6
+
+
+def test_doppler_sweep_matches_single_epochs():
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    start = datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
+    times = sat.time_grid(start, datetime(2025, 12, 1, 8, 5, 0, tzinfo=timezone.utc), 1.0)
+    lat, lon, _ = sat.pos_at(times[150])
+    lats, lons = [lat + 1.0, lat - 2.0], [lon, lon + 1.0]
+
+    doppler, doppler_rate = sat.get_doppler_sweep(times, lats, lons)
+
+    assert doppler.shape == doppler_rate.shape == (301, 2)
+    for i in (0, 150, 300):
+        _, _, expected, _ = sat.get_doppler_batch(times[i], lats, lons)
+        assert np.allclose(doppler[i], expected)
+    # 变化率与多普勒序列的数值导数一致
+    assert np.allclose(np.gradient(doppler, 1.0, axis=0)[1:-1], doppler_rate[1:-1], atol=0.5)
+
+
+def test_ephemeris_cache_within_error_bound():
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    start = datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
+    times = sat.time_grid(start, datetime(2025, 12, 1, 11, 0, 0, tzinfo=timezone.utc), 7.3)
+    r_exact, v_exact = sat.itrs_state(times)
+
+    cache = sat.enable_ephemeris_cache(step_s=60.0, window_s=3600.0, max_windows=2)
+    r, v = sat.itrs_state(times)
+    bound = cache.error_bound()
+
+    assert np.linalg.norm(r - r_exact, axis=0).max() <= bound["position_m"]
+    assert np.linalg.norm(v - v_exact, axis=0).max() <= bound["velocity_m_per_s"]
+    assert cache.stats()["windows"] == 2 and cache.evictions >= 1
+
+    sat.itrs_state(times[-1])
+    assert cache.hits == 1
+
+
+def test_doppler_table_within_error_bound(tmp_path):
+    import pickle
+
+    from components.lut import DopplerTable
+
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    start = datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
+    times = sat.time_grid(start, datetime(2025, 12, 1, 8, 2, 0, tzinfo=timezone.utc), 5.0)
+    lat, lon, _ = sat.pos_at(times[12])
+    table = DopplerTable.build(sat, times, tmp_path / "lut.npy", res_deg=0.2)
+
+    loaded = pickle.loads(pickle.dumps(DopplerTable.load(tmp_path / "lut.npy")))
+    assert isinstance(loaded.data, np.memmap)
+
+    rng = np.random.default_rng(1)
+    lats = lat + rng.uniform(-2.5, 2.5, 500)
+    lons = lon + rng.uniform(-2.5, 2.5, 500)
+    query_time = times[12] + 2.5 / 86400
+    doppler, _ = loaded.query(query_time, lats, lons)
+    _, _, expected, _ = sat.get_doppler_batch(query_time, lats, lons)
+    assert np.abs(doppler - expected).max() <= table.error_bound["doppler_hz"]
+
+    # 表范围之外返回 nan
+    outside, _ = loaded.query(times[0] - 60 / 86400, [lat], [lon])
+    assert np.isnan(outside).all()
+
+
+def test_doppler_table_covers_the_masked_footprint_across_the_antimeridian(tmp_path):
+    from components.lut import DopplerTable
+    from utils import footprint_central_angle_rad
+
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    # 找到星下点跨越 ±180° 的时刻, 建立其前后 2 分钟的表
+    start = datetime(2025, 12, 1, 0, 0, 0, tzinfo=timezone.utc)
+    day = sat.time_grid(start, datetime(2025, 12, 1, 3, 0, 0, tzinfo=timezone.utc), 30.0)
+    lons = np.array([sat.pos_at(t)[1] for t in day])
+    crossing = int(np.flatnonzero(np.abs(np.diff(lons)) > 180)[0])
+    times = day[crossing - 2] + np.arange(0.0, 125.0, 5.0) / 86400
+
+    tables = {
+        e0: DopplerTable.build(sat, times, tmp_path / f"lut-{e0}.npy", res_deg=0.2, e0_deg=e0) for e0 in (10, 30)
+    }
+    # 表的大小由覆盖区决定, 不因轨迹跨越 ±180° 而展宽到全球
+    assert tables[30].data.shape[2] < 100 and tables[10].data.shape[2] > tables[30].data.shape[2]
+
+    # 地心角 ψ(30°) 与 ψ(10°) 之间的点只在 10° 仰角的表中
+    lat, lon, height = sat.pos_at(times[12])
+    psi_30, psi_10 = (np.degrees(footprint_central_angle_rad(float(height), e0)) for e0 in (30, 10))
+    lats = np.array([lat + (psi_30 + psi_10) / 2, lat - psi_30 / 2])
+    lons = np.array([lon, lon + 0.5 * psi_30 / np.cos(np.radians(lat))])
+    wide, _ = tables[10].query(times[12], lats, lons)
+    narrow, _ = tables[30].query(times[12], lats, lons)
+    _, _, expected, _ = sat.get_doppler_batch(times[12], lats, lons)
+    assert np.isnan(narrow[0]) and np.isfinite(narrow[1])
+    assert np.abs(wide - expected).max() <= tables[10].error_bound["doppler_hz"]
+    assert abs(narrow[1] - expected[1]) <= tables[30].error_bound["doppler_hz"]
+
+
+def test_iso_doppler_contours_lie_on_levels():
+    from components.contours import ContourCache, contours_to_geojson, iso_doppler_contours
+
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    cache = ContourCache()
+
+    contours = iso_doppler_contours(sat, time, [-10000, 0, 10000], cache=cache)
+    for level, lines in contours.items():
+        points = np.concatenate(lines)
+        _, _, doppler, _ = sat.get_doppler_batch(time, points[:, 1], points[:, 0])
+        assert np.abs(doppler - level).max() < 5.0
+
+    # 调用方修改返回值不影响缓存
+    contours[0.0].clear()
+    cached = iso_doppler_contours(sat, time, [-10000, 0, 10000], cache=cache)
+    assert cached[0.0] and not cached[0.0][0].flags.writeable
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+    geojson = contours_to_geojson(contours)
+    assert [f["properties"]["doppler_hz"] for f in geojson["features"]] == [-10000.0, 0.0, 10000.0]
+
+
+def test_contour_refinement_respects_the_total_node_budget(monkeypatch):
+    import components.contours as contours_module
+
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    sizes = []
+    generator = contours_module.contour_generator
+
+    def record(x, y, z, **kwargs):
+        sizes.append(z.size)
+        return generator(x, y, z, **kwargs)
+
+    monkeypatch.setattr(contours_module, "contour_generator", record)
+    for max_nodes in (4096, 20000):
+        contours_module.iso_doppler_contours(sat, time, [0], max_step_hz=1.0, max_nodes=max_nodes, cache=None)
+    assert sizes[0] <= 4096 < sizes[1] <= 20000
+
+
+def test_contours_geojson_wraps_and_splits_at_the_antimeridian():
+    from components.contours import contours_to_geojson, iso_doppler_contours
+
+    tle_path = Path(__file__).parent.parent / "data" / "tle"
+    sat = Sat(tle_path / "57425.tle", 868.1e6)
+    start = datetime(2025, 12, 1, 0, 0, 0, tzinfo=timezone.utc)
+    day = sat.time_grid(start, datetime(2025, 12, 1, 3, 0, 0, tzinfo=timezone.utc), 30.0)
+    lons = np.array([sat.pos_at(t)[1] for t in day])
+    time = day[int(np.flatnonzero(np.abs(np.diff(lons)) > 180)[0])]
+
+    contours = iso_doppler_contours(sat, time, [-10000, 0, 10000], cache=None)
+    assert any(np.abs(line[:, 0]).max() > 180 for lines in contours.values() for line in lines)
+
+    features = contours_to_geojson(contours)["features"]
+    ends = [abs(part[-1][0]) for feature in features for part in feature["geometry"]["coordinates"]]
+    assert 180.0 in ends
+    for feature in features:
+        parts = [np.array(part) for part in feature["geometry"]["coordinates"]]
+        assert all(np.abs(part[:, 0]).max() <= 180 for part in parts)
+        assert all(np.abs(np.diff(part[:, 0])).max() < 180 for part in parts)
+        points = np.concatenate(parts)
+        _, _, doppler, _ = sat.get_doppler_batch(time, points[:, 1], points[:, 0])
+        assert np.abs(doppler - feature["properties"]["doppler_hz"]).max() < 5.0
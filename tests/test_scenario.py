@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from components.results import load_columns
+from components.scenario import BatchRunner, expand_scenarios
+from components.simulate import TaskExecutor
+
+
+def test_expand_matrix_names_and_validation():
+    spec = {
+        "defaults": {"n_samples": 10},
+        "matrix": {"freq": [868.1e6, 433e6]},
+        "scenarios": [
+            {"tle": "57425.tle", "time": "2025-12-01T08:00:00Z"},
+            {"name": "grid", "tle": "57425.tle", "time": "2025-12-01T08:00:00", "sampling": "grid"},
+        ],
+    }
+    names = [s.name for s in expand_scenarios(spec)]
+    assert names == [
+        "doppler-57425-20251201T080000Z-868.1MHz-random",
+        "doppler-57425-20251201T080000Z-433MHz-random",
+        "grid-57425-20251201T080000-868.1MHz-grid",
+        "grid-57425-20251201T080000-433MHz-grid",
+    ]
+    assert expand_scenarios(spec)[2].datetime.utcoffset().total_seconds() == 0
+
+    with pytest.raises(ValueError, match="unknown"):
+        expand_scenarios({"scenarios": [{"tle": "a.tle", "time": "2025-12-01", "frequency": 1}]})
+    with pytest.raises(ValueError, match="duplicate"):
+        expand_scenarios({"scenarios": [{"tle": "a.tle", "time": "2025-12-01"}] * 2})
+
+
+def test_matrix_only_expands_keys_that_apply_to_the_kind():
+    spec = {
+        "defaults": {"time": "2025-12-01T08:00:00Z", "resolution_km": 20},
+        "matrix": {"freq": [868.1e6, 433e6], "sampling": ["random", "grid"]},
+        "scenarios": [{"tle": "57425.tle"}, {"kind": "coverage", "tle": ["66206.tle", "66208.tle"]}],
+    }
+    scenarios = expand_scenarios(spec)
+    # coverage 场景不随 sampling 展开, 也不继承 doppler 专用的缺省参数
+    coverage = [s for s in scenarios if s.kind == "coverage"]
+    assert len(scenarios) == 6 and [s.name for s in coverage] == [
+        "coverage-66206+66208-20251201T080000Z-868.1MHz",
+        "coverage-66206+66208-20251201T080000Z-433MHz",
+    ]
+    assert coverage[0].resolution_km == 10.0
+
+    with pytest.raises(ValueError, match=r"coverage scenario .* does not take \['sampling'\]"):
+        expand_scenarios(
+            {"scenarios": [{"kind": "coverage", "tle": "a.tle", "time": "2025-12-01", "sampling": "grid"}]}
+        )
+    with pytest.raises(ValueError, match="does not take"):
+        expand_scenarios({"scenarios": [{"tle": "a.tle", "time": "2025-12-01", "res_deg": 1.0}]})
+    with pytest.raises(ValueError, match="Unknown scenario kind"):
+        expand_scenarios({"scenarios": [{"kind": "sweep", "tle": "a.tle", "time": "2025-12-01"}]})
+
+
+def test_batch_stops_the_log_pipeline_when_a_scenario_fails(tmp_path):
+    import json
+    import logging
+
+    import batch
+
+    spec = {"scenarios": [{"tle": ["57425.tle", "66206.tle"], "time": "2025-12-01T08:00:00Z", "n_samples": 10}]}
+    (tmp_path / "bad.json").write_text(json.dumps(spec))
+    handlers = logging.getLogger().handlers[:]
+
+    with pytest.raises(ValueError, match="exactly one TLE"):
+        batch.main([str(tmp_path / "bad.json"), "--runs-dir", str(tmp_path), "--mode", "thread", "--cache-mb", "0"])
+    assert logging.getLogger().handlers == handlers
+    # 队列中的记录在失败后仍然写出
+    assert ": start" in (tmp_path / "bad" / "log.jsonl").read_text()
+
+
+def test_batch_runner_isolates_scenarios_and_shares_sats(tmp_path):
+    spec = {
+        "defaults": {"tle": "57425.tle", "time": "2025-12-01T08:00:00Z", "n_samples": 500, "seed": 3},
+        "matrix": {"freq": [868.1e6, 433e6]},
+        "scenarios": [{}, {"name": "cov", "kind": "coverage", "tle": ["66206.tle", "66208.tle"], "n_samples": 300}],
+    }
+    scenarios = expand_scenarios(spec)
+    runner = BatchRunner("test", executor=TaskExecutor(num_workers=2), runs_dir=tmp_path)
+    results = runner.run(scenarios)
+    runner.shutdown()
+
+    high, low = (load_columns(runner.run_dir(s) / "result.npy") for s in scenarios[:2])
+    # 同一采样点, 多普勒与载频成正比
+    assert np.array_equal(high[:2], low[:2])
+    assert np.allclose(high[2] * 433e6 / 868.1e6, low[2])
+    assert results[scenarios[0].name]["count"] == 500
+    assert all((runner.run_dir(s) / "scenario.json").exists() for s in scenarios)
+    assert results[scenarios[2].name]["sats"] == 2
+    assert len(runner._sats) == 2 and len(runner._constellations) == 2
+
+    # 续跑时所有任务都已完成
+    again = BatchRunner("test", executor=TaskExecutor(num_workers=2), runs_dir=tmp_path)
+    summary = again.run(scenarios[:1], resume=True)[scenarios[0].name]
+    again.shutdown()
+    assert summary["tasks"] == 0 and summary["count"] == 500
@@ -0,0 +1,421 @@
+import pickle
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from multiprocessing.reduction import ForkingPickler
+from skyfield.api import Time
+
+from components.sats import Sat
+from components.simulate import TaskExecutor
+from components.tasks import Task
+
+TLE_DIR = Path(__file__).parent.parent / "data" / "tle"
+
+
+@dataclass
+class DopplerAtSubpoint(Task):
+    sat: Sat
+    time: Time
+
+    def run(self):
+        lat, lon, _ = self.sat.pos_at(self.time)
+        return self.sat.get_doppler_batch(self.time, [lat + 1.0], [lon])[2][0]
+
+
+def test_sat_pickles_as_tle():
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    clone = pickle.loads(pickle.dumps(sat))
+    assert clone.tle_lines == sat.tle_lines
+    assert clone.signal_freq == sat.signal_freq
+
+
+def test_unpickled_sat_keeps_its_ephemeris_cache_across_tasks():
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    sat.enable_ephemeris_cache()
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+
+    # worker 中每个任务各自反序列化卫星; 同一颗卫星复用同一个重建的 Sat 与星历缓存
+    first = pickle.loads(pickle.dumps(sat))
+    first.pos_at(time)
+    second = pickle.loads(pickle.dumps(sat))
+    assert second is first
+    second.pos_at(time)
+    assert second.ephemeris.stats()["hits"] >= 1 and second.ephemeris.stats()["windows"] == 1
+
+    sat.disable_ephemeris_cache()
+    assert pickle.loads(pickle.dumps(sat)) is not first
+
+
+def test_time_ships_without_timescale_tables():
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    assert len(ForkingPickler.dumps(time)) < 10_000
+
+
+def test_process_mode_matches_thread_mode():
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+
+    results = {}
+    for mode in ("thread", "process"):
+        executor = TaskExecutor(num_workers=2, mode=mode)
+        futures = [executor.submit(DopplerAtSubpoint(i, sat, time)) for i in range(3)]
+        results[mode] = [f.result() for f in futures]
+        executor.shutdown()
+
+    assert np.allclose(results["thread"], results["process"])
+
+
+@dataclass
+class FailingTask(Task):
+    def run(self):
+        raise ValueError("boom")
+
+
+def test_executor_records_task_metrics(tmp_path):
+    from components.tasks import CalDopplerTask
+
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+
+    for mode in ("thread", "process"):
+        path = tmp_path / f"metrics-{mode}.json"
+        executor = TaskExecutor(num_workers=2, mode=mode, metrics_path=path)
+        futures = [
+            executor.submit(CalDopplerTask(i, sat, time, 50, seed=i, persist=False))
+            for i in range(4)
+        ]
+        failing = executor.submit(FailingTask(99))
+        [f.result() for f in futures]
+        assert isinstance(failing.exception(), ValueError)
+        executor.shutdown()
+
+        snapshot = executor.snapshot()
+        assert snapshot["tasks_completed"] == 5 and snapshot["tasks_failed"] == 1
+        assert snapshot["points"] == 200 and snapshot["queue_depth"] == 0
+        assert {"sampling", "propagation", "doppler"} <= set(snapshot["phase_s"])
+        assert 0 < snapshot["utilization"] <= 1
+        assert path.exists() and "caldoppler_points_total 200" in path.with_suffix(".prom").read_text()
+
+
+@dataclass
+class Sleep(Task):
+    seconds: float
+
+    def run(self):
+        time.sleep(self.seconds)
+        return self.task_id
+
+
+def test_shutdown_without_wait_does_not_dump_partial_metrics(tmp_path):
+    for mode in ("thread", "process"):
+        path = tmp_path / f"metrics-{mode}.json"
+        executor = TaskExecutor(num_workers=1, mode=mode, metrics_path=path)
+        future = executor.submit(Sleep(0, 0.5))
+        executor.shutdown(wait=False)
+        assert future.result() == 0
+        assert not path.exists()
+
+
+@dataclass
+class Square(Task):
+    value: int
+
+    def run(self):
+        return self.value**2
+
+
+@dataclass
+class Total(Task):
+    def run(self, *inputs):
+        return sum(inputs)
+
+
+def test_dependent_tasks_receive_inputs_in_order():
+    for mode in ("thread", "process"):
+        executor = TaskExecutor(num_workers=2, mode=mode)
+        squares = [executor.submit(Square(i, i)) for i in range(5)]
+        partial = executor.submit(Total(10), depends_on=squares[:3])
+        total = executor.submit(Total(11), depends_on=[partial, *squares[3:]])
+        failed = executor.submit(Total(12), depends_on=[executor.submit(FailingTask(13)), partial])
+        executor.shutdown()
+
+        assert partial.result() == 5 and total.result() == 30
+        assert isinstance(failed.exception(), ValueError)
+        # 失败依赖的下游任务不会执行
+        assert executor.snapshot()["tasks_completed"] == 8
+
+
+def test_merge_task_concatenates_inputs(tmp_path, monkeypatch):
+    from components import tasks
+    from components.results import load_columns
+
+    monkeypatch.setattr(tasks, "FINAL_DIR", tmp_path)
+    parts = [np.full((4, n), float(n)) for n in (2, 3)]
+    merged = tasks.MergeTask(0).run(*parts)
+    assert merged.shape == (4, 5)
+    assert np.array_equal(load_columns(tmp_path / "result.npy"), merged)
+
+
+def test_chunk_planner_covers_range_and_is_chunking_independent():
+    from components.planner import ChunkPlanner
+    from components.tasks import CalDopplerTask
+
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    total, block = 2050, 100
+    seeds = np.random.SeedSequence(7).spawn(-(-total // block))
+
+    def make_task(task_id, offset, n):
+        first = offset // block
+        return CalDopplerTask(
+            task_id, sat, time, n,
+            seed=seeds[first : first + -(-n // block)], seed_block=block, persist=False,
+        )
+
+    executor = TaskExecutor(num_workers=2)
+    planner = ChunkPlanner(executor, make_task, total, block=block, target_task_s=10.0)
+    merged = np.empty((4, total))
+    for offset, columns in planner.run():
+        merged[:, offset : offset + columns.shape[1]] = columns
+    executor.shutdown()
+
+    offsets = sorted(planner.chunks)
+    assert offsets[0][0] == 0 and sum(n for _, n in offsets) == total
+    assert all(a + n == b for (a, n), (b, _) in zip(offsets, offsets[1:]))
+    assert max(n for _, n in planner.chunks) > block
+    # 与一次性处理全部点的结果一致
+    assert np.array_equal(merged, make_task(0, 0, total).run())
+
+
+@dataclass
+class Blocking(Task):
+    event: object
+
+    def run(self):
+        self.event.wait(5)
+        return self.task_id
+
+
+def test_submit_async_and_cancellation():
+    import asyncio
+    import threading
+
+    async def main(executor, event):
+        assert await executor.submit_async(Square(0, 3)) == 9
+        blocking = asyncio.ensure_future(executor.submit_async(Blocking(1, event)))
+        queued = asyncio.ensure_future(executor.submit_async(Square(2, 4)))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        event.set()
+        assert await blocking == 1
+        await asyncio.sleep(0.05)
+        return queued.cancelled()
+
+    executor = TaskExecutor(num_workers=1)
+    assert asyncio.run(main(executor, threading.Event()))
+    executor.shutdown()
+    snapshot = executor.snapshot()
+    assert snapshot["tasks_completed"] == 2 and snapshot["tasks_cancelled"] == 1
+
+
+def test_run_doppler_streams_all_chunks():
+    import asyncio
+
+    from components.aio import run_doppler
+    from components.planner import cal_doppler_tasks
+
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+
+    async def collect(limit=None):
+        chunks = []
+        async for offset, columns in run_doppler(sat, time, 1234, max_in_flight=2, run_seed=3):
+            chunks.append((offset, columns))
+            if limit is not None and len(chunks) >= limit:
+                break
+        return chunks
+
+    chunks = asyncio.run(collect())
+    merged = np.concatenate([c for _, c in sorted(chunks, key=lambda c: c[0])], axis=1)
+    expected = cal_doppler_tasks(sat, time, 1234, run_seed=3)(0, 0, 1234).run()
+    assert np.array_equal(merged, expected)
+
+    assert len(asyncio.run(collect(limit=1))) == 1
+
+
+def test_manifest_resume_skips_verified_chunks(tmp_path):
+    import pytest
+
+    from components.manifest import RunManifest
+    from components.planner import ChunkPlanner, cal_doppler_tasks
+    from components.tasks import MergeRunTask
+
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    total, block, params = 1500, 100, {"run_seed": 5, "shape": (1, 2)}
+
+    def run(resume, stop_after=None):
+        manifest = RunManifest.open(tmp_path, params, resume)
+        done = manifest.verified()
+        base = cal_doppler_tasks(sat, time, total, block, 5, persist=True, out_dir=manifest.output_dir)
+        task_of, computed = {}, []
+
+        def make_task(task_id, offset, n):
+            manifest.add_task(task_id, offset, n)
+            task_of[offset] = task_id
+            return base(task_id, offset, n)
+
+        executor = TaskExecutor(num_workers=2)
+        planner = ChunkPlanner(
+            executor, make_task, total, block=block, max_blocks=2,
+            completed=[(r["offset"], r["n"]) for _, r in done], first_task_id=manifest.next_task_id,
+        )
+        for offset, columns in planner.run():
+            manifest.mark_done(task_of[offset])
+            computed.append((offset, columns.shape[1]))
+            if stop_after is not None and len(computed) >= stop_after:
+                break
+        executor.shutdown()
+        return manifest, computed
+
+    manifest, _ = run(resume=False, stop_after=3)
+    finished = [r for r in manifest.tasks.values() if r["status"] == "done"]
+    assert len(finished) >= 3
+    # 损坏一个已完成任务的输出, 续跑时应重新计算
+    (manifest.output_dir / finished[0]["file"]).write_bytes(b"corrupt")
+
+    manifest, computed = run(resume=True)
+    assert (finished[0]["offset"], finished[0]["n"]) in computed
+    assert sum(n for _, n in computed) < total
+    assert sum(r["n"] for _, r in manifest.verified()) == total
+
+    merged = MergeRunTask(0, tmp_path, tmp_path / "result.npy").run()
+    expected = cal_doppler_tasks(sat, time, total, block, 5)(0, 0, total).run()
+    assert np.array_equal(merged, expected)
+
+    with pytest.raises(ValueError):
+        RunManifest.open(tmp_path, {**params, "run_seed": 6}, resume=True)
+
+
+def test_result_cache_hits_across_chunkings_and_evicts(tmp_path):
+    from components.cache import ResultCache
+    from components.planner import cal_doppler_tasks
+
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    cache = ResultCache(tmp_path / "cache")
+    make_task = cal_doppler_tasks(sat, time, 450, 100, 11, cache=cache)
+
+    whole = make_task(0, 0, 450).run()
+    # 5 个块未命中, 合并为一项
+    assert cache.stats()["misses"] == 5 and cache.stats()["entries"] == 1
+
+    # 不同的分块方式命中同一批缓存块
+    parts = [make_task(1, 0, 200).run(), make_task(2, 200, 250).run()]
+    assert np.array_equal(np.concatenate(parts, axis=1), whole)
+    assert cache.stats()["hits"] == 5
+
+    # 场景不同 (载频) 不命中
+    other = Sat(TLE_DIR / "57425.tle", 400e6)
+    cal_doppler_tasks(other, time, 450, 100, 11, cache=cache)(3, 0, 100).run()
+    assert cache.stats()["misses"] == 6
+
+    # 在执行器中运行时命中数记入指标
+    executor = TaskExecutor(num_workers=1)
+    executor.submit(make_task(4, 100, 100)).result()
+    executor.shutdown()
+    assert executor.snapshot()["counts"] == {"cache_hits": 1, "cache_misses": 0}
+
+    # 淘汰按账本进行, 另一个进程 (新实例) 从 index.jsonl 读入同样的账本
+    assert cache.stats()["entries"] == 2
+    shared = ResultCache(tmp_path / "cache")
+    assert shared.stats()["bytes"] == cache.stats()["bytes"]
+    shared.max_bytes = shared.stats()["bytes"] - 1
+    assert shared.evict() == 1
+    # 最久未使用的是载频不同的那一项
+    assert cache.stats()["entries"] == 1
+    assert all(hit is not None for hit in cache.get_blocks([key for key, _ in make_task(5, 0, 450).cache_keys()]))
+    assert len(list((tmp_path / "cache").glob("*.npy"))) == 1
+
+
+def test_result_cache_ledger_compacts_and_drops_orphans(tmp_path, monkeypatch):
+    import os
+
+    from components import cache as cache_module
+    from components.cache import ResultCache
+
+    monkeypatch.setattr(cache_module, "COMPACT_MIN", 8)
+    monkeypatch.setattr(cache_module, "COMPACT_RATIO", 1)
+    cache = ResultCache(tmp_path, max_bytes=1 << 30)
+    columns = np.arange(4 * 30, dtype=np.float64).reshape(4, 30)
+    orphan = tmp_path / "orphan.npy"
+    np.save(orphan, columns)
+    os.utime(orphan, (0, 0))
+
+    for i in range(6):
+        cache.put_blocks([(f"a{i}", 0, 10), (f"b{i}", 10, 30)], columns)
+        assert np.array_equal(cache.get(f"b{i}"), columns[:, 10:30])
+    # 记录数超过阈值时账本重写为每项一条 (共追加了 12 条), 账本之外的旧文件被清理
+    assert len((tmp_path / "index.jsonl").read_text().splitlines()) < 12
+    assert not orphan.exists()
+
+    fresh = ResultCache(tmp_path)
+    assert fresh.stats()["entries"] == 6
+    assert np.array_equal(fresh.get("a5"), columns[:, :10])
+
+
+def test_sweep_task_writes_atomically_to_out_dir(tmp_path):
+    from components.tasks import CalDopplerSweepTask
+
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    start = datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc)
+    times = sat.time_grid(start, datetime(2025, 12, 1, 8, 1, 0, tzinfo=timezone.utc), 10.0)
+    lat, lon, _ = sat.pos_at(times[0])
+    lats, lons = np.array([lat, lat + 1.0]), np.array([lon, lon - 1.0])
+
+    doppler, _ = CalDopplerSweepTask(5, sat, times, lats, lons, out_dir=tmp_path / "sweeps").run()
+
+    assert [p.name for p in (tmp_path / "sweeps").iterdir()] == ["sweep-5.npz"]
+    with np.load(tmp_path / "sweeps" / "sweep-5.npz") as saved:
+        np.testing.assert_array_equal(saved["doppler"], doppler)
+        np.testing.assert_array_equal(saved["lats"], lats)
+
+
+def test_cap_sampling_task_rejects_bad_grid_and_seed_parameters():
+    import pytest
+
+    from components.tasks import CalDopplerTask
+
+    sat = Sat(TLE_DIR / "57425.tle", 868.1e6)
+    time = sat.ts.from_datetime(datetime(2025, 12, 1, 8, 0, 0, tzinfo=timezone.utc))
+    seeds = np.random.SeedSequence(0).spawn(3)
+    make = lambda **kwargs: CalDopplerTask(0, sat, time, 250, persist=False, **kwargs)
+
+    for grid_shape in [(80,), (80, 0), (80.0, 496), "80x496"]:
+        with pytest.raises(ValueError, match="grid_shape must be"):
+            make(sampling="grid", grid_shape=grid_shape)
+    with pytest.raises(ValueError, match="requires grid_shape"):
+        make(sampling="grid")
+    with pytest.raises(ValueError, match="only applies to sampling='grid'"):
+        make(grid_shape=(80, 496))
+    with pytest.raises(ValueError, match="Unknown sampling mode"):
+        make(sampling="spiral")
+
+    with pytest.raises(ValueError, match="positive integer"):
+        make(seed=seeds, seed_block=0)
+    with pytest.raises(ValueError, match="requires seed_block"):
+        make(seed=seeds)
+    with pytest.raises(ValueError, match="requires seed to be a list"):
+        make(seed=1, seed_block=100)
+    with pytest.raises(ValueError, match="do not cover"):
+        make(seed=seeds[:2], seed_block=100)
+
+    # 网格采样时 seed_block 是缓存分块大小, 种子列表被忽略 (ChunkPlanner 对两种模式传同样的参数)
+    task = make(sampling="grid", grid_shape=[80, 496], seed=seeds, seed_block=100)
+    assert task.grid_shape == (80, 496)
+    assert make(seed=seeds, seed_block=100).run().shape == (4, 250)
@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+
+from utils import cap_grid_points, cap_grid_shape, cap_grid_size, sample_points_in_spherical_cap
+
+
+def _central_angle(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    cos_d = np.sin(lat1) * np.sin(lat2) + np.cos(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return np.arccos(np.clip(cos_d, -1.0, 1.0))
+
+
+def test_points_stay_in_cap():
+    rng = np.random.default_rng(0)
+    lats, lons = sample_points_in_spherical_cap(85.0, 179.0, 0.2, 10000, rng)
+    assert lats.shape == lons.shape == (10000,)
+    assert np.all(_central_angle(85.0, 179.0, lats, lons) <= 0.2 + 1e-9)
+    assert np.all((lons >= -180.0) & (lons < 180.0))
+
+
+def test_edge_cases():
+    lats, lons = sample_points_in_spherical_cap(10.0, 20.0, 0.0, 3)
+    assert np.all(lats == 10.0) and np.all(lons == 20.0)
+
+    lats, lons = sample_points_in_spherical_cap(10.0, 20.0, math.pi, 5000)
+    assert lats.min() < -45.0 and lats.max() > 45.0
+
+
+def test_seed_sequence_streams_are_reproducible():
+    a = [np.random.default_rng(s) for s in np.random.SeedSequence(42).spawn(2)]
+    b = [np.random.default_rng(s) for s in np.random.SeedSequence(42).spawn(2)]
+    first = sample_points_in_spherical_cap(0.0, 0.0, 0.1, 100, a[0])
+    again = sample_points_in_spherical_cap(0.0, 0.0, 0.1, 100, b[0])
+    other = sample_points_in_spherical_cap(0.0, 0.0, 0.1, 100, a[1])
+    assert np.array_equal(first[0], again[0])
+    assert not np.array_equal(first[0], other[0])
+
+
+def test_cap_grid_chunks_tile_the_lattice():
+    psi = 0.12
+    grid_shape = cap_grid_shape(psi, resolution_km=20)
+    n = cap_grid_size(grid_shape)
+    full = cap_grid_points(30.0, 170.0, psi, grid_shape)
+    chunks = [cap_grid_points(30.0, 170.0, psi, grid_shape, s, min(s + 97, n)) for s in range(0, n, 97)]
+
+    assert np.array_equal(full[0], np.concatenate([c[0] for c in chunks]))
+    assert np.array_equal(full[1], np.concatenate([c[1] for c in chunks]))
+    assert np.all(_central_angle(30.0, 170.0, full[0], full[1]) <= psi)
+
+
+def test_cap_grid_gap_is_uniform_across_the_cap():
+    from scipy.spatial import cKDTree
+
+    R_km, resolution_km = 6371.0, 10.0
+    psi = 0.12454821008578598  # 550 km, 30°
+    lats, lons = cap_grid_points(30.0, 170.0, psi, cap_grid_shape(psi, resolution_km))
+
+    def xyz(lat, lon):
+        lat, lon = np.radians(lat), np.radians(lon)
+        return R_km * np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+    probe_lat, probe_lon = sample_points_in_spherical_cap(30.0, 170.0, psi, 200_000, np.random.default_rng(0))
+    gap, _ = cKDTree(xyz(lats, lons)).query(xyz(probe_lat, probe_lon))
+    from_nadir = R_km * _central_angle(30.0, 170.0, probe_lat, probe_lon)
+
+    # 任意一点到最近网格点的距离不超过分辨率, 星下点附近与覆盖区边缘一致
+    for lo, hi in ((0, 100), (100, 300), (300, np.inf)):
+        in_band = (from_nadir >= lo) & (from_nadir < hi)
+        assert 0.6 * resolution_km < gap[in_band].max() <= resolution_km
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import numpy as np
+
+from vision.viz import create_points_app, export_points
+
+
+def test_points_served_in_binary_chunks(tmp_path):
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(-60, 60, 2500), rng.uniform(-180, 180, 2500)
+    doppler = rng.uniform(-2e4, 2e4, 2500)
+    export_points(tmp_path / "points.bin", lats, lons, doppler, (10.0, 20.0, 550.0), chunk_size=1000)
+
+    client = create_points_app(tmp_path / "points.bin").test_client()
+    meta = client.get("/points/meta").get_json()
+    assert meta["n"] == 2500 and meta["n_chunks"] == 3
+
+    chunks = [np.frombuffer(client.get(f"/points/{i}").data, dtype="<f4") for i in range(3)]
+    points = np.concatenate(chunks).reshape(-1, 3)
+    assert np.allclose(points, np.column_stack((lons, lats, doppler)).astype(np.float32))
+    assert client.get("/points/3").status_code == 404
+    assert b"PointPrimitiveCollection" in client.get("/").data
+
+
+def test_bin_latlon_stats_and_raster_plot(tmp_path):
+    from vision.picture import bin_latlon, plot_doppler_raster
+
+    lats = np.array([0.1, 0.2, 0.9, 1.9])
+    lons = np.array([0.1, 0.4, 0.2, 1.9])
+    values = np.array([1.0, 3.0, 5.0, 7.0])
+    extent = (0.0, 2.0, 0.0, 2.0)
+
+    mean, _ = bin_latlon(lats, lons, values, bins=2, extent=extent)
+    low, _ = bin_latlon(lats, lons, values, bins=2, extent=extent, stat="min")
+    assert mean[0, 0] == 3.0 and low[0, 0] == 1.0 and mean[1, 1] == 7.0
+    assert np.isnan(mean[0, 1]) and np.isnan(mean[1, 0])
+
+    plot_doppler_raster(lats, lons, values, tmp_path, bins=2)
+    assert (tmp_path / "doppler-raster.png").exists()
+
+
+def test_scatter_and_coverage_plots_render_without_pyplot(tmp_path):
+    import subprocess
+    import sys
+
+    # 在子进程中绘图, 检查不经过 pyplot (无界面环境下 plt.show() 会阻塞或报错)
+    code = f"""
+import sys
+import numpy as np
+from pathlib import Path
+from vision.picture import plot_coverage_raster, plot_footprint, save_3d_plot_to_file
+
+out = Path({str(tmp_path)!r})
+data = np.random.default_rng(0).uniform(0, 1, (500, 3))
+save_3d_plot_to_file(data, out, max_points=100)
+plot_footprint(data, out)
+plot_coverage_raster(np.eye(4), out)
+assert "matplotlib.pyplot" not in sys.modules
+"""
+    src = Path(__file__).parent.parent / "src"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=src, capture_output=True, timeout=120)
+    for name in ("output.png", "footprint.png", "coverage.png"):
+        assert (tmp_path / name).exists()
+
+
+def test_cap_grid_reshapes_to_2d_and_contours(tmp_path):
+    from utils import cap_grid_points, cap_grid_shape
+    from vision.picture import cap_grid_to_2d, plot_contour_grid
+
+    # 中心在 ±180° 附近; 值只与纬度有关, 各环重采样后与网格点的纬度仍应吻合
+    grid_shape = cap_grid_shape(np.radians(10.0), resolution_km=100)
+    lats, lons = cap_grid_points(40.0, 179.0, np.radians(10.0), grid_shape)
+    values = np.sin(np.radians(lats))
+
+    grid_lats, grid_lons, grid_values = cap_grid_to_2d(lats, lons, values, grid_shape)
+    assert grid_lats.shape == grid_lons.shape == grid_values.shape == (grid_shape[0], grid_shape[1] + 1)
+    assert np.array_equal(grid_values[:, 0], grid_values[:, -1])
+    assert np.ptp(grid_lons) < 40
+    assert np.abs(grid_values - np.sin(np.radians(grid_lats))).max() < 1e-3
+
+    plot_contour_grid(lats, lons, values, grid_shape, tmp_path, levels=10)
+    assert (tmp_path / "contour-grid.png").exists()